@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class AuthenticationConfig(AppConfig):
     name = 'Authentication'
-    verbose_name = '01. Imam Users'   
\ No newline at end of file
+    verbose_name = '01. Imam Users'
+
+    def ready(self):
+        from . import blacklist  # noqa: F401
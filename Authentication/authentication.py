@@ -0,0 +1,167 @@
+"""
+Authentication classes for Django REST Framework.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication as BaseJWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Claims a token needs for a read-only request to skip the user lookup.
+STATELESS_CLAIMS = ('is_active', 'is_staff', 'is_superuser', 'is_imam')
+
+
+class JWTAuthentication(BaseJWTAuthentication):
+    """
+    JWTAuthentication for requests that load the user row.
+
+    The token's `is_imam` claim is not trusted here: is_imam_user() resolves
+    group membership from the database once per request and caches it on
+    the user, so removing someone from the Imam group takes effect on the
+    next write rather than when their refresh token expires.
+    """
+
+
+class _UserRowCache:
+    """
+    Short-lived, per-process cache of user rows keyed by the token's user id.
+
+    Stores the raw field values, not instances, so every request gets its
+    own fresh User object. Entries are dropped when the user is saved or
+    deleted in this process; other processes see the change after
+    JWT_USER_CACHE_SECONDS at most.
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'JWT_USER_CACHE_SECONDS', 30)
+
+    def get(self, user_model, id_field, user_id):
+        now = time.monotonic()
+        pk = str(user_id)
+        entry = self._rows.get(pk)
+        if entry is None or entry[0] < now:
+            instance = user_model.objects.get(**{id_field: user_id})
+            if self.ttl <= 0:
+                return instance
+            fields = [field.attname for field in user_model._meta.concrete_fields]
+            entry = (now + self.ttl, fields, [getattr(instance, name) for name in fields])
+            with self._lock:
+                self._rows[pk] = entry
+            return instance
+        _, fields, values = entry
+        return user_model.from_db('default', fields, values)
+
+    def invalidate(self, pk):
+        with self._lock:
+            self._rows.pop(str(pk), None)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+user_row_cache = _UserRowCache()
+
+
+def _invalidate_user_row(sender, instance, **kwargs):
+    user_row_cache.invalidate(instance.pk)
+
+
+post_save.connect(_invalidate_user_row, sender=settings.AUTH_USER_MODEL, dispatch_uid='jwt_user_row_cache_save')
+post_delete.connect(_invalidate_user_row, sender=settings.AUTH_USER_MODEL, dispatch_uid='jwt_user_row_cache_delete')
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that trusts the token's signed claims on reads.
+
+    For GET/HEAD/OPTIONS requests carrying `user_id`, `is_active`,
+    `is_staff`, `is_superuser` and `is_imam` claims, request.user is an unsaved User
+    built from the claims, with no database query. It is a real model
+    instance, so `filter(user=request.user)` and reverse relations such as
+    `request.user.profile` still work, but other fields (username, email,
+    ...) are blank. Views that serialize request.user opt out with
+    `stateless_auth = False`.
+
+    Writes, and tokens issued before the claims existed, load the user
+    row through a short-lived local cache instead. The refresh endpoint
+    recomputes the claims and refuses inactive users, so role changes and
+    deactivation reach read-only requests within ACCESS_TOKEN_LIFETIME.
+
+    Enabled with JWT_STATELESS_READS.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        if self._can_trust_claims(request, validated_token):
+            return self.get_claims_user(validated_token), validated_token
+        return self.get_user(validated_token), validated_token
+
+    @staticmethod
+    def _can_trust_claims(request, validated_token):
+        if request.method not in SAFE_METHODS:
+            return False
+        view = getattr(request, 'parser_context', {}).get('view')
+        if not getattr(view, 'stateless_auth', True):
+            return False
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return False
+        return api_settings.USER_ID_CLAIM in validated_token and all(
+            claim in validated_token for claim in STATELESS_CLAIMS
+        )
+
+    def get_claims_user(self, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not validated_token['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        user = self.user_model(
+            is_active=bool(validated_token['is_active']),
+            is_staff=bool(validated_token['is_staff']),
+            is_superuser=bool(validated_token['is_superuser']),
+        )
+        # simplejwt stores the id as a string claim.
+        id_field = self.user_model._meta.get_field(api_settings.USER_ID_FIELD)
+        setattr(user, id_field.attname, id_field.to_python(validated_token[api_settings.USER_ID_CLAIM]))
+        user._state.adding = False
+        user._state.db = 'default'
+        user._is_imam = bool(validated_token['is_imam'])
+        user._from_token_claims = True
+        return user
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        try:
+            user = user_row_cache.get(self.user_model, api_settings.USER_ID_FIELD, user_id)
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+
+        return user
+
@@ -0,0 +1,225 @@
+"""
+Bloom filter of blacklisted JWT ids.
+
+Every blacklisted refresh token's jti is added to a Redis bitmap (the bloom
+filter) and to a ZSET scored by the token's expiry (the exact set). A check
+is one Redis round trip: a script reads the jti's bits with GETBIT and only
+looks the jti up in the exact set when all of them are set, so the common
+"not blacklisted" answer needs no database query.
+
+A revocation check must never miss a blacklisted token. When a jti cannot
+be added (Redis error), the bitmap is deleted so every check falls back to
+the BlacklistedToken table until prune_token_blacklist rebuilds it; if the
+delete fails too, this process deletes it on its next successful Redis
+call. Checks also use the table while Redis is unreachable or before the
+filter has been built.
+
+Bloom filters cannot remove members, so prune_token_blacklist rebuilds the
+filter from the remaining rows after deleting expired ones.
+"""
+import hashlib
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BLOOM_KEY = 'salahtime:jwt_blacklist:bloom'
+JTIS_KEY = 'salahtime:jwt_blacklist:jtis'
+HASH_COUNT = 7
+
+# KEYS[1]=bloom, KEYS[2]=jtis, ARGV[1]=jti, ARGV[2]=expiry, ARGV[3..]=bit offsets.
+# Bits are only set on a built filter: a partial bitmap would hide older jtis.
+_ADD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    for i = 3, #ARGV do
+        redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+    end
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return 1
+"""
+
+# KEYS[1]=bloom, KEYS[2]=jtis, ARGV[1]=jti, ARGV[2]=bitmap length, ARGV[3..]=bit offsets.
+# Returns -1 when there is no usable filter (missing, or built with a
+# different JWT_BLACKLIST_FILTER_BITS), otherwise 1 if blacklisted, else 0.
+_CONTAINS_SCRIPT = """
+if redis.call('STRLEN', KEYS[1]) ~= tonumber(ARGV[2]) then
+    return -1
+end
+for i = 3, #ARGV do
+    if redis.call('GETBIT', KEYS[1], ARGV[i]) == 0 then
+        return 0
+    end
+end
+if redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+    return 1
+end
+return 0
+"""
+
+
+def _offsets(jti, size):
+    digest = hashlib.sha256(jti.encode()).digest()
+    return [int.from_bytes(digest[i * 4:i * 4 + 4], 'big') % size for i in range(HASH_COUNT)]
+
+
+def _set_bit(bitmap, offset):
+    # Redis bitmaps number bits from the most significant bit of each byte.
+    bitmap[offset >> 3] |= 0x80 >> (offset & 7)
+
+
+class BlacklistFilter:
+    """Redis-backed bloom filter plus exact set of blacklisted jtis."""
+
+    def __init__(self, client=None):
+        self._client = client
+        self._add_script = None
+        self._contains_script = None
+        self._paused_until = 0.0
+        self._invalidate_pending = False
+
+    @property
+    def size(self):
+        return getattr(settings, 'JWT_BLACKLIST_FILTER_BITS', 1 << 23)
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+            url = getattr(settings, 'JWT_BLACKLIST_REDIS_URL', '') or settings.CELERY_BROKER_URL
+            self._client = redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        return self._client
+
+    @property
+    def _bitmap_length(self):
+        return (self.size + 7) // 8
+
+    def _available(self):
+        return getattr(settings, 'JWT_BLACKLIST_FILTER_ENABLED', True) and time.monotonic() >= self._paused_until
+
+    def _redis_failed(self, exc):
+        self._paused_until = time.monotonic() + 30
+        logger.warning("Token blacklist filter unavailable, using the database: %s", exc)
+
+    def _invalidate(self):
+        """Drop the bitmap so checks use the database until the next rebuild."""
+        try:
+            self.client.delete(BLOOM_KEY)
+        except Exception as exc:
+            self._invalidate_pending = True
+            logger.warning("Token blacklist filter could not be invalidated, retrying later: %s", exc)
+        else:
+            self._invalidate_pending = False
+
+    def _in_database(self, jti):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def contains(self, jti):
+        """Whether the token with this jti has been blacklisted."""
+        if not self._available():
+            return self._in_database(jti)
+        try:
+            if self._invalidate_pending:
+                self.client.delete(BLOOM_KEY)
+                self._invalidate_pending = False
+            if self._contains_script is None:
+                self._contains_script = self.client.register_script(_CONTAINS_SCRIPT)
+            found = self._contains_script(
+                keys=[BLOOM_KEY, JTIS_KEY], args=[jti, self._bitmap_length, *_offsets(jti, self.size)]
+            )
+        except Exception as exc:
+            self._redis_failed(exc)
+            return self._in_database(jti)
+        if found < 0:
+            return self._in_database(jti)
+        return bool(found)
+
+    def add(self, jti, expires_at):
+        """Record a newly blacklisted jti (expires_at is a datetime)."""
+        if not getattr(settings, 'JWT_BLACKLIST_FILTER_ENABLED', True):
+            return
+        # Tried even while checks are paused: a jti missing from a bitmap
+        # that is still in use would be reported as not blacklisted.
+        try:
+            if self._add_script is None:
+                self._add_script = self.client.register_script(_ADD_SCRIPT)
+            self._add_script(
+                keys=[BLOOM_KEY, JTIS_KEY], args=[jti, expires_at.timestamp(), *_offsets(jti, self.size)]
+            )
+        except Exception as exc:
+            self._redis_failed(exc)
+            self._invalidate()
+
+    def rebuild(self, batch_size=5000):
+        """
+        Rebuild the bitmap and exact set from BlacklistedToken rows that
+        have not expired. Returns the number of jtis loaded.
+        """
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        started = timezone.now()
+        bitmap = bytearray(self._bitmap_length)
+        bloom_tmp, jtis_tmp = f'{BLOOM_KEY}:rebuild', f'{JTIS_KEY}:rebuild'
+        client = self.client
+        client.delete(jtis_tmp)
+
+        count = 0
+        rows = BlacklistedToken.objects.filter(
+            token__expires_at__gt=started
+        ).values_list('token__jti', 'token__expires_at')
+        batch = {}
+        for jti, expires_at in rows.iterator(chunk_size=batch_size):
+            for offset in _offsets(jti, self.size):
+                _set_bit(bitmap, offset)
+            batch[jti] = expires_at.timestamp()
+            count += 1
+            if len(batch) >= batch_size:
+                client.zadd(jtis_tmp, batch)
+                batch = {}
+        if batch:
+            client.zadd(jtis_tmp, batch)
+
+        pipe = client.pipeline(transaction=True)
+        pipe.set(bloom_tmp, bytes(bitmap))
+        pipe.rename(bloom_tmp, BLOOM_KEY)
+        if count:
+            pipe.rename(jtis_tmp, JTIS_KEY)
+        else:
+            pipe.delete(JTIS_KEY)
+        pipe.execute()
+        self._invalidate_pending = False
+
+        # Tokens blacklisted while the rebuild ran were written to the old
+        # keys. blacklisted_at is stamped before the row commits, so a token
+        # stamped shortly before `started` may still have been invisible to
+        # the snapshot; look back far enough to cover any open transaction.
+        overlap = timedelta(seconds=getattr(settings, 'JWT_BLACKLIST_REBUILD_OVERLAP_SECONDS', 300))
+        for jti, expires_at in BlacklistedToken.objects.filter(
+            blacklisted_at__gte=started - overlap
+        ).values_list('token__jti', 'token__expires_at'):
+            self.add(jti, expires_at)
+        return count
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def _on_token_blacklisted(sender, instance, created, **kwargs):
+    if not created:
+        return
+    token = instance.token
+    transaction.on_commit(lambda: blacklist_filter.add(token.jti, token.expires_at))
+
+
+post_save.connect(
+    _on_token_blacklisted,
+    sender='token_blacklist.BlacklistedToken',
+    dispatch_uid='jwt_blacklist_filter_add',
+)
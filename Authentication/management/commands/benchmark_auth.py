@@ -0,0 +1,156 @@
+"""
+Management command to benchmark the authentication endpoints.
+
+Times the configured password hashers, then drives login, register,
+token refresh and /me through the full middleware and DRF stack with an
+in-process test client, reporting wall time and queries per request.
+Throttling is disabled for the run and every row written is rolled back.
+
+Usage:
+    python manage.py benchmark_auth
+    python manage.py benchmark_auth --requests 50 --hashers pbkdf2,scrypt
+"""
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+PASSWORD = 'benchmark-Passw0rd'
+HASHERS = {
+    'pbkdf2': 'pbkdf2_sha256',
+    'argon2': 'argon2',
+    'scrypt': 'scrypt',
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark password hashing and the auth endpoints (dry run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Requests per endpoint')
+        parser.add_argument(
+            '--hashers',
+            default=','.join(HASHERS),
+            help='Comma-separated hashers to time (pbkdf2, argon2, scrypt)'
+        )
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        if count < 1:
+            raise CommandError('--requests must be at least 1')
+
+        self.stdout.write(f'Active hasher: {get_hasher().algorithm} (PASSWORD_HASHER={settings.PASSWORD_HASHER})')
+        self._time_hashers([name.strip() for name in options['hashers'].split(',') if name.strip()])
+
+        rows = {}
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['*']), \
+                    mock.patch('rest_framework.views.APIView.check_throttles'):
+                rows = self._run_endpoints(count)
+                raise _Rollback
+        except _Rollback:
+            pass
+        self._report(rows)
+
+    # ------------------------------------------------------------------
+    # Hashers
+    # ------------------------------------------------------------------
+
+    def _time_hashers(self, names):
+        self.stdout.write('\n=== Password hashers ===')
+        for name in names:
+            if name not in HASHERS:
+                raise CommandError(f'Unknown hasher {name!r}, expected one of {", ".join(HASHERS)}')
+            try:
+                hasher = get_hasher(HASHERS[name])
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as exc:
+                # Not listed in PASSWORD_HASHERS, or its library is missing.
+                self.stdout.write(f'  {name:7s}: unavailable ({exc})')
+                continue
+            timings = []
+            for _ in range(5):
+                began = time.perf_counter()
+                hasher.verify(PASSWORD, encoded)
+                timings.append((time.perf_counter() - began) * 1000)
+            self.stdout.write(
+                f'  {name:7s}: verify mean {sum(timings) / len(timings):.1f}ms  '
+                f'max {max(timings):.1f}ms  ({encoded.rsplit("$", 2)[0]})'
+            )
+
+    # ------------------------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------------------------
+
+    def _run_endpoints(self, count):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from users.models import UserProfile
+
+        client = APIClient()
+        encoded = get_hasher().encode(PASSWORD, get_hasher().salt())
+        users = User.objects.bulk_create([
+            User(username=f'benchmark-auth-{i}', email=f'benchmark-auth-{i}@example.invalid', password=encoded)
+            for i in range(count)
+        ])
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+
+        rows = {'login': [], 'register': [], 'refresh': [], 'me': []}
+        refresh_tokens = []
+        for i, user in enumerate(users):
+            response, row = self._request(
+                client.post, '/api/auth/login/', {'email': user.email, 'password': PASSWORD}
+            )
+            rows['login'].append(row)
+            tokens = response.data['tokens']
+            refresh_tokens.append(tokens['refresh'])
+
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+            rows['me'].append(self._request(client.get, '/api/auth/me/')[1])
+            client.credentials()
+
+            rows['register'].append(self._request(client.post, '/api/auth/register/', {
+                'username': f'benchmark-new-{i}',
+                'email': f'benchmark-new-{i}@example.invalid',
+                'password': PASSWORD,
+                'password_confirm': PASSWORD,
+            })[1])
+
+        for token in refresh_tokens:
+            rows['refresh'].append(self._request(client.post, '/api/auth/refresh_token/', {'refresh': token})[1])
+        return rows
+
+    def _request(self, method, path, data=None):
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            began = time.perf_counter()
+            response = method(path, data, format='json') if data is not None else method(path)
+            elapsed = time.perf_counter() - began
+        if response.status_code >= 400:
+            raise CommandError(f'{path} returned {response.status_code}: {getattr(response, "data", "")}')
+        return response, (elapsed * 1000, len(ctx.captured_queries))
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def _report(self, rows):
+        self.stdout.write('\n=== Auth endpoints ===')
+        for name, samples in rows.items():
+            if not samples:
+                continue
+            timings = sorted(elapsed for elapsed, _ in samples)
+            queries = [count for _, count in samples]
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(
+                f'  {name:8s}: mean {sum(timings) / len(timings):7.1f}ms  p95 {p95:7.1f}ms  '
+                f'max {timings[-1]:7.1f}ms  queries mean {sum(queries) / len(queries):.1f} max {max(queries)}'
+            )
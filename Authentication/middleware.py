@@ -8,9 +8,10 @@ from django.utils import timezone
 from datetime import timedelta
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .blacklist import blacklist_filter
+
 
 class JWTAuthenticationMiddleware:
     """
@@ -100,11 +101,14 @@ class JWTAuthTokenBlacklistMiddleware:
     def is_token_blacklisted(token):
         """
         Check if the token is blacklisted.
+
+        Answered from the blacklist bloom filter; only possible hits are
+        confirmed (see Authentication.blacklist).
         """
         try:
             jti = token.get('jti')
             if jti:
-                return BlacklistedToken.objects.filter(token__jti=jti).exists()
+                return blacklist_filter.contains(jti)
         except Exception:
             pass
         return False
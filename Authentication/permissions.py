@@ -9,11 +9,19 @@ from rest_framework.permissions import BasePermission, IsAuthenticated, AllowAny
 
 
 def is_imam_user(user):
-    return bool(
-        user
-        and user.is_authenticated
-        and user.groups.filter(name="Imam").exists()
-    )
+    """
+    Whether the user is in the Imam group.
+
+    The answer is cached on the user object, so it costs at most one query
+    per request; users built from a stateless token's claims get it from
+    the `is_imam` claim and cost none.
+    """
+    if not (user and user.is_authenticated):
+        return False
+    is_imam = getattr(user, '_is_imam', None)
+    if is_imam is None:
+        is_imam = user._is_imam = user.groups.filter(name="Imam").exists()
+    return is_imam
 
 
 class IsAuthenticatedOrReadOnly(permissions.BasePermission):
@@ -3,7 +3,8 @@ from django.contrib.auth.models import User
 from django.contrib.auth.models import Group
 from django.contrib.auth import authenticate
 from django.utils import timezone
-from rest_framework_simplejwt.tokens import RefreshToken
+from .permissions import is_imam_user
+from .tokens import RefreshToken
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth.tokens import default_token_generator
@@ -49,11 +50,13 @@ class LoginSerializer(serializers.Serializer):
         password = data.get('password')
         
         if identifier and password:
-            # Allow login with either email or username
-            user = User.objects.filter(email__iexact=identifier).first()
+            # Allow login with either email or username. The profile is
+            # fetched along, since the response includes the profile image.
+            users = User.objects.select_related('profile')
+            user = users.filter(email__iexact=identifier).first()
 
             if not user:
-                user = User.objects.filter(username__iexact=identifier).first()
+                user = users.filter(username__iexact=identifier).first()
             
             if not user:
                 raise serializers.ValidationError("Invalid email or password.")
@@ -90,10 +93,20 @@ class TokenRefreshSerializer(serializers.Serializer):
     
     def validate(self, data):
         from rest_framework_simplejwt.exceptions import TokenError
+        from rest_framework_simplejwt.settings import api_settings
         
         try:
             refresh = RefreshToken(data['refresh'])
             
+            # The claims were written at login; recompute them so role
+            # changes and deactivation take effect on the next refresh.
+            user = User.objects.filter(
+                **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+            ).first()
+            if user is None or not user.is_active:
+                raise serializers.ValidationError({'refresh': 'User not found or inactive.'})
+            refresh.set_role_claims(user)
+            
             # Create new tokens
             data['tokens'] = {
                 'refresh': str(refresh),
@@ -101,6 +114,8 @@ class TokenRefreshSerializer(serializers.Serializer):
             }
             
             return data
+        except serializers.ValidationError:
+            raise
         except TokenError as e:
             raise serializers.ValidationError({'refresh': f'Invalid or expired refresh token: {str(e)}'})
         except Exception as e:
@@ -143,7 +158,7 @@ class UserSerializer(serializers.ModelSerializer):
         return None
 
     def get_is_imam(self, obj):
-        return obj.groups.filter(name='Imam').exists()
+        return is_imam_user(obj)
 
     def get_user_type(self, obj):
         return 'imam' if self.get_is_imam(obj) else 'user'
@@ -0,0 +1,79 @@
+"""
+Celery tasks for authentication.
+"""
+import logging
+
+from celery import shared_task
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def prune_token_blacklist(batch_size=1000):
+    """
+    Delete expired outstanding (and, by cascade, blacklisted) tokens in
+    batches, then rebuild the blacklist bloom filter from what is left.
+    """
+    from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+    from Authentication.blacklist import blacklist_filter
+
+    now = timezone.now()
+    expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by('id')
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            deleted += OutstandingToken.objects.filter(id__in=ids).delete()[1].get(
+                OutstandingToken._meta.label, 0
+            )
+
+    try:
+        loaded = blacklist_filter.rebuild()
+    except Exception as exc:
+        logger.warning("Token blacklist filter not rebuilt: %s", exc)
+        loaded = None
+
+    logger.info(f"Pruned {deleted} expired tokens, {loaded} blacklisted tokens in the filter")
+    return {'status': 'success', 'deleted_count': deleted, 'filter_size': loaded}
+
+
+@shared_task
+def send_password_reset_email(user_id, reset_url):
+    """Email a password reset link to the user."""
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.mail import send_mail
+    from push_notification.task_metrics import external_call
+
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user is None or not user.email:
+        logger.warning(f"Password reset email skipped, user {user_id} has no email")
+        return {'status': 'skipped'}
+
+    subject = "🔐 Password Reset Request - Salahtime"
+    message = (
+        f"Assalamu Alaikum {user.get_full_name() or user.username},\n\n"
+        "We received a request to reset your Salahtime account password.\n\n"
+        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
+        "👇 Click this link to set your new password:\n\n"
+        f"{reset_url}\n"
+        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+        "⏱ This link will expire in 1 hour for security reasons.\n\n"
+        "🚫 If you did not request a password reset, please ignore this email.\n\n"
+        "Jazakallahu Khair,\n"
+        f"{getattr(settings, 'SITE_NAME', 'Salahtime')} Team"
+    )
+
+    with external_call('smtp'):
+        send_mail(
+            subject,
+            message,
+            getattr(settings, "DEFAULT_FROM_EMAIL", "noreply@example.com"),
+            [user.email],
+            fail_silently=False,
+        )
+    return {'status': 'success'}
@@ -1,3 +1,121 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import StatelessJWTAuthentication, user_row_cache
+from .tasks import send_password_reset_email
+from .tokens import RefreshToken
+
+
+class ImamClaimTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='imam', email='imam@example.com', password='pass12345')
+        self.user.groups.add(Group.objects.create(name='Imam'))
+        self.client = APIClient()
+
+    def test_token_carries_imam_claim(self):
+        refresh = RefreshToken.for_user(self.user)
+        self.assertTrue(refresh['is_imam'])
+        self.assertTrue(refresh.access_token['is_imam'])
+
+    def test_authenticated_request_runs_one_group_query(self):
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/auth/me/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_imam'])
+        self.assertEqual(response.data['user_type'], 'imam')
+        group_queries = [q['sql'] for q in ctx.captured_queries if 'auth_user_groups' in q['sql']]
+        self.assertEqual(len(group_queries), 1)
+
+    def test_refresh_recomputes_imam_claim(self):
+        refresh = RefreshToken.for_user(self.user)
+        self.user.groups.clear()
+
+        response = self.client.post('/api/auth/refresh_token/', {'refresh': str(refresh)}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.data['tokens']['access'])
+        self.assertFalse(access['is_imam'])
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass12345', is_staff=True)
+        self.access = str(RefreshToken.for_user(self.user).access_token)
+        self.factory = APIRequestFactory()
+        user_row_cache.clear()
+
+    def _authenticate(self, method):
+        request = Request(
+            getattr(self.factory, method)('/', HTTP_AUTHORIZATION=f'Bearer {self.access}'),
+            parser_context={'view': None},
+        )
+        return StatelessJWTAuthentication().authenticate(request)[0]
+
+    def test_read_uses_claims_without_query(self):
+        with self.assertNumQueries(0):
+            user = self._authenticate('get')
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(user.is_staff)
+        self.assertFalse(user._is_imam)
+
+    def test_read_rejects_inactive_claim(self):
+        refresh = RefreshToken.for_user(self.user)
+        refresh['is_active'] = False
+        self.access = str(refresh.access_token)
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate('get')
+
+    def test_write_loads_user_once_then_caches(self):
+        with self.assertNumQueries(1):
+            user = self._authenticate('post')
+        self.assertEqual(user.username, 'reader')
+        with self.assertNumQueries(0):
+            self.assertEqual(self._authenticate('post').username, 'reader')
+
+
+class ForgotPasswordTests(TestCase):
+
+    def test_sends_reset_email_from_a_task(self):
+        from django.core import mail
+
+        User.objects.create_user(username='forgetful', email='forgetful@example.com', password='pass12345')
+        with mock.patch('push_notification.enqueue.enqueue_task', return_value='queued') as enqueue:
+            response = self.client.post(
+                '/api/auth/forgot_password/', {'email': 'forgetful@example.com'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+
+        task, user_id, reset_url = enqueue.call_args.args
+        self.assertEqual(task, send_password_reset_email)
+        task.apply(args=[user_id, reset_url])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['forgetful@example.com'])
+        self.assertIn('/reset-password?uid=', mail.outbox[0].body)
+
+    def test_unknown_email_queues_nothing(self):
+        with mock.patch('push_notification.enqueue.enqueue_task') as enqueue:
+            response = self.client.post(
+                '/api/auth/forgot_password/', {'email': 'nobody@example.com'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        enqueue.assert_not_called()
 
-# Create your tests here.
+    def test_rejects_invalid_email(self):
+        response = self.client.post('/api/auth/forgot_password/', {'email': 'nope'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
@@ -0,0 +1,36 @@
+"""
+JWT token classes carrying the user's role claims.
+
+Tokens issued through RefreshToken.for_user() embed `is_active`,
+`is_imam`, `is_staff` and `is_superuser`, so StatelessJWTAuthentication can skip the user lookup
+on reads. Access tokens derived from the refresh token copy the claims, so
+the refresh endpoint recomputes them from the database (set_role_claims)
+before issuing a new access token.
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+
+from .blacklist import blacklist_filter
+from .permissions import is_imam_user
+
+
+class RefreshToken(BaseRefreshToken):
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_role_claims(user)
+        return token
+
+    def set_role_claims(self, user):
+        self['is_active'] = user.is_active
+        self['is_imam'] = is_imam_user(user)
+        self['is_staff'] = user.is_staff
+        self['is_superuser'] = user.is_superuser
+
+    def check_blacklist(self):
+        # Same check as simplejwt's, answered from the bloom filter.
+        if blacklist_filter.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
@@ -3,10 +3,8 @@ from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
 from django.conf import settings
-from django.core.mail import send_mail
 from django.db.models import Q
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
@@ -21,6 +19,7 @@ from .serializers import (
     ResetPasswordSerializer,
     ImamCreateSerializer,
 )
+from .tokens import RefreshToken
 import logging
 
 
@@ -32,6 +31,7 @@ class AuthViewSet(viewsets.GenericViewSet):
     ViewSet for authentication endpoints.
     """
     permission_classes = [AllowAny]
+    stateless_auth = False
     serializer_class = LoginSerializer
     
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
@@ -71,7 +71,13 @@ class AuthViewSet(viewsets.GenericViewSet):
     def forgot_password(self, request):
         """
         Start forgot password flow by emailing a reset link.
+
+        The email is sent by a Celery task, so the response never waits
+        on the SMTP round trip.
         """
+        from push_notification.enqueue import enqueue_task
+        from .tasks import send_password_reset_email
+
         serializer = ForgotPasswordSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
@@ -95,38 +101,17 @@ class AuthViewSet(viewsets.GenericViewSet):
             reset_path = f"/reset-password?uid={uid}&token={token}"
             reset_url = f"{frontend_base}{reset_path}"
 
-            subject = "🔐 Password Reset Request - Salahtime"
-            message = (
-                f"Assalamu Alaikum {user.get_full_name() or user.username},\n\n"
-                "We received a request to reset your Salahtime account password.\n\n"
-                "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-                "👇 Click this link to set your new password:\n\n"
-                f"{reset_url}\n"
-                "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-                "⏱ This link will expire in 1 hour for security reasons.\n\n"
-                "🚫 If you did not request a password reset, please ignore this email.\n\n"
-                "Jazakallahu Khair,\n"
-                f"{getattr(settings, 'SITE_NAME', 'Salahtime')} Team"
-            )
-
-            email_sent = False
+            email_queued = False
             try:
-                sent_count = send_mail(
-                    subject,
-                    message,
-                    getattr(settings, "DEFAULT_FROM_EMAIL", "noreply@example.com"),
-                    [email],
-                    fail_silently=False,
-                )
-                email_sent = sent_count > 0
+                email_queued = enqueue_task(send_password_reset_email, user.pk, reset_url) in ('queued', 'inline')
             except Exception as exc:
                 # We still return success so the user isn't blocked by email issues
-                logger.exception("Password reset email sending failed for %s", email)
+                logger.exception("Password reset email could not be queued for %s", email)
                 response_payload["debug_error"] = str(exc)
 
             if getattr(settings, "DEBUG", False):
                 response_payload["reset_url"] = reset_url
-                response_payload["email_sent"] = email_sent
+                response_payload["email_sent"] = email_queued
                 response_payload["email_backend"] = getattr(settings, "EMAIL_BACKEND", "")
         elif getattr(settings, "DEBUG", False):
             response_payload["email_sent"] = False
@@ -301,6 +286,7 @@ class UserTokenViewSet(viewsets.GenericViewSet):
     ViewSet for managing user tokens.
     """
     permission_classes = [IsAuthenticated]
+    stateless_auth = False
     
     @action(detail=False, methods=['get'])
     def refresh(self, request):
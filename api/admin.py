@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Location, UserPreference, SupportMessage, SiteSettings
+from .models import Location, UserPreference, SupportMessage, SiteSettings, MediaBlob
 from unfold.admin import ModelAdmin
 
 @admin.register(Location)
@@ -44,3 +44,12 @@ class SiteSettingsAdmin(ModelAdmin):
         SiteSettings.get()
         return super().changelist_view(request, extra_context)
 
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(ModelAdmin):
+    list_display = ['path', 'size', 'ref_count', 'unreferenced_at', 'created_at']
+    search_fields = ['digest', 'path']
+    readonly_fields = ['digest', 'path', 'size', 'ref_count', 'unreferenced_at', 'created_at']
+
+    def has_add_permission(self, request):
+        return False
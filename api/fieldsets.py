@@ -0,0 +1,254 @@
+"""
+Sparse fieldsets: ?fields= and ?expand= on read endpoints.
+
+    GET /api/mosques/?fields=id,name,latitude,longitude
+    GET /api/mosques/12/?fields=id,name,city&expand=city
+
+?fields= limits the response to the named fields. ?expand= swaps a field
+for a nested representation, or adds one, from the serializer's
+get_expandable_fields(). Unknown names are a 400.
+
+The selection is pushed into the query. Only the columns the remaining
+fields read are loaded (.only()), and select_related/prefetch_related
+are rebuilt to match. When every selected field is a plain column,
+list() reads tuples with .values_list() and formats them with the
+serializer's field objects. No model instance or per-row serializer
+work is done.
+
+Serializers opt in with SparseFieldsetSerializerMixin. SerializerMethodFields
+must declare what they read in `sparse_sources`; if one does not, the
+queryset is left unprojected. Views opt in with SparseFieldsetMixin.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import FileField
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import PKOnlyObject, PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def _split(value):
+    names = []
+    for name in (value or '').split(','):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Accepts `fields` and `expand` keyword arguments (sequences of field
+    names) and narrows or extends the serializer's fields to match.
+    """
+    # SerializerMethodField name -> sources it reads, as dotted paths
+    sparse_sources = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sparse_fields = fields
+        self._sparse_expand = expand or ()
+
+    def get_expandable_fields(self):
+        """Field name -> unbound field used when the name is in ?expand=."""
+        return {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self._sparse_expand:
+            expandable = self.get_expandable_fields()
+            unknown = [name for name in self._sparse_expand if name not in expandable]
+            if unknown:
+                raise ValidationError({EXPAND_PARAM: [
+                    f"Cannot expand {', '.join(unknown)}. Expandable: {', '.join(expandable) or 'none'}."
+                ]})
+            for name in self._sparse_expand:
+                fields[name] = expandable[name]
+        if self._sparse_fields:
+            unknown = [name for name in self._sparse_fields if name not in fields]
+            if unknown:
+                raise ValidationError({FIELDS_PARAM: [
+                    f"Unknown field(s): {', '.join(unknown)}."
+                ]})
+            wanted = set(self._sparse_fields).union(self._sparse_expand)
+            fields = {name: field for name, field in fields.items() if name in wanted}
+        return fields
+
+
+class Projection:
+    """
+    What a serializer's readable fields need from the database: columns for
+    .only(), relations to select or prefetch, and, when every field is a
+    plain column, the (name, lookup, field) triples for the flat path.
+    """
+
+    def __init__(self, serializer):
+        model = serializer.Meta.model
+        self.columns = {model._meta.pk.name}
+        self.select_related = set()
+        self.prefetch_related = set()
+        self.complete = True
+        self.flat = []
+        self._add_serializer(serializer, model, prefix='')
+
+    def _add_serializer(self, serializer, model, prefix):
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*':
+                sources = getattr(serializer, 'sparse_sources', {}).get(name)
+                if sources is None:
+                    self.complete = False
+                    sources = ()
+                self.flat = None
+                for source in sources:
+                    self._add_source(model, prefix, source.split('.'), None, None)
+            else:
+                self._add_source(model, prefix, field.source_attrs, name, field)
+
+    def _add_source(self, model, prefix, attrs, name, field):
+        opts = model._meta
+        path = []
+        for position, attr in enumerate(attrs):
+            last = position == len(attrs) - 1
+            try:
+                model_field = opts.get_field(attr)
+            except FieldDoesNotExist:
+                # A property or method on the model: its inputs are unknown
+                self.complete = False
+                self.flat = None
+                return
+            path.append(attr)
+            lookup = prefix + '__'.join(path)
+
+            if model_field.is_relation and (
+                model_field.many_to_many or model_field.one_to_many or not model_field.concrete
+            ):
+                # Reverse or many-to-many: loaded separately, not narrowed
+                self.prefetch_related.add(lookup)
+                self.flat = None
+                return
+
+            if model_field.is_relation:
+                if not last:
+                    if model_field.null:
+                        # DRF omits the field when the relation is empty;
+                        # a joined NULL can't tell that apart from a NULL column.
+                        self.flat = None
+                    opts = model_field.related_model._meta
+                    continue
+                self.columns.add(lookup)
+                if isinstance(field, BaseSerializer):
+                    self.select_related.add(lookup)
+                    self.columns.add(f'{lookup}__{model_field.related_model._meta.pk.name}')
+                    self.flat = None
+                    self._add_serializer(field, model_field.related_model, prefix=f'{lookup}__')
+                elif isinstance(field, PrimaryKeyRelatedField):
+                    self._add_flat(name, lookup, field)
+                else:
+                    self.select_related.add(lookup)
+                    self.flat = None
+                return
+
+            if not last:
+                self.complete = False
+                self.flat = None
+                return
+            self.columns.add(lookup)
+            if len(path) > 1:
+                self.select_related.add(prefix + '__'.join(path[:-1]))
+            if field is None or isinstance(model_field, FileField):
+                self.flat = None
+            else:
+                self._add_flat(name, lookup, field)
+
+    def _add_flat(self, name, lookup, field):
+        if self.flat is not None and name is not None:
+            self.flat.append((name, lookup, field))
+
+    def apply(self, queryset):
+        if not self.complete:
+            # Some field reads something we can't see; keep the view's own
+            # loading and only add what we know is needed.
+            if self.select_related:
+                queryset = queryset.select_related(*sorted(self.select_related))
+            return queryset.prefetch_related(*sorted(self.prefetch_related))
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*sorted(self.prefetch_related))
+        return queryset.only(*sorted(self.columns))
+
+    @property
+    def lookups(self):
+        return [lookup for _, lookup, _ in self.flat]
+
+    def represent(self, rows):
+        """Serialize .values_list(*self.lookups) rows."""
+        fields = [
+            (name, field, isinstance(field, PrimaryKeyRelatedField))
+            for name, _, field in self.flat
+        ]
+        data = []
+        for row in rows:
+            item = {}
+            for (name, field, by_pk), value in zip(fields, row):
+                if value is None:
+                    item[name] = None
+                else:
+                    item[name] = field.to_representation(PKOnlyObject(pk=value) if by_pk else value)
+            data.append(item)
+        return data
+
+
+class SparseFieldsetMixin:
+    """
+    ViewSet mixin that passes ?fields= and ?expand= to the serializer for
+    `sparse_actions` and projects the queryset to match.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_sparse_fieldset(self):
+        """(fields, expand) from the query string, or None when neither is given."""
+        if not hasattr(self, '_sparse_fieldset'):
+            params = self.request.query_params
+            fields, expand = _split(params.get(FIELDS_PARAM)), _split(params.get(EXPAND_PARAM))
+            applies = self.action in self.sparse_actions and (fields or expand)
+            self._sparse_fieldset = (fields, expand) if applies else None
+        return self._sparse_fieldset
+
+    def get_serializer(self, *args, **kwargs):
+        fieldset = self.get_sparse_fieldset()
+        if fieldset is not None:
+            kwargs.setdefault('fields', fieldset[0])
+            kwargs.setdefault('expand', fieldset[1])
+        return super().get_serializer(*args, **kwargs)
+
+    def get_projection(self):
+        if not hasattr(self, '_projection'):
+            self._projection = None
+            if self.get_sparse_fieldset() is not None:
+                self._projection = Projection(self.get_serializer())
+        return self._projection
+
+    def project_queryset(self, queryset):
+        projection = self.get_projection()
+        return queryset if projection is None else projection.apply(queryset)
+
+    def filter_queryset(self, queryset):
+        return self.project_queryset(super().filter_queryset(queryset))
+
+    def list(self, request, *args, **kwargs):
+        projection = self.get_projection()
+        if projection is None or not projection.flat:
+            return super().list(request, *args, **kwargs)
+
+        rows = self.filter_queryset(self.get_queryset()).values_list(*projection.lookups)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(projection.represent(page))
+        return Response(projection.represent(rows))
@@ -0,0 +1,90 @@
+"""
+Management command to measure how long media requests occupy a worker.
+
+Writes throwaway files of the given sizes under MEDIA_ROOT, requests them
+through the full middleware stack with each MEDIA_DELIVERY mode, and
+drains the response body the way a WSGI server would. The time until the
+last byte leaves Django is the worker occupancy. With x-accel or
+x-sendfile, that body is empty and the front server sends the file.
+
+Usage:
+    python manage.py benchmark_media
+    python manage.py benchmark_media --sizes 64K,1M,5M --requests 100
+"""
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+MODES = ['django', 'x-accel', 'x-sendfile']
+UNITS = {'K': 1024, 'M': 1024 * 1024}
+
+
+def _parse_size(value):
+    value = value.strip().upper()
+    if value and value[-1] in UNITS:
+        return int(float(value[:-1]) * UNITS[value[-1]])
+    return int(value)
+
+
+class Command(BaseCommand):
+    help = 'Compare worker occupancy of the media delivery modes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='16K,512K,5M', help='Comma-separated file sizes (K/M suffixes)')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per size and mode')
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        if count < 1:
+            raise CommandError('--requests must be at least 1')
+        try:
+            sizes = [_parse_size(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError as exc:
+            raise CommandError(f'Invalid --sizes: {exc}')
+
+        directory = os.path.join(settings.MEDIA_ROOT, 'benchmark')
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        try:
+            for size in sizes:
+                name = f'benchmark/{uuid.uuid4().hex}.jpg'
+                with open(os.path.join(settings.MEDIA_ROOT, name), 'wb') as fh:
+                    fh.write(os.urandom(size))
+                paths.append((size, name))
+            self._run(paths, count)
+        finally:
+            for _, name in paths:
+                os.remove(os.path.join(settings.MEDIA_ROOT, name))
+            if not os.listdir(directory):
+                os.rmdir(directory)
+
+    def _run(self, paths, count):
+        client = Client()
+        self.stdout.write(f'\n=== Media delivery: worker time per request ({count} requests each) ===')
+        for size, name in paths:
+            url = f'{settings.MEDIA_URL}{name}'
+            for mode in MODES:
+                timings = []
+                body_bytes = 0
+                with override_settings(MEDIA_DELIVERY=mode, ALLOWED_HOSTS=['*']):
+                    for _ in range(count):
+                        began = time.perf_counter()
+                        response = client.get(url)
+                        body_bytes = sum(len(chunk) for chunk in response) if response.streaming \
+                            else len(response.content)
+                        response.close()
+                        timings.append((time.perf_counter() - began) * 1000)
+                        if response.status_code != 200:
+                            raise CommandError(f'{url} returned {response.status_code} in {mode} mode')
+                timings.sort()
+                mean = sum(timings) / len(timings)
+                self.stdout.write(
+                    f'  {size / 1024:8.0f} KiB  {mode:10s}: mean {mean:7.2f}ms  '
+                    f'p95 {timings[min(len(timings) - 1, int(len(timings) * 0.95))]:7.2f}ms  '
+                    f'body from worker {body_bytes:>9d} B  ~{1000 / mean:7.0f} req/s per worker'
+                )
@@ -0,0 +1,116 @@
+"""
+Management command to load-test a running server with mixed traffic.
+
+Fires weighted requests from a pool of client threads at --url for
+--duration seconds and reports throughput and latency percentiles per
+endpoint. Run it once against each deployment profile to compare them:
+
+    GUNICORN_PROFILE=sync GUNICORN_BIND=127.0.0.1:8001 gunicorn -c gunicorn_config.py
+    GUNICORN_PROFILE=asgi GUNICORN_BIND=127.0.0.1:8002 gunicorn -c gunicorn_config.py
+
+    python manage.py load_test --url http://127.0.0.1:8001 --label sync
+    python manage.py load_test --url http://127.0.0.1:8002 --label asgi
+
+DRF throttling applies to the load generator too; raise THROTTLE_ANON_RATE
+and THROTTLE_USER_RATE on the servers under test.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# weight, method, path, JSON body
+DEFAULT_MIX = [
+    (4, 'GET', '/api/mosques/', None),
+    (3, 'GET', '/api/mosques/?search=masjid', None),
+    (2, 'GET', '/health/', None),
+    (1, 'GET', '/', None),
+    (1, 'POST', '/api/auth/forgot_password/', {'email': 'load-test@example.invalid'}),
+]
+
+
+def _percentile(sorted_values, quantile):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * quantile))]
+
+
+class Command(BaseCommand):
+    help = 'Load-test a running server with a weighted mix of requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server under test')
+        parser.add_argument('--concurrency', type=int, default=50, help='Client threads')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+        parser.add_argument(
+            '--mix',
+            default=None,
+            help='JSON list of [weight, method, path, body] entries (default: mixed public endpoints)'
+        )
+        parser.add_argument('--label', default='', help='Label printed with the results')
+
+    def handle(self, *args, **options):
+        import requests
+
+        mix = DEFAULT_MIX
+        if options['mix']:
+            try:
+                mix = [tuple(entry) for entry in json.loads(options['mix'])]
+            except (ValueError, TypeError) as exc:
+                raise CommandError(f'Invalid --mix: {exc}')
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+
+        base_url = options['url'].rstrip('/')
+        weights = [entry[0] for entry in mix]
+        deadline = time.monotonic() + options['duration']
+        results = defaultdict(list)
+        statuses = defaultdict(Counter)
+        lock = threading.Lock()
+
+        def client(seed):
+            rng = random.Random(seed)
+            session = requests.Session()
+            while time.monotonic() < deadline:
+                _, method, path, body = rng.choices(mix, weights)[0]
+                started = time.perf_counter()
+                try:
+                    response = session.request(method, base_url + path, json=body, timeout=options['timeout'])
+                    status = response.status_code
+                except requests.RequestException as exc:
+                    status = type(exc).__name__
+                elapsed = time.perf_counter() - started
+                with lock:
+                    results[f'{method} {path}'].append(elapsed)
+                    statuses[f'{method} {path}'][status] += 1
+
+        threads = [threading.Thread(target=client, args=(seed,), daemon=True) for seed in range(options['concurrency'])]
+        began = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.monotonic() - began
+
+        self._report(options['label'] or base_url, options['concurrency'], wall, results, statuses)
+
+    def _report(self, label, concurrency, wall, results, statuses):
+        total = sum(len(samples) for samples in results.values())
+        self.stdout.write(f'\n=== Load test: {label} ({concurrency} clients, {wall:.1f}s) ===')
+        self.stdout.write(f'  Requests: {total}  Throughput: {total / wall:.1f} req/s')
+        everything = sorted(elapsed for samples in results.values() for elapsed in samples)
+        if everything:
+            self.stdout.write(
+                f'  Latency : p50 {_percentile(everything, 0.5) * 1000:.1f}ms  '
+                f'p95 {_percentile(everything, 0.95) * 1000:.1f}ms  '
+                f'p99 {_percentile(everything, 0.99) * 1000:.1f}ms'
+            )
+        for endpoint, samples in sorted(results.items()):
+            samples.sort()
+            codes = ' '.join(f'{code}:{count}' for code, count in sorted(statuses[endpoint].items(), key=str))
+            self.stdout.write(
+                f'  {endpoint:45s} n={len(samples):6d}  p50 {_percentile(samples, 0.5) * 1000:8.1f}ms  '
+                f'p95 {_percentile(samples, 0.95) * 1000:8.1f}ms  [{codes}]'
+            )
@@ -0,0 +1,105 @@
+"""
+In-process request metrics.
+
+Fixed-bucket histograms keyed by (view, method), filled by
+api.middleware.RequestMetricsMiddleware and rendered in the Prometheus text
+exposition format by the admin-only metrics endpoint. Each worker process
+keeps its own registry, so scrape every worker (or aggregate by instance).
+"""
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with Prometheus semantics."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        with self._lock:
+            return {labels: ([*counts], total, count) for labels, (counts, total, count) in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self, label_names):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for labels, (counts, total, count) in sorted(self.collect().items()):
+            label_text = ','.join(
+                f'{name}="{_escape(value)}"' for name, value in zip(label_names, labels)
+            )
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+LABEL_NAMES = ('view', 'method')
+
+request_latency = Histogram(
+    'salahtime_http_request_duration_seconds',
+    'Total request latency',
+    LATENCY_BUCKETS,
+)
+request_db_time = Histogram(
+    'salahtime_http_request_db_seconds',
+    'Time spent executing SQL per request',
+    LATENCY_BUCKETS,
+)
+request_render_time = Histogram(
+    'salahtime_http_request_render_seconds',
+    'Time spent rendering (serializing) the response',
+    LATENCY_BUCKETS,
+)
+request_queries = Histogram(
+    'salahtime_http_request_queries',
+    'SQL queries executed per request',
+    QUERY_BUCKETS,
+)
+
+HISTOGRAMS = [request_latency, request_db_time, request_render_time, request_queries]
+
+
+def observe_request(view, method, latency, db_time, render_time, queries):
+    labels = (view, method)
+    request_latency.observe(labels, latency)
+    request_db_time.observe(labels, db_time)
+    request_render_time.observe(labels, render_time)
+    request_queries.observe(labels, queries)
+
+
+def render_prometheus():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render(LABEL_NAMES))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,160 @@
+"""
+Request instrumentation middleware.
+
+Records per-view query count, SQL time, response render time and total
+latency into the in-process histograms in api.metrics. Requests over the
+configured query or latency budget are sampled and logged with their
+slowest statements.
+
+Settings:
+    REQUEST_METRICS_ENABLED          turn the middleware off entirely
+    REQUEST_QUERY_BUDGET             queries per request before logging
+    REQUEST_LATENCY_BUDGET_MS        milliseconds per request before logging
+    REQUEST_BUDGET_LOG_SAMPLE_RATE   fraction of over-budget requests logged
+"""
+import contextvars
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _RequestStats:
+    __slots__ = ('queries', 'db_time', 'statements', 'render_started', 'render_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = []
+        self.render_started = None
+        self.render_time = 0.0
+
+
+# Stats of the request being handled. Context variables follow the request
+# into sync_to_async threads, so ORM calls from async views are counted too.
+_current_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.db_time += elapsed
+        stats.statements.append((elapsed, sql))
+
+
+def _install_wrapper(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _install_wrapper(connection)
+
+
+class RequestMetricsMiddleware:
+    """
+    Collect timing and SQL metrics for every request.
+
+    SQL is measured with a connection execute wrapper, so it works with
+    DEBUG off. Render time covers DRF/template responses rendered after
+    the view returns. Works under both WSGI and ASGI; under ASGI it runs
+    on the event loop, so async views are not pushed into a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.query_budget = getattr(settings, 'REQUEST_QUERY_BUDGET', 50)
+        self.latency_budget = getattr(settings, 'REQUEST_LATENCY_BUDGET_MS', 1000) / 1000
+        self.sample_rate = getattr(settings, 'REQUEST_BUDGET_LOG_SAMPLE_RATE', 1.0)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+        connection_created.connect(_on_connection_created, dispatch_uid='request_metrics_wrapper')
+        for connection in connections.all(initialized_only=True):
+            _install_wrapper(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = _RequestStats()
+        request._metrics = stats
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self._observe(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = _RequestStats()
+        request._metrics = stats
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self._observe(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def _observe(self, request, response, stats, latency):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.route or match.view_name) if match else '<unmatched>'
+        metrics.observe_request(
+            view, request.method, latency, stats.db_time, stats.render_time, stats.queries
+        )
+
+        over_budget = stats.queries > self.query_budget or latency > self.latency_budget
+        if over_budget and random.random() < self.sample_rate:
+            self._log_over_budget(request, response, view, latency, stats)
+
+    def process_template_response(self, request, response):
+        stats = getattr(request, '_metrics', None)
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self._render_done(stats))
+        return response
+
+    @staticmethod
+    def _render_done(stats):
+        stats.render_time = time.perf_counter() - stats.render_started
+
+    def _log_over_budget(self, request, response, view, latency, stats):
+        slowest = sorted(stats.statements, key=lambda statement: statement[0], reverse=True)[:3]
+        logger.warning(
+            "Request over budget: %s %s (%s) status=%s latency=%.1fms queries=%d "
+            "db=%.1fms render=%.1fms slowest=%s",
+            request.method,
+            request.path,
+            view,
+            getattr(response, 'status_code', '-'),
+            latency * 1000,
+            stats.queries,
+            stats.db_time * 1000,
+            stats.render_time * 1000,
+            [(round(elapsed * 1000, 1), sql[:200]) for elapsed, sql in slowest],
+        )
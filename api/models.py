@@ -93,3 +93,25 @@ class SiteSettings(models.Model):
         obj, _ = cls.objects.get_or_create(pk=1)
         return obj
 
+
+
+class MediaBlob(models.Model):
+    """
+    One file in the content-addressed media store (api.storage), shared by
+    every upload with the same bytes. ref_count is the number of saves not
+    yet released; unreferenced blobs are removed by collect_media_garbage.
+    """
+    digest = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the file")
+    path = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    unreferenced_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Media Blob'
+        verbose_name_plural = 'Media Blobs'
+
+    def __str__(self):
+        return f"{self.path} ({self.ref_count} refs)"
@@ -0,0 +1,142 @@
+"""
+Keyset ("seek") pagination for large, append-only tables such as the
+notification and newsletter logs.
+
+Pages are ordered on a (timestamp, id) key and the cursor holds the key
+of the last row seen, so fetching the next page is an index range scan
+of page_size rows however deep it is. No COUNT(*) is issued unless the
+client asks for one with ?count=true.
+
+Requests that use the old ?page=N parameter, or ?ordering= on another
+field, fall back to PageNumberPagination.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Views may set `keyset_fields` (default ('sent_at', 'id')); the first
+    field must be non-null and the pair unique.
+    """
+    keyset_fields = ('sent_at', 'id')
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fields = getattr(view, 'keyset_fields', self.keyset_fields)
+        ordering = request.query_params.get(OrderingFilter.ordering_param, '')
+        self.fallback = None
+        if 'page' in request.query_params or ordering.lstrip('-') not in ('', self.fields[0]):
+            self.fallback = PageNumberPagination()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.descending = ordering != self.fields[0]
+        self.limit = self._page_size(request)
+        self.count = queryset.count() if self._wants_count(request) else None
+
+        key, backwards = self._decode_cursor(queryset.model, request)
+        reverse = self.descending != backwards
+        order = [f'-{field}' if reverse else field for field in self.fields]
+        page_queryset = queryset.order_by(*order)
+        if key is not None:
+            page_queryset = page_queryset.filter(self._after(key, reverse))
+
+        rows = list(page_queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if backwards:
+            rows.reverse()
+
+        self.page = rows
+        # Walking forwards there is a previous page iff we came from a cursor;
+        # walking backwards there is a next page by construction.
+        self.has_next = has_more if not backwards else True
+        self.has_previous = key is not None if not backwards else has_more
+        return rows
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self._link(self.page[-1], backwards=False) if self.page and self.has_next else None
+        payload['previous'] = self._link(self.page[0], backwards=True) if self.page and self.has_previous else None
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'description': 'Only with ?count=true'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    # ------------------------------------------------------------------
+
+    def _page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def _after(self, key, reverse):
+        """Rows strictly after `key` in the walking direction."""
+        (first, first_value), (second, second_value) = zip(self.fields, key)
+        op = 'lt' if reverse else 'gt'
+        bound = 'lte' if reverse else 'gte'
+        # The redundant bound on the first field lets the database use a
+        # plain index range scan.
+        return Q(**{f'{first}__{bound}': first_value}) & (
+            Q(**{f'{first}__{op}': first_value}) | Q(**{first: first_value, f'{second}__{op}': second_value})
+        )
+
+    def _decode_cursor(self, model, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            key = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, data['k'])
+            ]
+            if len(key) != len(self.fields) or None in key:
+                raise ValueError
+            return key, bool(data.get('b'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _link(self, row, backwards):
+        values = []
+        for field in self.fields:
+            value = getattr(row, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        cursor = {'k': values}
+        if backwards:
+            cursor['b'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode()).decode().rstrip('=')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
@@ -0,0 +1,127 @@
+"""
+Content-addressed media storage.
+
+Every saved file is stored once, at cas/<aa>/<bb>/<sha256><ext>, whatever
+name the caller asked for. The MediaBlob row for the digest counts the
+saves that reference it: save() adds a reference, delete() only drops
+one. Blobs nobody references are removed in batches by
+api.tasks.collect_media_garbage, after a grace period.
+
+Files whose requested name falls under MEDIA_PROTECTED_PREFIXES are kept
+out of the store and saved under that name, so api.views.media_view can
+still match them against their access rule.
+
+The store only backs MosqueImage files, their derivatives and share
+uploads (media_storage()); every other FileField keeps the default
+storage, since nothing else takes or releases references.
+
+Enabled with MEDIA_CONTENT_ADDRESSED. Files saved before it was enabled
+live outside cas/ and have no MediaBlob row: the store serves them but
+never deletes them.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+PREFIX = 'cas/'
+
+
+def is_content_addressed(storage):
+    # isinstance() sees through the default_storage LazyObject
+    return isinstance(storage, ContentAddressedStorage)
+
+
+def media_storage():
+    """
+    Storage for mosque images and share uploads: the content-addressed
+    store with MEDIA_CONTENT_ADDRESSED, else the default storage.
+    Also used as MosqueImage.image's `storage` callable.
+    """
+    from django.core.files.storage import default_storage
+
+    if getattr(settings, 'MEDIA_CONTENT_ADDRESSED', True):
+        return content_addressed_storage
+    return default_storage
+
+
+def release(name):
+    """
+    Drop a reference to a stored file. A no-op with plain storage, which
+    never deleted files of removed rows.
+    """
+    storage = media_storage()
+    if name and is_content_addressed(storage):
+        storage.delete(name)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def blob_path(self, digest, ext=''):
+        return f"{PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+    def save(self, name, content, max_length=None):
+        return self.save_blob(name, content)[0]
+
+    def save_blob(self, name, content):
+        """
+        Store `content` (deduplicated) and take a reference to it, or under
+        `name` itself if that is a protected path. Returns (path, created). A precomputed SHA-256 may be passed as
+        `content.sha256`.
+        """
+        from api.models import MediaBlob
+
+        if name and name.startswith(tuple(getattr(settings, 'MEDIA_PROTECTED_PREFIXES', {}))):
+            return super().save(name, content), True
+
+        if not hasattr(content, 'chunks'):
+            from django.core.files import File
+            content = File(content, name)
+        digest = getattr(content, 'sha256', None) or self._digest(content)
+        path = self.blob_path(digest, os.path.splitext(name or '')[1])
+
+        # Take the reference under the row lock first, so the garbage
+        # collector cannot delete the file between our check and write.
+        with transaction.atomic():
+            blob, _ = MediaBlob.objects.select_for_update().get_or_create(
+                digest=digest, defaults={'path': path, 'size': content.size or 0}
+            )
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1, unreferenced_at=None)
+
+        if super().exists(blob.path):
+            return blob.path, False
+        saved = super()._save(blob.path, content)
+        if saved != blob.path:
+            # Another process wrote the same bytes first.
+            super().delete(saved)
+            return blob.path, False
+        return blob.path, True
+
+    def delete(self, name):
+        """Release one reference. Files outside cas/ are never deleted."""
+        from api.models import MediaBlob
+
+        if not name or not name.startswith(PREFIX):
+            return
+        MediaBlob.objects.filter(path=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        MediaBlob.objects.filter(path=name, ref_count__lte=0, unreferenced_at__isnull=True).update(
+            unreferenced_at=timezone.now()
+        )
+
+    def delete_blob(self, name):
+        """Remove the file itself. Only the garbage collector calls this."""
+        super().delete(name)
+
+    @staticmethod
+    def _digest(content):
+        hasher = hashlib.sha256()
+        for chunk in content.chunks():  # chunks() rewinds the file first
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+
+content_addressed_storage = ContentAddressedStorage()
@@ -0,0 +1,50 @@
+"""
+Celery tasks for the api app.
+"""
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def collect_media_garbage(batch_size=500):
+    """
+    Delete content-addressed blobs that have had no references for
+    MEDIA_GC_GRACE_HOURS, batch_size rows per transaction.
+    """
+    from api.models import MediaBlob
+    from api.storage import is_content_addressed, media_storage
+
+    storage = media_storage()
+    if not is_content_addressed(storage):
+        return {'status': 'skipped', 'deleted_count': 0}
+
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, 'MEDIA_GC_GRACE_HOURS', 24))
+    candidates = MediaBlob.objects.filter(ref_count__lte=0, unreferenced_at__lte=cutoff).order_by('id')
+    deleted = freed = 0
+    last_id = 0
+    while True:
+        ids = list(candidates.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+        with transaction.atomic():
+            # Re-check under the lock: a save may have taken a new reference.
+            for blob in MediaBlob.objects.select_for_update().filter(id__in=ids, ref_count__lte=0):
+                try:
+                    storage.delete_blob(blob.path)
+                except OSError as exc:
+                    logger.warning(f"Could not delete media blob {blob.path}: {exc}")
+                    continue
+                freed += blob.size
+                blob.delete()
+                deleted += 1
+
+    logger.info(f"Collected {deleted} unreferenced media blobs ({freed} bytes)")
+    return {'status': 'success', 'deleted_count': deleted, 'freed_bytes': freed}
@@ -1,3 +1,328 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import MediaBlob
+from .storage import ContentAddressedStorage, content_addressed_storage, media_storage, release
+from .tasks import collect_media_garbage
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_CONTENT_ADDRESSED=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = media_storage()
+
+    def _path(self, name):
+        return os.path.join(self.media_root, name)
+
+    def test_identical_content_is_stored_once(self):
+        first = self.storage.save('mosque_images/a.jpg', ContentFile(b'same bytes'))
+        second = self.storage.save('shared_images/b.jpg', ContentFile(b'same bytes'))
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith('cas/'))
+        self.assertTrue(os.path.isfile(self._path(first)))
+        self.assertEqual(MediaBlob.objects.get(path=first).ref_count, 2)
+
+    def test_release_drops_one_reference(self):
+        name = self.storage.save('mosque_images/a.jpg', ContentFile(b'bytes'))
+        self.storage.save('mosque_images/b.jpg', ContentFile(b'bytes'))
+
+        release(name)
+        blob = MediaBlob.objects.get(path=name)
+        self.assertEqual(blob.ref_count, 1)
+        self.assertIsNone(blob.unreferenced_at)
+
+        release(name)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+        self.assertIsNotNone(blob.unreferenced_at)
+        self.assertTrue(os.path.isfile(self._path(name)))
+
+    def test_legacy_files_are_never_deleted(self):
+        os.makedirs(self._path('mosque_images'))
+        with open(self._path('mosque_images/old.jpg'), 'wb') as legacy:
+            legacy.write(b'legacy')
+
+        release('mosque_images/old.jpg')
+
+        self.assertTrue(os.path.isfile(self._path('mosque_images/old.jpg')))
+
+    def test_other_file_fields_keep_default_storage(self):
+        from users.models import UserProfile
+
+        self.assertIs(self.storage, content_addressed_storage)
+        self.assertNotIsInstance(UserProfile._meta.get_field('profile_image').storage, ContentAddressedStorage)
+
+    @override_settings(MEDIA_GC_GRACE_HOURS=24)
+    def test_garbage_collection_waits_for_grace_period(self):
+        name = self.storage.save('mosque_images/a.jpg', ContentFile(b'bytes'))
+        release(name)
+
+        self.assertEqual(collect_media_garbage()['deleted_count'], 0)
+
+        MediaBlob.objects.filter(path=name).update(unreferenced_at=timezone.now() - timedelta(hours=25))
+        self.assertEqual(collect_media_garbage()['deleted_count'], 1)
+        self.assertFalse(MediaBlob.objects.filter(path=name).exists())
+        self.assertFalse(os.path.isfile(self._path(name)))
+
+    def test_garbage_collection_keeps_referenced_blobs(self):
+        name = self.storage.save('mosque_images/a.jpg', ContentFile(b'bytes'))
+        MediaBlob.objects.filter(path=name).update(unreferenced_at=timezone.now() - timedelta(days=30))
+
+        self.assertEqual(collect_media_garbage()['deleted_count'], 0)
+        self.assertTrue(os.path.isfile(self._path(name)))
+
+
+class MediaViewTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            MEDIA_PROTECTED_PREFIXES={'private/': 'authenticated', 'staff/': 'staff'},
+            MEDIA_ACCEL_REDIRECT_PREFIX='/_protected_media/',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for name in ('public/logo.png', 'private/receipt.pdf', 'staff/report.csv', 'cas/ab/abcdef.jpg'):
+            os.makedirs(os.path.dirname(os.path.join(self.media_root, name)), exist_ok=True)
+            with open(os.path.join(self.media_root, name), 'wb') as handle:
+                handle.write(b'content')
+        self.user = User.objects.create_user('member', 'member@example.com', 'pass12345')
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pass12345', is_staff=True)
+
+    def test_public_files_are_served_to_anyone(self):
+        response = self.client.get('/media/public/logo.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=604800')
+
+        response = self.client.get('/media/cas/ab/abcdef.jpg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_protected_files_refuse_anonymous_and_unprivileged_users(self):
+        self.assertEqual(self.client.get('/media/private/receipt.pdf').status_code, 403)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/media/staff/report.csv').status_code, 403)
+
+    def test_protected_files_accept_a_session_or_an_api_token(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/media/staff/report.csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=300')
+        self.client.logout()
+
+        token = AccessToken.for_user(self.user)
+        response = self.client.get('/media/private/receipt.pdf', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_token_is_refused(self):
+        response = self.client.get('/media/private/receipt.pdf', HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(response.status_code, 403)
+
+    def test_missing_files_and_traversal_are_not_found(self):
+        self.assertEqual(self.client.get('/media/public/missing.png').status_code, 404)
+        self.assertEqual(self.client.get('/media/../config/settings.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/public/%2e%2e/%2e%2e/manage.py').status_code, 404)
+
+    @override_settings(MEDIA_DELIVERY='x-accel')
+    def test_x_accel_hands_the_file_to_nginx(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/media/private/receipt.pdf')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/_protected_media/private/receipt.pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_DELIVERY='x-sendfile')
+    def test_x_sendfile_names_the_file_on_disk(self):
+        response = self.client.get('/media/public/logo.png')
+
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'public/logo.png'))
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_DELIVERY='x-accel')
+    def test_x_accel_rejects_traversal(self):
+        self.assertEqual(self.client.get('/media/public/%2e%2e/%2e%2e/manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/public/nothing.png').status_code, 404)
+
+
+class KeysetPaginationTests(TestCase):
+    """Through WhatsAppNotificationLogViewSet, ordered on (sent_at, id)."""
+
+    url = '/api/notifications/logs/'
+
+    def setUp(self):
+        from push_notification.models import WhatsAppNotification, WhatsAppNotificationLog
+
+        staff = User.objects.create_user('staff', 'staff@example.com', 'pass12345', is_staff=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(staff)}')
+        subscriber = WhatsAppNotification.objects.create(phone_number='1700000000')
+        start = timezone.now()
+        # Three rows share a timestamp, so pages must break ties on id.
+        for minutes in (0, 1, 1, 1, 2, 3):
+            log = WhatsAppNotificationLog.objects.create(whatsapp=subscriber, message='m')
+            WhatsAppNotificationLog.objects.filter(pk=log.pk).update(sent_at=start + timedelta(minutes=minutes))
+        self.newest_first = list(
+            WhatsAppNotificationLog.objects.order_by('-sent_at', '-id').values_list('id', flat=True)
+        )
+
+    def _walk(self, url, link):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            ids.extend(pages[-1])
+            url = response.data[link]
+        return ids, pages
+
+    def test_next_links_walk_every_row_once(self):
+        ids, pages = self._walk(f'{self.url}?page_size=2', 'next')
+
+        self.assertEqual(ids, self.newest_first)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2])
+
+    def test_previous_links_walk_back_to_the_first_page(self):
+        response = self.client.get(f'{self.url}?page_size=4')
+        last_page = self.client.get(response.data['next'])
+        self.assertIsNone(last_page.data['next'])
+
+        ids, pages = self._walk(last_page.data['previous'], 'previous')
+
+        self.assertEqual(pages, [self.newest_first[:4]])
+        self.assertIsNone(self.client.get(f'{self.url}?page_size=4').data['previous'])
+
+    def test_ascending_ordering_walks_oldest_first(self):
+        ids, _ = self._walk(f'{self.url}?page_size=4&ordering=sent_at', 'next')
+        self.assertEqual(ids, self.newest_first[::-1])
+
+    def test_count_is_only_queried_on_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'{self.url}?page_size=2')
+        self.assertNotIn('count', response.data)
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'].upper()])
+
+        response = self.client.get(f'{self.url}?page_size=2&count=true')
+        self.assertEqual(response.data['count'], 6)
+
+    def test_page_number_and_other_orderings_fall_back(self):
+        response = self.client.get(f'{self.url}?page=1')
+        self.assertEqual(response.data['count'], 6)
+        self.assertEqual([row['id'] for row in response.data['results']], self.newest_first)
+
+        response = self.client.get(f'{self.url}?ordering=status')
+        self.assertEqual(response.data['count'], 6)
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ('garbage', 'eyJrIjpbXX0', 'eyJrIjpbIm5vdC1hLWRhdGUiLCIxIl19'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(f'{self.url}?cursor={cursor}').status_code, 404)
+
+
+class SparseFieldsetTests(TestCase):
+    """Through MosqueViewSet: MosqueListSerializer for list, MosqueSerializer for retrieve."""
+
+    def setUp(self):
+        from find_mosque.models import Mosque
+        from locations.models import City, Country
+
+        country = Country.objects.create(name='Bangladesh', code='BGD')
+        self.city = City.objects.create(name='Dhaka', country=country, latitude=23.8, longitude=90.4)
+        self.mosques = [
+            Mosque.objects.create(
+                name=name, address='Dhaka', city=self.city, is_verified=True, latitude='23.810300', longitude='90.412500'
+            )
+            for name in ('Baitul Mukarram', 'Star Mosque')
+        ]
+
+    def _projection(self, serializer_class, **kwargs):
+        from .fieldsets import Projection
+
+        return Projection(serializer_class(**kwargs))
+
+    def test_projection_of_plain_columns_is_flat(self):
+        from find_mosque.serializers import MosqueListSerializer
+
+        projection = self._projection(MosqueListSerializer, fields=['id', 'name', 'city_name'])
+
+        self.assertTrue(projection.complete)
+        self.assertEqual(projection.lookups, ['id', 'name', 'city__name'])
+        self.assertEqual(projection.columns, {'id', 'name', 'city__name'})
+        self.assertEqual(projection.select_related, {'city'})
+
+    def test_projection_follows_declared_sources_and_nested_serializers(self):
+        from find_mosque.serializers import MosqueListSerializer, MosqueSerializer
+
+        projection = self._projection(MosqueListSerializer, fields=['id', 'primary_image'])
+        self.assertIsNone(projection.flat)
+        self.assertEqual(projection.prefetch_related, {'images'})
+
+        projection = self._projection(MosqueSerializer, fields=['id', 'city'], expand=['city'])
+        self.assertIsNone(projection.flat)
+        self.assertEqual(projection.select_related, {'city', 'city__country'})
+        self.assertIn('city__country__name', projection.columns)
+
+    def test_list_with_plain_fields_reads_tuples_of_only_those_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/mosques/', {'fields': 'id,name,latitude'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'id': mosque.id, 'name': mosque.name, 'latitude': '23.810300'} for mosque in self.mosques
+        ])
+        # COUNT for the page, then one narrow SELECT
+        self.assertEqual(len(queries), 2)
+        select = queries[1]['sql']
+        self.assertIn('"latitude"', select)
+        self.assertNotIn('"address"', select)
+        self.assertNotIn('"search_text"', select)
+
+    def test_expand_nests_the_relation_in_one_query(self):
+        mosque = self.mosques[0]
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/mosques/{mosque.id}/', {'fields': 'id,name,city', 'expand': 'city'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'id': mosque.id,
+            'name': mosque.name,
+            'city': {
+                'id': self.city.id, 'name': 'Dhaka', 'country_name': 'Bangladesh',
+                'timezone': 'UTC', 'is_capital': False,
+            },
+        })
+
+    def test_without_parameters_the_response_is_unchanged(self):
+        from find_mosque.serializers import MosqueListSerializer
+
+        response = self.client.get('/api/mosques/')
+        self.assertEqual(set(response.json()['results'][0]), set(MosqueListSerializer.Meta.fields))
+
+    def test_unknown_field_or_expansion_is_a_bad_request(self):
+        response = self.client.get('/api/mosques/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json())
+
+        response = self.client.get('/api/mosques/', {'expand': 'owner'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('expand', response.json())
@@ -0,0 +1,88 @@
+"""
+Helpers for storing uploaded images under their content hash.
+
+HashingUploadHandler sits in front of Django's own upload handlers and
+hashes each file while the multipart body is being read, so the upload
+is never read a second time just to name it. The file itself still goes
+to memory or a temp file as usual, and storage.save() moves or streams
+it from there.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler
+
+EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """Records the SHA-256 of every uploaded file, keyed by field name."""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.hashes = {}
+        self._hasher = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self._hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.hashes[self.field_name] = self._hasher.hexdigest()
+        # Returning None lets the next handler build the UploadedFile.
+        return None
+
+
+def install_hashing_handler(request):
+    """
+    Put a HashingUploadHandler first in the request's upload handlers.
+    Returns None if the body has already been parsed.
+    """
+    django_request = getattr(request, '_request', request)  # unwrap DRF's Request
+    if hasattr(django_request, '_files'):
+        return None
+    handler = HashingUploadHandler(django_request)
+    django_request.upload_handlers.insert(0, handler)
+    return handler
+
+
+def file_sha256(uploaded_file, handler=None, field_name=None):
+    """The upload's SHA-256, from the handler when it saw the file, else by reading its chunks."""
+    if handler is not None and field_name in handler.hashes:
+        return handler.hashes[field_name]
+    hasher = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    return hasher.hexdigest()
+
+
+def save_content_addressed(directory, uploaded_file, digest, content_type):
+    """
+    Store `uploaded_file` as <directory>/<digest><ext> unless that file
+    already exists. With the content-addressed store the path is chosen by
+    the storage and every call takes a reference. Returns (path, created).
+    """
+    from api.storage import is_content_addressed, media_storage
+
+    storage = media_storage()
+    name = f"{directory}/{digest}{EXTENSIONS.get(content_type, '')}"
+    if is_content_addressed(storage):
+        uploaded_file.sha256 = digest
+        return storage.save_blob(name, uploaded_file)
+    if storage.exists(name):
+        return name, False
+    saved = storage.save(name, uploaded_file)
+    if saved != name:
+        # An identical upload won the race; keep a single copy.
+        storage.delete(saved)
+        return name, False
+    return name, True
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PrayerTimeViewSet, LocationViewSet, UserPreferenceViewSet, SupportMessageViewSet, share_image_upload
+from .views import PrayerTimeViewSet, LocationViewSet, UserPreferenceViewSet, SupportMessageViewSet, share_image_upload, metrics_view
 
 router = DefaultRouter()
 router.register(r'prayertimes', PrayerTimeViewSet, basename='prayertime')
@@ -11,5 +11,6 @@ router.register(r'support-messages', SupportMessageViewSet, basename='support-me
 urlpatterns = [
     path('', include(router.urls)),
     path('share/upload/', share_image_upload, name='share-image-upload'),
+    path('metrics/', metrics_view, name='request-metrics'),
 ]
 
@@ -1,16 +1,24 @@
+import mimetypes
 import os
-import uuid
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection
 from django.shortcuts import render
-from django.http import JsonResponse
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
 from django.conf import settings
+from django.utils._os import safe_join
+from django.views.static import serve
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
-from rest_framework import viewsets, permissions, status
+from rest_framework import exceptions, viewsets, permissions, status
+from rest_framework.settings import api_settings
 from prayer_times.models import PrayerTime
 from locations.models import City
+from . import metrics
+from .uploads import file_sha256, install_hashing_handler, save_content_addressed
 from .models import Location, UserPreference, SupportMessage
 from .serializers import PrayerTimeSerializer, LocationSerializer, UserPreferenceSerializer, SupportMessageSerializer
 
@@ -49,6 +57,7 @@ def share_image_upload(request):
     Upload an image for WhatsApp sharing.
     Saves the image to /media/shared_images/ and returns its public URL.
     """
+    hashing_handler = install_hashing_handler(request)
     image_file = request.FILES.get('image')
     if not image_file:
         return Response({'error': 'No image file provided.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -64,11 +73,11 @@ def share_image_upload(request):
     if image_file.size > MAX_UPLOAD_SIZE:
         return Response({'error': 'File too large. Maximum size is 5 MB.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Generate a unique filename to avoid collisions and path traversal
-    ext = os.path.splitext(image_file.name)[1].lower()
-    safe_filename = f"shared_images/{uuid.uuid4().hex}{ext}"
-
-    saved_path = default_storage.save(safe_filename, ContentFile(image_file.read()))
+    # Name the file after its content: identical images are stored once, and
+    # the name can't collide or traverse paths. The upload is moved or
+    # streamed into storage rather than read into memory.
+    digest = file_sha256(image_file, hashing_handler, 'image')
+    saved_path, created = save_content_addressed('shared_images', image_file, digest, image_file.content_type)
 
     # Build absolute URL
     api_base_url = getattr(settings, 'API_BASE_URL', None)
@@ -77,7 +86,10 @@ def share_image_upload(request):
     else:
         image_url = request.build_absolute_uri(f"{settings.MEDIA_URL}{saved_path}")
 
-    return Response({'image_url': image_url}, status=status.HTTP_201_CREATED)
+    return Response(
+        {'image_url': image_url},
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+    )
 
 
 class PrayerTimeViewSet(viewsets.ModelViewSet):
@@ -103,3 +115,110 @@ class SupportMessageViewSet(viewsets.ModelViewSet):
         if self.action == 'create':
             return [permissions.AllowAny()]
         return [permissions.IsAdminUser()]
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def metrics_view(request):
+    """
+    Request metrics of this worker process in Prometheus text format (admin only).
+    """
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _check_database():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+async def health_view(request):
+    """
+    Liveness/readiness probe for the load balancer (nginx /health/).
+    Async, so probes never wait behind a busy worker thread.
+    """
+    try:
+        await sync_to_async(_check_database)()
+    except Exception as exc:
+        return JsonResponse({'status': 'unavailable', 'database': str(exc)}, status=503)
+    return JsonResponse({'status': 'ok'})
+
+
+# Files under these prefixes are named by their content hash (see
+# api.storage and find_mosque.images) and never change.
+IMMUTABLE_MEDIA_PREFIXES = ('cas/', 'mosque_images/variants/')
+
+
+def _media_access(user, path):
+    """
+    The access rule for a media path from MEDIA_PROTECTED_PREFIXES:
+    None (public), 'authenticated' or 'staff'. Returns (rule, allowed).
+    """
+    for prefix, rule in getattr(settings, 'MEDIA_PROTECTED_PREFIXES', {}).items():
+        if path.startswith(prefix):
+            if rule == 'staff':
+                return rule, user.is_authenticated and user.is_staff
+            return rule, user.is_authenticated
+    return None, True
+
+
+def _media_user(request):
+    """
+    The user for a protected media request: the session user, or else the
+    user of a JWT sent with the request (API clients have no session).
+    """
+    if request.user.is_authenticated:
+        return request.user
+    for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authenticator().authenticate(request)
+        except exceptions.APIException:
+            return request.user
+        if result is not None:
+            return result[0]
+    return request.user
+
+
+def media_view(request, path):
+    """
+    Serve a file under MEDIA_ROOT, checking MEDIA_PROTECTED_PREFIXES first.
+    Protected files accept the session or an API token.
+
+    With MEDIA_DELIVERY='x-accel' (nginx) or 'x-sendfile' (Apache,
+    lighttpd) the response only carries a header naming the file; the
+    front server streams the bytes and answers Range and conditional
+    requests, so the worker is released immediately. 'django' streams
+    the file from the worker, which is only meant for development.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid media path')
+
+    rule, allowed = _media_access(request.user, path)
+    if rule and not allowed:
+        rule, allowed = _media_access(_media_user(request), path)
+    if not allowed:
+        return HttpResponseForbidden('You do not have permission to access this file.')
+
+    delivery = getattr(settings, 'MEDIA_DELIVERY', 'django')
+    if delivery == 'django':
+        response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    else:
+        if not os.path.isfile(full_path):
+            raise Http404('File not found')
+        content_type, encoding = mimetypes.guess_type(full_path)
+        response = HttpResponse(content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if delivery == 'x-accel':
+            response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_REDIRECT_PREFIX + path)
+        else:
+            response['X-Sendfile'] = full_path
+
+    if rule:
+        response['Cache-Control'] = 'private, max-age=300'
+    elif path.startswith(IMMUTABLE_MEDIA_PREFIXES):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=604800'
+    return response
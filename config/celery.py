@@ -1,12 +1,16 @@
 """
 Celery configuration for Salahtime project.
 """
+import logging
 import os
 from celery import Celery
+from celery.signals import beat_init
 
 # Set the default Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+logger = logging.getLogger(__name__)
+
 app = Celery('salahtime')
 
 # Load config from Django settings with CELERY_ prefix
@@ -21,3 +25,27 @@ app.autodiscover_tasks()
 def debug_task(self):
     """Debug task to test Celery is working."""
     print(f'Request: {self.request!r}')
+
+
+@beat_init.connect
+def disable_stale_periodic_tasks(sender=None, **kwargs):
+    """
+    Disable PeriodicTask rows that are no longer in CELERY_BEAT_SCHEDULE.
+
+    DatabaseScheduler adds and updates rows from the settings but never
+    removes them, so an entry dropped by a settings change (for example
+    switching NOTIFICATION_SCHEDULING_MODE) would keep running. Celery's own
+    `celery.*` entries are left alone.
+    """
+    from django_celery_beat.models import PeriodicTask, PeriodicTasks
+
+    stale = (
+        PeriodicTask.objects.filter(enabled=True)
+        .exclude(name__in=list(app.conf.beat_schedule or {}))
+        .exclude(name__startswith='celery.')
+    )
+    names = list(stale.values_list('name', flat=True))
+    if names:
+        stale.update(enabled=False)
+        PeriodicTasks.update_changed()
+        logger.info("Disabled periodic tasks missing from CELERY_BEAT_SCHEDULE: %s", ', '.join(names))
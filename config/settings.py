@@ -41,6 +41,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # Trigram lookups for the mosque search index (PostgreSQL only)
+    'django.contrib.postgres',
 
     # Third-party apps
     'rest_framework',
@@ -62,10 +64,16 @@ INSTALLED_APPS = [
     'newsletter',
 ]
 
+# WhiteNoise serves /static/ from the app. Turn it off where nginx serves
+# /static/; WhiteNoise is sync-only, so this keeps the middleware chain
+# fully async under the ASGI profile (gunicorn_config.py).
+SERVE_STATIC = env.bool('SERVE_STATIC', default=True)
+
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    *(['whitenoise.middleware.WhiteNoiseMiddleware'] if SERVE_STATIC else []),
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -109,6 +117,32 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
+# PASSWORD_HASHER picks the hasher for new and upgraded passwords:
+# 'pbkdf2' (Django's default), 'argon2' (needs argon2-cffi) or 'scrypt'.
+# The others stay listed so existing hashes keep verifying and are
+# rehashed on the next login.
+PASSWORD_HASHER = env('PASSWORD_HASHER', default='pbkdf2')
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'Authentication.hashers.TunedArgon2PasswordHasher',
+    'scrypt': 'Authentication.hashers.TunedScryptPasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+# Argon2id defaults follow the OWASP minimum (19 MiB, 2 passes, 1 lane),
+# well below Django's, so a login burst costs less per request.
+# memory_cost is in KiB.
+PASSWORD_ARGON2_TIME_COST = env.int('PASSWORD_ARGON2_TIME_COST', default=2)
+PASSWORD_ARGON2_MEMORY_COST = env.int('PASSWORD_ARGON2_MEMORY_COST', default=19456)
+PASSWORD_ARGON2_PARALLELISM = env.int('PASSWORD_ARGON2_PARALLELISM', default=1)
+PASSWORD_SCRYPT_WORK_FACTOR = env.int('PASSWORD_SCRYPT_WORK_FACTOR', default=2 ** 14)
+PASSWORD_SCRYPT_BLOCK_SIZE = env.int('PASSWORD_SCRYPT_BLOCK_SIZE', default=8)
+PASSWORD_SCRYPT_PARALLELISM = env.int('PASSWORD_SCRYPT_PARALLELISM', default=1)
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -137,6 +171,47 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How api.views.media_view sends files: 'django' streams them from the worker
+# (development), 'x-accel' hands them to nginx via X-Accel-Redirect, and
+# 'x-sendfile' to Apache/lighttpd via X-Sendfile
+MEDIA_DELIVERY = env('MEDIA_DELIVERY', default='django')
+# nginx `internal` location aliased to MEDIA_ROOT
+MEDIA_ACCEL_REDIRECT_PREFIX = env('MEDIA_ACCEL_REDIRECT_PREFIX', default='/_protected_media/')
+# Path prefix -> 'authenticated' or 'staff'; other media is public. Uploads
+# under these prefixes bypass the content-addressed store below
+MEDIA_PROTECTED_PREFIXES = {}
+
+# Store mosque images, their derivatives and share uploads once per distinct
+# content under media/cas/ (api.storage.media_storage); unreferenced files are
+# removed by api.tasks.collect_media_garbage. Other uploads are unaffected.
+MEDIA_CONTENT_ADDRESSED = env.bool('MEDIA_CONTENT_ADDRESSED', default=True)
+MEDIA_GC_GRACE_HOURS = env.int('MEDIA_GC_GRACE_HOURS', default=24)
+
+# How long a worker's city typeahead index (locations.autocomplete) may lag
+# City changes saved by other processes
+CITY_INDEX_REFRESH_SECONDS = env.int('CITY_INDEX_REFRESH_SECONDS', default=300)
+
+# Largest timetable image fetched from a URL submitted at mosque registration
+MOSQUE_IMAGE_MAX_BYTES = env.int('MOSQUE_IMAGE_MAX_BYTES', default=5 * 1024 * 1024)
+# Derivatives built for every mosque image (find_mosque.images); JPEG is always included
+MOSQUE_IMAGE_VARIANT_WIDTHS = [int(w) for w in env.list('MOSQUE_IMAGE_VARIANT_WIDTHS', default=['160', '480', '960'])]
+MOSQUE_IMAGE_VARIANT_FORMATS = env.list('MOSQUE_IMAGE_VARIANT_FORMATS', default=['webp', 'avif'])
+# Width of the primary_image thumbnail returned by list endpoints
+MOSQUE_IMAGE_LIST_WIDTH = env.int('MOSQUE_IMAGE_LIST_WIDTH', default=480)
+
+# Mosque map tiles (find_mosque.tiles): deepest zoom served, zoom from which
+# markers are no longer clustered, server-side and client cache lifetimes
+MOSQUE_TILE_MAX_ZOOM = env.int('MOSQUE_TILE_MAX_ZOOM', default=18)
+MOSQUE_TILE_CLUSTER_ZOOM = env.int('MOSQUE_TILE_CLUSTER_ZOOM', default=13)
+MOSQUE_TILE_CACHE_SECONDS = env.int('MOSQUE_TILE_CACHE_SECONDS', default=3600)
+MOSQUE_TILE_MAX_AGE = env.int('MOSQUE_TILE_MAX_AGE', default=300)
+
+# Shared cache, so invalidations (e.g. of map tiles) reach every worker.
+# Without it each process keeps its own memory cache.
+CACHE_REDIS_URL = env('CACHE_REDIS_URL', default='')
+if CACHE_REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_REDIS_URL}}
+
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -145,9 +220,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework
 # https://www.django-rest-framework.org/
 
+# Trust the signed role claims on read-only requests instead of loading the
+# user row (Authentication.authentication.StatelessJWTAuthentication).
+JWT_STATELESS_READS = env.bool('JWT_STATELESS_READS', default=False)
+# Seconds a user row is cached per process for authenticated writes.
+JWT_USER_CACHE_SECONDS = env.int('JWT_USER_CACHE_SECONDS', default=30)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'Authentication.authentication.StatelessJWTAuthentication'
+        if JWT_STATELESS_READS else
+        'Authentication.authentication.JWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -162,14 +245,21 @@ REST_FRAMEWORK = {
         'rest_framework.throttling.UserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/minute',
-        'user': '1000/minute',
+        'anon': env('THROTTLE_ANON_RATE', default='100/minute'),
+        'user': env('THROTTLE_USER_RATE', default='1000/minute'),
     },
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
 
 
+# Request instrumentation (api.middleware.RequestMetricsMiddleware)
+REQUEST_METRICS_ENABLED = env.bool('REQUEST_METRICS_ENABLED', default=True)
+REQUEST_QUERY_BUDGET = env.int('REQUEST_QUERY_BUDGET', default=50)
+REQUEST_LATENCY_BUDGET_MS = env.int('REQUEST_LATENCY_BUDGET_MS', default=1000)
+REQUEST_BUDGET_LOG_SAMPLE_RATE = env.float('REQUEST_BUDGET_LOG_SAMPLE_RATE', default=1.0)
+
+
 # Simple JWT
 # https://django-rest-framework-simplejwt.readthedocs.io/
 
@@ -180,6 +270,14 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Bloom filter of blacklisted token ids (Authentication.blacklist).
+JWT_BLACKLIST_FILTER_ENABLED = env.bool('JWT_BLACKLIST_FILTER_ENABLED', default=True)
+JWT_BLACKLIST_REDIS_URL = env('JWT_BLACKLIST_REDIS_URL', default='')
+JWT_BLACKLIST_FILTER_BITS = env.int('JWT_BLACKLIST_FILTER_BITS', default=1 << 23)
+# How far before a rebuild started tokens are re-added to it; must exceed the
+# longest transaction that can blacklist a token
+JWT_BLACKLIST_REBUILD_OVERLAP_SECONDS = env.int('JWT_BLACKLIST_REBUILD_OVERLAP_SECONDS', default=300)
+
 
 # CORS
 # https://github.com/adamchainz/django-cors-headers
@@ -209,21 +307,132 @@ CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 
+# Dedicated queues so a newsletter blast never delays prayer reminders.
+# Workers consuming several queues drain them in the order listed in
+# WORKER_QUEUES (reminders first), and only prefetch one task each.
+WORKER_QUEUES = ['reminders', 'admin', 'maintenance', 'bulk-email', 'celery']
+CELERY_TASK_ROUTES = {
+    'push_notification.tasks.dispatch_due_prayer_notifications': {'queue': 'reminders'},
+    'push_notification.tasks.dispatch_subscription_notifications': {'queue': 'reminders'},
+    'push_notification.tasks.coordinate_notification_dispatch': {'queue': 'reminders'},
+    'push_notification.tasks.send_prayer_notification': {'queue': 'reminders'},
+    'push_notification.tasks.send_whatsapp_notification': {'queue': 'reminders'},
+    'push_notification.tasks.fire_planned_reminders': {'queue': 'reminders'},
+    'push_notification.tasks.queue_planned_reminders': {'queue': 'reminders'},
+    'push_notification.tasks.queue_whatsapp_for_subscription': {'queue': 'reminders'},
+    'push_notification.tasks.queue_email_for_subscription': {'queue': 'reminders'},
+    'push_notification.tasks.send_mosque_registration_email': {'queue': 'admin'},
+    'Authentication.tasks.send_password_reset_email': {'queue': 'admin'},
+    'find_mosque.tasks.fetch_mosque_image': {'queue': 'admin'},
+    'find_mosque.tasks.generate_image_variants': {'queue': 'admin'},
+    'push_notification.tasks.plan_daily_reminders': {'queue': 'maintenance'},
+    'push_notification.tasks.replan_reminders': {'queue': 'maintenance'},
+    'push_notification.tasks.cleanup_old_notification_logs': {'queue': 'maintenance'},
+    'push_notification.tasks.drain_task_spool': {'queue': 'maintenance'},
+    'Authentication.tasks.prune_token_blacklist': {'queue': 'maintenance'},
+    'api.tasks.collect_media_garbage': {'queue': 'maintenance'},
+    'push_notification.tasks.send_daily_summary': {'queue': 'bulk-email'},
+    'push_notification.tasks.send_weekly_summary': {'queue': 'bulk-email'},
+    'newsletter.tasks.*': {'queue': 'bulk-email'},
+}
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'queue_order_strategy': 'priority',
+    # Publishers give up on a dead broker quickly; push_notification.enqueue spools the task
+    'max_retries': 1,
+    'interval_start': 0,
+    'interval_step': 0.2,
+    'interval_max': 0.5,
+}
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Tasks the broker rejects are spooled to the database and replayed by
+# drain_task_spool; with the spool disabled they run inline instead.
+TASK_SPOOL_ENABLED = env.bool('TASK_SPOOL_ENABLED', default=True)
+TASK_SPOOL_REMINDER_MAX_AGE_SECONDS = env.int('TASK_SPOOL_REMINDER_MAX_AGE_SECONDS', default=900)
+
+# Enqueue circuit breaker (push_notification.enqueue): open after N consecutive
+# publish failures, probe the broker again after the given number of seconds.
+TASK_ENQUEUE_BREAKER_FAILURES = env.int('TASK_ENQUEUE_BREAKER_FAILURES', default=3)
+TASK_ENQUEUE_BREAKER_SECONDS = env.int('TASK_ENQUEUE_BREAKER_SECONDS', default=30)
+CELERY_BROKER_CONNECTION_TIMEOUT = env.float('CELERY_BROKER_CONNECTION_TIMEOUT', default=2.0)
+# The Redis result backend otherwise retries 20 times (~20s) on every publish during an outage
+CELERY_RESULT_BACKEND_TRANSPORT_OPTIONS = {
+    'retry_policy': {'max_retries': 2, 'interval_start': 0, 'interval_step': 0.5, 'interval_max': 0.5},
+}
+
+# Worker processes per queue, used by `manage.py run_celery_worker --queues <name>`
+WORKER_QUEUE_CONCURRENCY = {
+    'reminders': env.int('WORKER_CONCURRENCY_REMINDERS', default=4),
+    'admin': env.int('WORKER_CONCURRENCY_ADMIN', default=1),
+    'maintenance': env.int('WORKER_CONCURRENCY_MAINTENANCE', default=1),
+    'bulk-email': env.int('WORKER_CONCURRENCY_BULK_EMAIL', default=2),
+    'celery': env.int('WORKER_CONCURRENCY_DEFAULT', default=1),
+}
+
 from celery.schedules import crontab
 
+# Celery task latency / queue-wait metrics aggregated in Redis (push_notification.task_metrics)
+TASK_METRICS_ENABLED = env.bool('TASK_METRICS_ENABLED', default=True)
+
+# Number of parallel shards the per-minute notification dispatchers are split into
+NOTIFICATION_DISPATCH_SHARDS = env.int('NOTIFICATION_DISPATCH_SHARDS', default=1)
+
+# Reminder scheduling: 'poll' scans subscribers every minute, 'eta' plans the
+# next day's reminders once and queues each with a Celery ETA shortly before
+# it is due, 'timer' plans them into a Redis timer wheel fired by the
+# run_timer_wheel daemon.
+# Restart beat after switching: on start it disables every PeriodicTask row
+# missing from CELERY_BEAT_SCHEDULE (config.celery), so the other mode's
+# entry stops running.
+NOTIFICATION_SCHEDULING_MODE = env('NOTIFICATION_SCHEDULING_MODE', default='poll')
+NOTIFICATION_PLANNER_HORIZON_HOURS = env.int('NOTIFICATION_PLANNER_HORIZON_HOURS', default=25)
+NOTIFICATION_PLANNER_BATCH_SIZE = env.int('NOTIFICATION_PLANNER_BATCH_SIZE', default=500)
+NOTIFICATION_TIMER_REDIS_URL = env('NOTIFICATION_TIMER_REDIS_URL', default='')
+NOTIFICATION_TIMER_VISIBILITY_TIMEOUT = env.int('NOTIFICATION_TIMER_VISIBILITY_TIMEOUT', default=120)
+# eta mode only queues reminders due within this many minutes (every 10
+# minutes, by queue_planned_reminders). The Redis transport redelivers
+# messages left unacked for visibility_timeout (1h), so ETAs must stay well
+# below it.
+NOTIFICATION_ETA_LOOKAHEAD_MINUTES = env.int('NOTIFICATION_ETA_LOOKAHEAD_MINUTES', default=30)
+
+if NOTIFICATION_SCHEDULING_MODE in ('eta', 'timer'):
+    _reminder_schedule = {
+        'plan-daily-reminders': {
+            'task': 'push_notification.tasks.plan_daily_reminders',
+            'schedule': crontab(hour=0, minute=0),
+        },
+    }
+    if NOTIFICATION_SCHEDULING_MODE == 'eta':
+        _reminder_schedule['queue-planned-reminders'] = {
+            'task': 'push_notification.tasks.queue_planned_reminders',
+            'schedule': crontab(minute='*/10'),
+        }
+else:
+    _reminder_schedule = {
+        'coordinate-notification-dispatch': {
+            'task': 'push_notification.tasks.coordinate_notification_dispatch',
+            'schedule': crontab(minute='*'),
+        },
+    }
+
 CELERY_BEAT_SCHEDULE = {
-    'dispatch-due-prayer-notifications': {
-        'task': 'push_notification.tasks.dispatch_due_prayer_notifications',
-        'schedule': crontab(minute='*'),
-    },
-    'dispatch-subscription-notifications': {
-        'task': 'push_notification.tasks.dispatch_subscription_notifications',
+    **_reminder_schedule,
+    'drain-task-spool': {
+        'task': 'push_notification.tasks.drain_task_spool',
         'schedule': crontab(minute='*'),
     },
     'cleanup-old-logs': {
         'task': 'push_notification.tasks.cleanup_old_notification_logs',
         'schedule': crontab(hour=2, minute=0),
     },
+    'prune-token-blacklist': {
+        'task': 'Authentication.tasks.prune_token_blacklist',
+        'schedule': crontab(minute=15),
+    },
+    'collect-media-garbage': {
+        'task': 'api.tasks.collect_media_garbage',
+        'schedule': crontab(hour=3, minute=30),
+    },
 }
 
 
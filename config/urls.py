@@ -17,15 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
-from django.views.static import serve
-from api.views import api_root
+from api.views import api_root, health_view, media_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     
     # API root endpoint
     path('', api_root, name='api-root'),
+    path('health/', health_view, name='health'),
     
     # API endpoints
     path('api/auth/', include('Authentication.urls')),
@@ -40,9 +39,9 @@ urlpatterns = [
     path('api/', include('api.urls')),
 ]
 
-# Serve uploaded media files when no fronting web server is handling /media.
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media that reaches Django: protected files, or every file when no fronting
+# web server handles /media/. See MEDIA_DELIVERY for how the bytes are sent.
 urlpatterns += [
-    re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
+    re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.*)$', media_view, name='media'),
 ]
 
@@ -4,6 +4,7 @@ from django.db import models as db_models
 from datetime import time as dt_time
 from .models import Mosque, MosqueImage, FavoriteMosque, MosqueMonthlyPrayerTime, MosqueAnnouncement
 from unfold.admin import ModelAdmin
+from Authentication.permissions import is_imam_user
 
 
 # ─── AM/PM Time Widget ──────────────────────────────────────────────────────
@@ -238,7 +239,7 @@ class MosqueAdmin(ModelAdmin):
 
     def get_form(self, request, obj=None, **kwargs):
         """Imam users get a simplified form with city as plain text input."""
-        if not request.user.is_superuser and request.user.groups.filter(name='Imam').exists():
+        if not request.user.is_superuser and is_imam_user(request.user):
             return ImamMosqueForm
         return super().get_form(request, obj, **kwargs)
 
@@ -261,17 +262,17 @@ class MosqueAdmin(ModelAdmin):
         if request.user.is_superuser:
             return True
         # Check if user is in Imam group
-        return request.user.groups.filter(name='Imam').exists()
+        return is_imam_user(request.user)
 
     def has_view_permission(self, request, obj=None):
         if request.user.is_superuser:
             return True
-        return request.user.groups.filter(name='Imam').exists()
+        return is_imam_user(request.user)
 
     def has_add_permission(self, request):
         if request.user.is_superuser:
             return True
-        return request.user.groups.filter(name='Imam').exists()
+        return is_imam_user(request.user)
 
     def has_delete_permission(self, request, obj=None):
         if request.user.is_superuser:
@@ -281,7 +282,7 @@ class MosqueAdmin(ModelAdmin):
     def has_change_permission(self, request, obj=None):
         if request.user.is_superuser:
             return True
-        if not request.user.groups.filter(name='Imam').exists():
+        if not is_imam_user(request.user):
             return False
         if obj is None:
             return True
@@ -337,7 +338,7 @@ class MosqueAdmin(ModelAdmin):
         )
 
     def save_model(self, request, obj, form, change):
-        if not request.user.is_superuser and request.user.groups.filter(name='Imam').exists():
+        if not request.user.is_superuser and is_imam_user(request.user):
             # Resolve city_name text → City object
             city_name = form.cleaned_data.get('city_name', '').strip()
             if city_name:
@@ -410,7 +411,7 @@ class MosqueImageAdmin(ModelAdmin):
         """Hide from Imam users."""
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
 
 @admin.register(FavoriteMosque)
@@ -423,7 +424,7 @@ class FavoriteMosqueAdmin(ModelAdmin):
         """Hide from Imam users."""
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
 
 @admin.register(MosqueMonthlyPrayerTime)
@@ -467,7 +468,7 @@ class MosqueMonthlyPrayerTimeAdmin(ModelAdmin):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
             return qs
-        if request.user.groups.filter(name='Imam').exists():
+        if is_imam_user(request.user):
             return qs.filter(mosque__created_by=request.user)
         return qs.none()
 
@@ -475,12 +476,12 @@ class MosqueMonthlyPrayerTimeAdmin(ModelAdmin):
         """Allow only superusers and Imam users."""
         if request.user.is_superuser:
             return True
-        return request.user.groups.filter(name='Imam').exists()
+        return is_imam_user(request.user)
 
     def has_view_permission(self, request, obj=None):
         if request.user.is_superuser:
             return True
-        if not request.user.groups.filter(name='Imam').exists():
+        if not is_imam_user(request.user):
             return False
         if obj is None:
             return True
@@ -489,12 +490,12 @@ class MosqueMonthlyPrayerTimeAdmin(ModelAdmin):
     def has_add_permission(self, request):
         if request.user.is_superuser:
             return True
-        return request.user.groups.filter(name='Imam').exists()
+        return is_imam_user(request.user)
 
     def has_change_permission(self, request, obj=None):
         if request.user.is_superuser:
             return True
-        if not request.user.groups.filter(name='Imam').exists():
+        if not is_imam_user(request.user):
             return False
         if obj is None:
             return True
@@ -503,7 +504,7 @@ class MosqueMonthlyPrayerTimeAdmin(ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         if request.user.is_superuser:
             return True
-        if not request.user.groups.filter(name='Imam').exists():
+        if not is_imam_user(request.user):
             return False
         if obj is None:
             return True
@@ -511,7 +512,7 @@ class MosqueMonthlyPrayerTimeAdmin(ModelAdmin):
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == 'mosque' and not request.user.is_superuser:
-            if request.user.groups.filter(name='Imam').exists():
+            if is_imam_user(request.user):
                 kwargs['queryset'] = Mosque.objects.filter(created_by=request.user)
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
@@ -761,12 +762,12 @@ class MosqueAnnouncementAdmin(ModelAdmin):
     def has_module_permission(self, request):
         if request.user.is_superuser:
             return True
-        return request.user.groups.filter(name='Imam').exists()
+        return is_imam_user(request.user)
 
     def has_view_permission(self, request, obj=None):
         if request.user.is_superuser:
             return True
-        if not request.user.groups.filter(name='Imam').exists():
+        if not is_imam_user(request.user):
             return False
         if obj is None:
             return True
@@ -775,12 +776,12 @@ class MosqueAnnouncementAdmin(ModelAdmin):
     def has_add_permission(self, request):
         if request.user.is_superuser:
             return True
-        return request.user.groups.filter(name='Imam').exists()
+        return is_imam_user(request.user)
 
     def has_change_permission(self, request, obj=None):
         if request.user.is_superuser:
             return True
-        if not request.user.groups.filter(name='Imam').exists():
+        if not is_imam_user(request.user):
             return False
         if obj is None:
             return True
@@ -789,7 +790,7 @@ class MosqueAnnouncementAdmin(ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         if request.user.is_superuser:
             return True
-        if not request.user.groups.filter(name='Imam').exists():
+        if not is_imam_user(request.user):
             return False
         if obj is None:
             return True
@@ -798,7 +799,7 @@ class MosqueAnnouncementAdmin(ModelAdmin):
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         """Imams can only pick their own mosques."""
         if db_field.name == 'mosque' and not request.user.is_superuser:
-            if request.user.groups.filter(name='Imam').exists():
+            if is_imam_user(request.user):
                 kwargs['queryset'] = Mosque.objects.filter(created_by=request.user)
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
@@ -0,0 +1,134 @@
+"""
+Resized and re-encoded derivatives of uploaded mosque images.
+
+Each MosqueImage gets one file per (format, width) pair, written under
+mosque_images/variants/ (or the content-addressed store, see api.storage)
+and named after a hash of its bytes, so a URL never changes content and
+can be cached forever. The map is stored on
+MosqueImage.variants:
+
+    {'source': 'mosque_images/a.jpg',
+     'jpeg': {'160': 'mosque_images/variants/3f2a...jpg', '480': ...},
+     'webp': {...}, 'avif': {...}}
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from api.storage import is_content_addressed, media_storage
+
+VARIANT_DIR = 'mosque_images/variants'
+FORMATS = {
+    # format: (Pillow encoder, extension, save options)
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'avif': ('AVIF', 'avif', {'quality': 60}),
+}
+FALLBACK_FORMAT = 'jpeg'
+
+
+def variant_widths():
+    return sorted(getattr(settings, 'MOSQUE_IMAGE_VARIANT_WIDTHS', [160, 480, 960]))
+
+
+def variant_formats():
+    from PIL import features
+
+    formats = [FALLBACK_FORMAT]
+    for name in getattr(settings, 'MOSQUE_IMAGE_VARIANT_FORMATS', ['webp', 'avif']):
+        if name in FORMATS and name not in formats and features.check(name):
+            formats.append(name)
+    return formats
+
+
+def _encode(img, fmt):
+    encoder, ext, options = FORMATS[fmt]
+    if fmt == 'jpeg' and img.mode != 'RGB':
+        img = img.convert('RGB')
+    buf = io.BytesIO()
+    img.save(buf, encoder, **options)
+    data = buf.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    storage = media_storage()
+    if is_content_addressed(storage):
+        content = ContentFile(data)
+        content.sha256 = digest
+        return storage.save_blob(f"{VARIANT_DIR}/variant.{ext}", content)[0]
+    name = f"{VARIANT_DIR}/{digest[:20]}.{ext}"
+    if not storage.exists(name):
+        storage.save(name, ContentFile(data))
+    return name
+
+
+def generate_variants(image_field):
+    """
+    Build every configured derivative of `image_field` and return the
+    variants map. Widths larger than the original are skipped, except
+    that the original width is always produced once.
+    """
+    from PIL import Image, ImageOps
+
+    with image_field.open('rb') as source:
+        with Image.open(source) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'RGBA'):
+                original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+            widths = [w for w in variant_widths() if w < original.width] or [original.width]
+            variants = {'source': image_field.name}
+            for fmt in variant_formats():
+                variants[fmt] = {}
+                for width in widths:
+                    resized = original.copy()
+                    resized.thumbnail((width, width * original.height // original.width or 1), Image.LANCZOS)
+                    variants[fmt][str(width)] = _encode(resized, fmt)
+    return variants
+
+
+def variant_paths(variants):
+    """Every derivative file named in a variants map."""
+    return [
+        name
+        for fmt, sizes in (variants or {}).items() if fmt != 'source'
+        for name in sizes.values()
+    ]
+
+
+def variants_for(image):
+    """The variants map of a MosqueImage, or None if it is missing or stale."""
+    variants = image.variants or {}
+    if variants.get('source') != image.image.name:
+        return None
+    return variants
+
+
+def srcset(image, url_builder):
+    """
+    {'jpeg': 'https://.../a.jpg 160w, https://.../b.jpg 480w', 'webp': ...}
+    for a MosqueImage, or None until its variants exist.
+    """
+    variants = variants_for(image)
+    if not variants:
+        return None
+    return {
+        fmt: ', '.join(
+            f"{url_builder(media_storage().url(name))} {width}w"
+            for width, name in sorted(sizes.items(), key=lambda item: int(item[0]))
+        )
+        for fmt, sizes in variants.items()
+        if fmt != 'source'
+    }
+
+
+def thumbnail_url(image, width, url_builder, fmt=FALLBACK_FORMAT):
+    """
+    URL of the smallest `fmt` variant at least `width` wide (or the widest
+    one). Falls back to the original while variants are being generated.
+    """
+    variants = variants_for(image)
+    sizes = (variants or {}).get(fmt)
+    if not sizes:
+        return url_builder(image.image.url)
+    ordered = sorted(sizes.items(), key=lambda item: int(item[0]))
+    name = next((name for w, name in ordered if int(w) >= width), ordered[-1][1])
+    return url_builder(media_storage().url(name))
@@ -0,0 +1,35 @@
+"""
+Management command to build resized derivatives for existing mosque images.
+
+New uploads get theirs from a background task; this backfills images
+stored before the pipeline existed (or after the variant settings change).
+
+Usage:
+    python manage.py generate_image_variants           # missing or stale only
+    python manage.py generate_image_variants --all     # rebuild everything
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Generate WebP/AVIF/JPEG derivatives for mosque images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild images that already have variants')
+
+    def handle(self, *args, **options):
+        from find_mosque.images import variants_for
+        from find_mosque.models import MosqueImage
+        from find_mosque.tasks import generate_image_variants
+
+        done = failed = 0
+        for image in MosqueImage.objects.exclude(image='').iterator():
+            if not options['all'] and variants_for(image):
+                continue
+            result = generate_image_variants.apply(args=(image.id,)).result
+            if result['status'] == 'success':
+                done += 1
+            else:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"Image {image.id}: {result.get('error', result['status'])}"))
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {done} images ({failed} failed)'))
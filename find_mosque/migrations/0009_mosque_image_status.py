@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('find_mosque', '0008_add_jumuah_fields_to_mosquemonthlyprayertime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mosque',
+            name='image_status',
+            field=models.CharField(choices=[('none', 'No remote image'), ('pending', 'Downloading'), ('ready', 'Downloaded'), ('failed', 'Download failed')], default='none', help_text='State of the timetable image submitted as a URL at registration', max_length=10),
+        ),
+    ]
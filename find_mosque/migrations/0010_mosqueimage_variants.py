@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-19 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('find_mosque', '0009_mosque_image_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mosqueimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized WebP/AVIF/JPEG derivatives, see find_mosque.images'),
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 4.2.27 on 2026-10-19 03:00
+
+import re
+import unicodedata
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+INDEX_NAME = 'find_mosque_mosque_search_trgm'
+
+# A frozen copy of find_mosque.search.build_search_text as of this
+# migration, so later changes to the app code don't change what it writes.
+BANGLA = {
+    'অ': 'o', 'আ': 'a', 'ই': 'i', 'ঈ': 'i', 'উ': 'u', 'ঊ': 'u', 'ঋ': 'ri',
+    'এ': 'e', 'ঐ': 'oi', 'ও': 'o', 'ঔ': 'ou',
+    'ক': 'k', 'খ': 'kh', 'গ': 'g', 'ঘ': 'gh', 'ঙ': 'ng',
+    'চ': 'ch', 'ছ': 'chh', 'জ': 'j', 'ঝ': 'jh', 'ঞ': 'n',
+    'ট': 't', 'ঠ': 'th', 'ড': 'd', 'ঢ': 'dh', 'ণ': 'n',
+    'ত': 't', 'থ': 'th', 'দ': 'd', 'ধ': 'dh', 'ন': 'n',
+    'প': 'p', 'ফ': 'f', 'ব': 'b', 'ভ': 'bh', 'ম': 'm',
+    'য': 'j', 'র': 'r', 'ল': 'l', 'শ': 'sh', 'ষ': 'sh', 'স': 's', 'হ': 'h',
+    'ড়': 'r', 'ঢ়': 'rh', 'য়': 'y', 'ৎ': 't', 'ং': 'ng', 'ঃ': 'h', 'ঁ': '',
+    'া': 'a', 'ি': 'i', 'ী': 'i', 'ু': 'u', 'ূ': 'u', 'ৃ': 'ri',
+    'ে': 'e', 'ৈ': 'oi', 'ো': 'o', 'ৌ': 'ou', '্': '',
+    '০': '0', '১': '1', '২': '2', '৩': '3', '৪': '4',
+    '৫': '5', '৬': '6', '৭': '7', '৮': '8', '৯': '9',
+}
+BANGLA = {unicodedata.normalize('NFC', key): value for key, value in BANGLA.items()}
+BANGLA_RE = re.compile('|'.join(sorted(map(re.escape, BANGLA), key=len, reverse=True)))
+NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+VOWELS = set('aeiouyw')
+SYNONYMS = [{'masjid', 'mosque'}]
+CONSONANT_FOLD = str.maketrans({'z': 'j', 'q': 'k', 'c': 'k', 'v': 'b', 'x': 'k', 'f': 'p'})
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFC', text or '').casefold()
+    text = BANGLA_RE.sub(lambda match: BANGLA[match.group(0)], text)
+    text = ''.join(
+        char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char)
+    )
+    return NON_WORD_RE.sub(' ', text).strip()
+
+
+def skeleton(word):
+    word = word.translate(CONSONANT_FOLD)
+    out = word[:1]
+    for prev, char in zip(word, word[1:]):
+        if char in VOWELS or (char == 'h' and prev not in VOWELS) or char == out[-1]:
+            continue
+        out += char
+    return out
+
+
+def build_search_text(*parts):
+    words = normalize(' '.join(part for part in parts if part)).split()
+    for group in SYNONYMS:
+        if group.intersection(words):
+            words.extend(sorted(group.difference(words)))
+    skeletons = ' '.join(f'~{skeleton(word)}' for word in words if not word.isdigit())
+    return f"{' '.join(words)} {skeletons}".strip()
+
+
+def populate_search_text(apps, schema_editor):
+    Mosque = apps.get_model('find_mosque', 'Mosque')
+    mosques = list(Mosque.objects.select_related('city__country'))
+    for mosque in mosques:
+        city = mosque.city
+        mosque.search_text = build_search_text(
+            mosque.name, mosque.address, city.name if city else '', city.country.name if city else ''
+        )
+    Mosque.objects.bulk_update(mosques, ['search_text'], batch_size=500)
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON find_mosque_mosque USING gin (search_text gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('find_mosque', '0010_mosqueimage_variants'),
+        ('locations', '0001_initial'),
+    ]
+
+    operations = [
+        # Creates pg_trgm on PostgreSQL; a no-op on other databases
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='mosque',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Normalized name, address, city and country for search (find_mosque.search)'),
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
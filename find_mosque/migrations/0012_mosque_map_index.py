@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-19 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('find_mosque', '0011_mosque_search_text'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mosque',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_verified', True)), fields=['latitude', 'longitude'], name='find_mosque_mosque_map_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.27 on 2026-10-19 03:42
+
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('find_mosque', '0012_mosque_map_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mosqueimage',
+            name='image',
+            field=models.ImageField(storage=api.storage.media_storage, upload_to='mosque_images/'),
+        ),
+    ]
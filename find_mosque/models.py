@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from api.storage import media_storage
 
 
 class Mosque(models.Model):
@@ -54,26 +58,66 @@ class Mosque(models.Model):
     # Status
     is_verified = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    IMAGE_STATUS_CHOICES = [
+        ('none', 'No remote image'),
+        ('pending', 'Downloading'),
+        ('ready', 'Downloaded'),
+        ('failed', 'Download failed'),
+    ]
+    image_status = models.CharField(
+        max_length=10,
+        choices=IMAGE_STATUS_CHOICES,
+        default='none',
+        help_text="State of the timetable image submitted as a URL at registration"
+    )
+    search_text = models.TextField(
+        blank=True, default='', editable=False,
+        help_text="Normalized name, address, city and country for search (find_mosque.search)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    SEARCH_SOURCE_FIELDS = {'name', 'address', 'city', 'city_id'}
+
     class Meta:
         ordering = ['name']
         verbose_name = 'Mosque'
         verbose_name_plural = 'Mosques'
+        indexes = [
+            # Bounding-box lookups for map tiles (find_mosque.tiles)
+            models.Index(
+                fields=['latitude', 'longitude'],
+                name='find_mosque_mosque_map_idx',
+                condition=models.Q(is_verified=True, is_active=True),
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        from find_mosque.search import mosque_search_text
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.SEARCH_SOURCE_FIELDS.intersection(update_fields):
+            self.search_text = mosque_search_text(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_text'}
+        super().save(*args, **kwargs)
+
 
 class MosqueImage(models.Model):
     """
     Model for mosque images.
     """
     mosque = models.ForeignKey(Mosque, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='mosque_images/')
+    image = models.ImageField(upload_to='mosque_images/', storage=media_storage)
     caption = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
+    variants = models.JSONField(
+        default=dict, blank=True,
+        help_text="Resized WebP/AVIF/JPEG derivatives, see find_mosque.images"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -85,6 +129,86 @@ class MosqueImage(models.Model):
         return f"{self.mosque.name} - Image"
 
 
+@receiver(post_save, sender='locations.City')
+def refresh_city_search_text(sender, instance, created, **kwargs):
+    """Keep search_text of the city's mosques in step with a renamed city."""
+    if created:
+        return
+    from find_mosque.search import mosque_search_text
+
+    mosques = list(Mosque.objects.filter(city=instance).only('id', 'name', 'address', 'city_id', 'search_text'))
+    country_name = instance.country.name if instance.country_id else ''
+    changed = []
+    for mosque in mosques:
+        text = mosque_search_text(mosque, instance.name, country_name)
+        if text != mosque.search_text:
+            mosque.search_text = text
+            changed.append(mosque)
+    Mosque.objects.bulk_update(changed, ['search_text'], batch_size=500)
+
+
+@receiver(pre_save, sender=Mosque)
+def remember_tile_position(sender, instance, update_fields=None, **kwargs):
+    """Note where the mosque was on the map, so its old tiles can be dropped."""
+    from find_mosque.tiles import TILE_FIELDS
+
+    instance._tile_previous = None
+    if instance.pk and (update_fields is None or TILE_FIELDS.intersection(update_fields)):
+        instance._tile_previous = Mosque.objects.filter(pk=instance.pk).values_list(
+            'latitude', 'longitude'
+        ).first()
+
+
+@receiver(post_save, sender=Mosque)
+@receiver(post_delete, sender=Mosque)
+def invalidate_mosque_tiles(sender, instance, update_fields=None, **kwargs):
+    from find_mosque.tiles import TILE_FIELDS, invalidate_point
+
+    if update_fields is not None and not TILE_FIELDS.intersection(update_fields):
+        return
+    points = {(instance.latitude, instance.longitude)}
+    if getattr(instance, '_tile_previous', None):
+        points.add(instance._tile_previous)
+    transaction.on_commit(lambda: [invalidate_point(*point) for point in points])
+
+
+@receiver(post_save, sender=MosqueImage)
+def queue_image_variants(sender, instance, update_fields=None, **kwargs):
+    """Generate derivatives in the background whenever the image file changes."""
+    if update_fields and 'image' not in update_fields:
+        return
+    if not instance.image or (instance.variants or {}).get('source') == instance.image.name:
+        return
+    from find_mosque.tasks import generate_image_variants
+    from push_notification.enqueue import enqueue_task
+
+    image_id = instance.id
+    transaction.on_commit(lambda: enqueue_task(generate_image_variants, image_id))
+
+
+@receiver(pre_save, sender=MosqueImage)
+def release_replaced_image(sender, instance, update_fields=None, **kwargs):
+    """Drop the content-addressed store's reference to a file being replaced."""
+    from api.storage import is_content_addressed, release
+
+    if not instance.pk or not is_content_addressed(media_storage()):
+        return
+    if update_fields and 'image' not in update_fields:
+        return
+    previous = MosqueImage.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+    if previous and previous != instance.image.name:
+        transaction.on_commit(lambda: release(previous))
+
+
+@receiver(post_delete, sender=MosqueImage)
+def release_deleted_image(sender, instance, **kwargs):
+    from api.storage import release
+    from find_mosque.images import variant_paths
+
+    paths = [instance.image.name] + variant_paths(instance.variants)
+    transaction.on_commit(lambda: [release(path) for path in paths])
+
+
 class FavoriteMosque(models.Model):
     """
     Model to store user's favorite mosques.
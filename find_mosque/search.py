@@ -0,0 +1,145 @@
+"""
+Mosque search over the normalized Mosque.search_text column.
+
+search_text holds the mosque's name, address, city and country, folded
+to lower-case ASCII with Bangla transliterated to Latin. Each word also
+gets a consonant skeleton, prefixed with '~', so spellings that differ
+only in vowels match each other: 'Baitul Mukarram', 'Baytul Mokarram'
+and 'বায়তুল মোকাররম' all give '~btl ~mkrm'.
+
+On PostgreSQL the column has a pg_trgm GIN index. Results are matched
+and ranked by trigram word similarity, which also tolerates typos. Other
+databases fall back to substring and skeleton matching on the same
+column.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from rest_framework import filters
+
+BANGLA = {
+    # independent vowels
+    'অ': 'o', 'আ': 'a', 'ই': 'i', 'ঈ': 'i', 'উ': 'u', 'ঊ': 'u', 'ঋ': 'ri',
+    'এ': 'e', 'ঐ': 'oi', 'ও': 'o', 'ঔ': 'ou',
+    # consonants
+    'ক': 'k', 'খ': 'kh', 'গ': 'g', 'ঘ': 'gh', 'ঙ': 'ng',
+    'চ': 'ch', 'ছ': 'chh', 'জ': 'j', 'ঝ': 'jh', 'ঞ': 'n',
+    'ট': 't', 'ঠ': 'th', 'ড': 'd', 'ঢ': 'dh', 'ণ': 'n',
+    'ত': 't', 'থ': 'th', 'দ': 'd', 'ধ': 'dh', 'ন': 'n',
+    'প': 'p', 'ফ': 'f', 'ব': 'b', 'ভ': 'bh', 'ম': 'm',
+    'য': 'j', 'র': 'r', 'ল': 'l', 'শ': 'sh', 'ষ': 'sh', 'স': 's', 'হ': 'h',
+    'ড়': 'r', 'ঢ়': 'rh', 'য়': 'y', 'ৎ': 't', 'ং': 'ng', 'ঃ': 'h', 'ঁ': '',
+    # vowel signs and virama
+    'া': 'a', 'ি': 'i', 'ী': 'i', 'ু': 'u', 'ূ': 'u', 'ৃ': 'ri',
+    'ে': 'e', 'ৈ': 'oi', 'ো': 'o', 'ৌ': 'ou', '্': '',
+    # digits
+    '০': '0', '১': '1', '২': '2', '৩': '3', '৪': '4',
+    '৫': '5', '৬': '6', '৭': '7', '৮': '8', '৯': '9',
+}
+# ড়, ঢ় and য় are stored decomposed (letter + nukta) after NFC; match that form.
+BANGLA = {unicodedata.normalize('NFC', key): value for key, value in BANGLA.items()}
+_BANGLA_RE = re.compile('|'.join(sorted(map(re.escape, BANGLA), key=len, reverse=True)))
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+_VOWELS = set('aeiouyw')
+# Words indexed together, so searching for one finds the others
+_SYNONYMS = [{'masjid', 'mosque'}]
+# Letters romanized interchangeably in Bangla names
+_CONSONANT_FOLD = str.maketrans({'z': 'j', 'q': 'k', 'c': 'k', 'v': 'b', 'x': 'k', 'f': 'p'})
+
+
+def normalize(text):
+    """Lower-case ASCII words: accents stripped, Bangla transliterated."""
+    text = unicodedata.normalize('NFC', text or '').casefold()
+    text = _BANGLA_RE.sub(lambda match: BANGLA[match.group(0)], text)
+    text = ''.join(
+        char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char)
+    )
+    return _NON_WORD_RE.sub(' ', text).strip()
+
+
+def skeleton(word):
+    """
+    Consonant skeleton of a normalized word. The first letter is kept;
+    later vowels and aspiration 'h's are dropped, and doubled letters
+    are folded.
+    """
+    word = word.translate(_CONSONANT_FOLD)
+    out = word[:1]
+    for prev, char in zip(word, word[1:]):
+        if char in _VOWELS or (char == 'h' and prev not in _VOWELS) or char == out[-1]:
+            continue
+        out += char
+    return out
+
+
+def build_search_text(*parts):
+    words = normalize(' '.join(part for part in parts if part)).split()
+    for group in _SYNONYMS:
+        if group.intersection(words):
+            words.extend(sorted(group.difference(words)))
+    skeletons = ' '.join(f'~{skeleton(word)}' for word in words if not word.isdigit())
+    return f"{' '.join(words)} {skeletons}".strip()
+
+
+def mosque_search_text(mosque, city_name=None, country_name=None):
+    if city_name is None and mosque.city_id:
+        from locations.models import City
+
+        city_name, country_name = (
+            City.objects.filter(pk=mosque.city_id).values_list('name', 'country__name').first()
+            or ('', '')
+        )
+    return build_search_text(mosque.name, mosque.address, city_name, country_name)
+
+
+def search_mosques(queryset, query):
+    """
+    Filter `queryset` to mosques matching `query` and annotate
+    `search_rank` (higher is better).
+    """
+    normalized = normalize(query)
+    if not normalized:
+        return queryset.annotate(search_rank=Value(0, output_field=IntegerField()))
+    words = normalized.split()
+
+    # Every word must appear as typed or, from three consonants up, by skeleton.
+    matches_all = Q()
+    for word in words:
+        word_q = Q(search_text__contains=word)
+        word_skeleton = skeleton(word)
+        if len(word_skeleton) >= 3:
+            word_q |= Q(search_text__contains=f'~{word_skeleton}')
+        matches_all &= word_q
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        return queryset.filter(
+            matches_all | Q(search_text__trigram_word_similar=normalized)
+        ).annotate(search_rank=TrigramWordSimilarity(normalized, 'search_text'))
+
+    return queryset.filter(matches_all).annotate(search_rank=Case(
+        When(name__istartswith=query.strip(), then=Value(3)),
+        When(search_text__startswith=normalized, then=Value(2)),
+        When(search_text__contains=normalized, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+
+class MosqueSearchFilter(filters.SearchFilter):
+    """
+    ?search= against the mosque search index, best matches first unless
+    the request asks for an explicit ?ordering=.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        queryset = search_mosques(queryset, query)
+        if filters.OrderingFilter.ordering_param in request.query_params:
+            return queryset
+        return queryset.order_by('-search_rank', 'name')
@@ -1,13 +1,13 @@
 import json
-import io
-import requests
-from PIL import Image
 
 from rest_framework import serializers
-from django.core.files.base import ContentFile
+from django.db import transaction
 from django.conf import settings
+from api.fieldsets import SparseFieldsetSerializerMixin
+from .images import srcset, thumbnail_url
 from .models import Mosque, MosqueImage, FavoriteMosque, MosqueMonthlyPrayerTime, MosqueAnnouncement
 from locations.models import City, Country
+from locations.serializers import CityListSerializer
 
 
 def build_image_url(request, image_url_path):
@@ -57,14 +57,19 @@ class MosqueAnnouncementSerializer(serializers.ModelSerializer):
 
 class MosqueImageSerializer(serializers.ModelSerializer):
     """Serializer for MosqueImage model."""
+    srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = MosqueImage
-        fields = ['id', 'image', 'caption', 'is_primary', 'created_at']
+        fields = ['id', 'image', 'srcset', 'caption', 'is_primary', 'created_at']
         read_only_fields = ['created_at']
 
+    def get_srcset(self, obj):
+        request = self.context.get('request')
+        return srcset(obj, lambda url: build_image_url(request, url) if request else url)
+
 
-class MosqueSerializer(serializers.ModelSerializer):
+class MosqueSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for Mosque model."""
     city_name = serializers.CharField(source='city.name', read_only=True)
     country_name = serializers.CharField(source='city.country.name', read_only=True)
@@ -83,34 +88,55 @@ class MosqueSerializer(serializers.ModelSerializer):
             'maghrib_sunset', 'isha_beginning',
             'fajr_jamaah', 'dhuhr_jamaah', 'asr_jamaah',
             'maghrib_jamaah', 'isha_jamaah', 'jumuah_khutbah',
-            'is_verified', 'is_active', 'created_by', 'images',
+            'is_verified', 'is_active', 'created_by', 'images', 'image_status',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['is_verified', 'created_at', 'updated_at']
+        read_only_fields = ['is_verified', 'image_status', 'created_at', 'updated_at']
 
+    def get_expandable_fields(self):
+        return {'city': CityListSerializer(read_only=True)}
 
-class MosqueListSerializer(serializers.ModelSerializer):
+
+class MosqueListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Simplified serializer for list views."""
     city_name = serializers.CharField(source='city.name', read_only=True)
     country_name = serializers.CharField(source='city.country.name', read_only=True)
     primary_image = serializers.SerializerMethodField()
+    primary_image_srcset = serializers.SerializerMethodField()
+    sparse_sources = {'primary_image': ['images'], 'primary_image_srcset': ['images']}
     
     class Meta:
         model = Mosque
         fields = [
             'id', 'name', 'contact_person', 'city_name', 'country_name', 'address',
             'phone', 'email', 'latitude', 'longitude', 'has_jumuah', 'capacity',
-            'is_verified', 'primary_image'
+            'is_verified', 'primary_image', 'primary_image_srcset'
         ]
+
+    def get_expandable_fields(self):
+        return {
+            'city': CityListSerializer(read_only=True),
+            'images': MosqueImageSerializer(many=True, read_only=True),
+        }
+
+    def _primary(self, obj):
+        # images is prefetched by the list view; default ordering puts the primary first
+        images = obj.images.all()
+        return images[0] if images else None
+
+    def _url(self, url):
+        return build_image_url(self.context['request'], url)
     
     def get_primary_image(self, obj):
-        primary = obj.images.filter(is_primary=True).first()
-        if primary:
-            return build_image_url(self.context['request'], primary.image.url)
-        first_image = obj.images.first()
-        if first_image:
-            return build_image_url(self.context['request'], first_image.image.url)
-        return None
+        """A list-sized JPEG thumbnail; the original is only served by detail views."""
+        image = self._primary(obj)
+        if image is None:
+            return None
+        return thumbnail_url(image, getattr(settings, 'MOSQUE_IMAGE_LIST_WIDTH', 480), self._url)
+
+    def get_primary_image_srcset(self, obj):
+        image = self._primary(obj)
+        return srcset(image, self._url) if image else None
 
 
 class RegisterMosqueSerializer(serializers.Serializer):
@@ -155,29 +181,6 @@ class RegisterMosqueSerializer(serializers.Serializer):
             return {}
         return value
 
-    def _download_image_from_url(self, image_url):
-        """Download image from URL and return a file-like object."""
-        try:
-            response = requests.get(image_url, timeout=10)
-            response.raise_for_status()
-            
-            # Validate that the response is an image
-            if 'image' not in response.headers.get('content-type', ''):
-                return None
-            
-            # Open the image to validate it's a proper image file
-            img = Image.open(io.BytesIO(response.content))
-            
-            # Get filename from URL or use a default
-            filename = image_url.split('/')[-1] or 'prayer_timetable.png'
-            
-            # Create a file-like object
-            img_file = ContentFile(response.content, name=filename)
-            return img_file
-        except Exception as e:
-            print(f"Error downloading image from URL: {e}")
-            return None
-
     def create(self, validated_data):
         country = Country.objects.filter(code='BGD').first() or Country.objects.filter(name__iexact='Bangladesh').first()
         if not country:
@@ -248,26 +251,26 @@ class RegisterMosqueSerializer(serializers.Serializer):
             isha_jamaah=time_or_none(prayer_times.get('isha_jamaah')),
             is_verified=False,
             is_active=True,
+            image_status='pending' if isinstance(prayer_timetable_image, str) else 'none',
         )
 
-        if prayer_timetable_image:
-            image_file = None
-            
-            # Check if it's a string (URL) or a file object
-            if isinstance(prayer_timetable_image, str):
-                # It's a URL string, download it
-                image_file = self._download_image_from_url(prayer_timetable_image)
-            else:
-                # It's already a file object
-                image_file = prayer_timetable_image
-            
-            if image_file:
-                MosqueImage.objects.create(
-                    mosque=mosque,
-                    image=image_file,
-                    caption='Prayer timetable image',
-                    is_primary=True,
-                )
+        if isinstance(prayer_timetable_image, str):
+            # Remote images are fetched by a worker so registration never
+            # waits on a third-party host.
+            from find_mosque.tasks import fetch_mosque_image
+            from push_notification.enqueue import enqueue_task
+
+            mosque_id = mosque.id
+            transaction.on_commit(
+                lambda: enqueue_task(fetch_mosque_image, mosque_id, prayer_timetable_image)
+            )
+        elif prayer_timetable_image:
+            MosqueImage.objects.create(
+                mosque=mosque,
+                image=prayer_timetable_image,
+                caption='Prayer timetable image',
+                is_primary=True,
+            )
 
         return mosque
 
@@ -0,0 +1,180 @@
+"""
+Celery tasks for mosques.
+"""
+import ipaddress
+import logging
+import os
+import socket
+import tempfile
+from urllib.parse import urlparse
+
+from celery import shared_task
+from django.conf import settings
+from django.core.files import File
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp'}
+CHUNK_SIZE = 64 * 1024
+
+
+class RemoteImageError(Exception):
+    pass
+
+
+def _check_url(image_url):
+    """
+    Only fetch http(s) URLs that resolve to public addresses.
+    Returns the vetted address to connect to.
+    """
+    parsed = urlparse(image_url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise RemoteImageError('Only http(s) image URLs are supported')
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)]
+    except socket.gaierror as exc:
+        raise RemoteImageError(f'Cannot resolve {parsed.hostname}: {exc}')
+    if not addresses:
+        raise RemoteImageError(f'Cannot resolve {parsed.hostname}')
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if not ip.is_global:
+            raise RemoteImageError(f'{parsed.hostname} resolves to a non-public address')
+    return addresses[0].split('%')[0]
+
+
+def _pinned_session(parsed, address):
+    """
+    A requests session whose connections go to `address` while the request
+    keeps the original Host header, TLS SNI and certificate hostname check,
+    so the name cannot be re-resolved to another address after _check_url.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    class PinnedAddressAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            if parsed.scheme == 'https':
+                kwargs['server_hostname'] = parsed.hostname
+                kwargs['assert_hostname'] = parsed.hostname
+            super().init_poolmanager(*args, **kwargs)
+
+    session = requests.Session()
+    session.mount(f'{parsed.scheme}://', PinnedAddressAdapter())
+    return session
+
+
+def download_remote_image(image_url, destination, max_bytes):
+    """
+    Stream `image_url` into the open binary file `destination`.
+
+    Rejects non-image content types and bodies over `max_bytes` (by
+    Content-Length up front, and while streaming for chunked responses).
+    Returns the response content type.
+    """
+    address = _check_url(image_url)
+    parsed = urlparse(image_url)
+    host = f'[{address}]' if ':' in address else address
+    netloc = f'{host}:{parsed.port}' if parsed.port else host
+    pinned_url = parsed._replace(netloc=netloc).geturl()
+    host_header = f'{parsed.hostname}:{parsed.port}' if parsed.port else parsed.hostname
+
+    with _pinned_session(parsed, address) as session, session.get(
+        pinned_url, headers={'Host': host_header}, stream=True, timeout=(5, 10), allow_redirects=False
+    ) as response:
+        response.raise_for_status()
+        content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+        if content_type not in ALLOWED_IMAGE_TYPES:
+            raise RemoteImageError(f'Unsupported content type {content_type or "(none)"}')
+        declared = response.headers.get('content-length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise RemoteImageError(f'Image is {declared} bytes, limit is {max_bytes}')
+
+        received = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            received += len(chunk)
+            if received > max_bytes:
+                raise RemoteImageError(f'Image exceeds {max_bytes} bytes')
+            destination.write(chunk)
+    return content_type
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=60)
+def fetch_mosque_image(self, mosque_id, image_url):
+    """
+    Download a timetable image submitted as a URL at registration and
+    attach it to the mosque as its primary MosqueImage.
+    """
+    from PIL import Image
+    import requests
+
+    from find_mosque.models import Mosque, MosqueImage
+
+    max_bytes = getattr(settings, 'MOSQUE_IMAGE_MAX_BYTES', 5 * 1024 * 1024)
+    mosque = Mosque.objects.filter(id=mosque_id).first()
+    if mosque is None or mosque.image_status != 'pending':
+        return {'status': 'skipped', 'mosque_id': mosque_id}
+
+    with tempfile.TemporaryFile() as tmp:
+        try:
+            download_remote_image(image_url, tmp, max_bytes)
+            tmp.seek(0)
+            # Only the header is parsed; verify() checks the file structure
+            # without decoding the pixel data.
+            with Image.open(tmp) as img:
+                img.verify()
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            if self.request.retries < self.max_retries:
+                raise self.retry(exc=exc)
+            return _image_failed(mosque_id, image_url, exc)
+        except Exception as exc:
+            return _image_failed(mosque_id, image_url, exc)
+
+        tmp.seek(0)
+        filename = os.path.basename(urlparse(image_url).path) or 'prayer_timetable.png'
+        image = MosqueImage.objects.create(
+            mosque=mosque,
+            image=File(tmp, name=filename),
+            caption='Prayer timetable image',
+            is_primary=True,
+        )
+
+    Mosque.objects.filter(id=mosque_id).update(image_status='ready')
+    logger.info(f"Attached remote image to mosque {mosque_id}")
+    return {'status': 'success', 'mosque_id': mosque_id, 'image_id': image.id}
+
+
+def _image_failed(mosque_id, image_url, exc):
+    from find_mosque.models import Mosque
+
+    logger.warning(f"Could not fetch image for mosque {mosque_id} from {image_url}: {exc}")
+    Mosque.objects.filter(id=mosque_id).update(image_status='failed')
+    return {'status': 'failed', 'mosque_id': mosque_id, 'error': str(exc)}
+
+
+@shared_task
+def generate_image_variants(image_id):
+    """
+    Write the resized WebP/AVIF/JPEG derivatives of a MosqueImage and
+    record them in its variants map.
+    """
+    from api.storage import release
+    from find_mosque.images import generate_variants, variant_paths
+    from find_mosque.models import MosqueImage
+
+    image = MosqueImage.objects.filter(id=image_id).first()
+    if image is None or not image.image:
+        return {'status': 'skipped', 'image_id': image_id}
+
+    try:
+        variants = generate_variants(image.image)
+    except Exception as exc:
+        logger.warning(f"Could not generate variants for mosque image {image_id}: {exc}")
+        return {'status': 'failed', 'image_id': image_id, 'error': str(exc)}
+
+    # The file may have been replaced while we were encoding.
+    updated = MosqueImage.objects.filter(id=image_id, image=variants['source']).update(variants=variants)
+    for path in variant_paths(image.variants if updated else variants):
+        release(path)
+    return {'status': 'success' if updated else 'stale', 'image_id': image_id}
@@ -1,3 +1,243 @@
-from django.test import TestCase
+import importlib
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from locations.models import City, Country
+
+from .models import Mosque
+from .search import build_search_text, search_mosques
+from .tiles import EXTENT, build_tile, get_tile, tile_bounds, tile_cache_key, tile_for
+
+
+def make_city(name='Dhaka'):
+    country, _ = Country.objects.get_or_create(name='Bangladesh', code='BGD')
+    return City.objects.create(name=name, country=country, latitude=23.8, longitude=90.4, timezone='Asia/Dhaka')
+
+
+class TileMathTests(SimpleTestCase):
+
+    def test_world_tile_covers_the_mercator_square(self):
+        west, south, east, north = tile_bounds(0, 0, 0)
+        self.assertEqual((west, east), (-180, 180))
+        self.assertAlmostEqual(north, 85.0511287798)
+        self.assertAlmostEqual(south, -85.0511287798)
+
+    def test_tile_for_lands_inside_its_bounds(self):
+        for latitude, longitude in [(23.8103, 90.4125), (51.5074, -0.1278), (-33.8688, 151.2093)]:
+            for z in (0, 4, 10, 16):
+                with self.subTest(point=(latitude, longitude), z=z):
+                    west, south, east, north = tile_bounds(z, *tile_for(latitude, longitude, z))
+                    self.assertTrue(west <= longitude < east)
+                    self.assertTrue(south < latitude <= north)
+
+    def test_points_on_an_edge_belong_to_the_tile_to_the_south_east(self):
+        self.assertEqual(tile_for(0, 0, 1), (1, 1))
+        self.assertEqual(tile_bounds(1, 1, 1)[3], 0)
+
+    def test_poles_and_antimeridian_are_clamped(self):
+        self.assertEqual(tile_for(90, 180, 3), (7, 0))
+        self.assertEqual(tile_for(-90, -180, 3), (0, 7))
+
+
+@override_settings(MOSQUE_TILE_CLUSTER_ZOOM=13)
+class MosqueTileTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.city = make_city()
+
+    def _mosque(self, latitude, longitude, **fields):
+        fields = {'is_verified': True, 'name': 'Baitul Mukarram', 'address': 'Dhaka', **fields}
+        return Mosque.objects.create(city=self.city, latitude=latitude, longitude=longitude, **fields)
+
+    def test_mosque_on_a_tile_edge_appears_in_one_tile_only(self):
+        mosque = self._mosque(0, 0)
+
+        tiles = {(x, y): build_tile(1, x, y)['clusters'] + build_tile(1, x, y)['markers'] for x in (0, 1) for y in (0, 1)}
+
+        self.assertEqual([key for key, items in tiles.items() if items], [(1, 1)])
+        self.assertEqual(build_tile(1, 1, 1)['markers'][0][0], mosque.id)
+
+    def test_high_zoom_tiles_list_every_mosque_with_flags(self):
+        first = self._mosque('23.810300', '90.412500', has_jumuah=True, has_women_facility=True, has_wudu_area=False)
+        self._mosque('23.810400', '90.412600', is_verified=False)
+        z = 16
+        x, y = tile_for(23.8103, 90.4125, z)
+
+        tile = build_tile(z, x, y)
+
+        self.assertEqual(tile['clusters'], [])
+        [[mosque_id, px, py, flags]] = tile['markers']
+        self.assertEqual((mosque_id, flags), (first.id, 0b11))
+        self.assertTrue(0 <= px < EXTENT and 0 <= py < EXTENT)
+
+    def test_low_zoom_tiles_cluster_crowded_cells_and_keep_lone_markers(self):
+        for offset in range(3):
+            self._mosque(f'23.81{offset}000', '90.412500')
+        lone = self._mosque('22.356900', '91.783200')
+        z = 5
+        x, y = tile_for(23.81, 90.41, z)
+        self.assertEqual(tile_for(22.3569, 91.7832, z), (x, y))
+
+        tile = build_tile(z, x, y)
+
+        self.assertEqual([cluster[2] for cluster in tile['clusters']], [3])
+        self.assertEqual([marker[0] for marker in tile['markers']], [lone.id])
+
+    def test_moving_a_mosque_drops_its_old_and_new_tiles(self):
+        mosque = self._mosque('23.810300', '90.412500')
+        z = 14
+        old_tile = tile_for(23.8103, 90.4125, z)
+        new_tile = tile_for(22.3569, 91.7832, z)
+        get_tile(z, *old_tile)
+        get_tile(z, *new_tile)
+
+        mosque.latitude, mosque.longitude = '22.356900', '91.783200'
+        with self.captureOnCommitCallbacks(execute=True):
+            mosque.save()
+
+        self.assertIsNone(cache.get(tile_cache_key(z, *old_tile)))
+        self.assertIsNone(cache.get(tile_cache_key(z, *new_tile)))
+
+    def test_saves_of_fields_off_the_map_skip_the_position_lookup(self):
+        mosque = self._mosque('23.810300', '90.412500')
+
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            mosque.phone = '0123456789'
+            mosque.save(update_fields=['phone'])
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(2):
+            mosque.latitude = '23.900000'
+            mosque.save(update_fields=['latitude'])
+        self.assertEqual(len(callbacks), 1)
+
+    def test_tile_endpoint_answers_conditional_requests(self):
+        self._mosque('23.810300', '90.412500')
+        x, y = tile_for(23.8103, 90.4125, 14)
+        url = f'/api/mosques/tiles/14/{x}/{y}/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['markers']), 1)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.client.get('/api/mosques/tiles/2/4/0/').status_code, 404)
+
+
+class MosqueSearchTests(TestCase):
+
+    def setUp(self):
+        self.city = make_city()
+        self.mukarram = Mosque.objects.create(
+            name='Baitul Mukarram', address='Paltan', city=self.city, is_verified=True
+        )
+        self.lalbagh = Mosque.objects.create(
+            name='Lalbagh Shahi Masjid', address='Lalbagh Road', city=self.city, is_verified=True
+        )
+
+    def _search(self, query):
+        # Pin the substring fallback even when the suite runs on PostgreSQL.
+        with mock.patch('find_mosque.search.connection') as connection:
+            connection.vendor = 'sqlite'
+            return list(
+                search_mosques(Mosque.objects.all(), query).order_by('-search_rank', 'name').values_list('name', flat=True)
+            )
+
+    def test_bangla_and_romanized_spellings_share_a_skeleton(self):
+        self.assertTrue(build_search_text('বায়তুল মোকাররম').endswith('~btl ~mkrm'))
+        self.assertTrue(build_search_text('Baytul Mokarram').endswith('~btl ~mkrm'))
+
+    def test_finds_a_mosque_by_any_spelling(self):
+        for query in ('বায়তুল মোকাররম', 'Baytul Mokarram', 'BAITUL', 'Báitul Mukarram', 'dhaka mukarram'):
+            with self.subTest(query=query):
+                self.assertEqual(self._search(query), ['Baitul Mukarram'])
+
+    def test_synonyms_and_non_matches(self):
+        self.assertEqual(self._search('lalbagh mosque'), ['Lalbagh Shahi Masjid'])
+        self.assertEqual(self._search('Chittagong'), [])
+
+    def test_fallback_ranks_name_prefixes_first(self):
+        Mosque.objects.create(name='Old Lalbagh Masjid', address='Dhaka', city=self.city, is_verified=True)
+        self.assertEqual(self._search('lalbagh'), ['Lalbagh Shahi Masjid', 'Old Lalbagh Masjid'])
+
+    def test_search_endpoint_uses_the_index(self):
+        response = self.client.get('/api/mosques/', {'search': 'মোকাররম'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        results = results.get('results', results)
+        self.assertEqual([mosque['id'] for mosque in results], [self.mukarram.id])
+
+    def test_migration_populates_search_text_with_its_frozen_builder(self):
+        migration = importlib.import_module('find_mosque.migrations.0011_mosque_search_text')
+        Mosque.objects.update(search_text='')
+
+        migration.populate_search_text(apps, None)
+
+        self.mukarram.refresh_from_db()
+        self.assertEqual(
+            self.mukarram.search_text,
+            migration.build_search_text('Baitul Mukarram', 'Paltan', 'Dhaka', 'Bangladesh'),
+        )
+        self.assertIn('~btl ~mkrm', self.mukarram.search_text)
+
+
+class RegisterMosqueTests(TestCase):
+
+    SUBMITTED_URL = 'https://files.example.com/timetable.png?token=secret'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('imam', 'imam@example.com', 'pass12345'))
+        delay = mock.patch('push_notification.tasks.send_mosque_registration_email.delay')
+        self.send_email = delay.start()
+        self.addCleanup(delay.stop)
+
+    def _register(self):
+        response = self.client.post('/api/mosques/register/', {
+            'mosque_name': 'Baitul Mukarram', 'phone': '0123456789', 'address': 'Paltan', 'area': 'Dhaka',
+            'prayer_timetable_image': self.SUBMITTED_URL,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response
+
+    def test_email_waits_on_the_fetch_instead_of_linking_the_submitted_url(self):
+        with mock.patch('push_notification.enqueue.enqueue_task'):
+            response = self._register()
+
+        self.assertEqual(self.send_email.call_args.kwargs['image_url'], 'pending')
+        self.assertIsNone(response.data['prayer_timetable_image_url'])
+        self.assertEqual(response.data['image_status'], 'pending')
+
+    def test_refused_image_is_reported_as_rejected(self):
+        def fetch_inline(task, mosque_id, image_url):
+            Mosque.objects.filter(id=mosque_id).update(image_status='failed')
+
+        with mock.patch('push_notification.enqueue.enqueue_task', side_effect=fetch_inline), \
+                mock.patch('django.db.transaction.on_commit', side_effect=lambda func, *args, **kwargs: func()):
+            response = self._register()
+
+        self.assertEqual(self.send_email.call_args.kwargs['image_url'], 'rejected')
+        self.assertIsNone(response.data['prayer_timetable_image_url'])
+
+    def test_email_body_explains_a_missing_image(self):
+        from push_notification.tasks import send_mosque_registration_email
+
+        User.objects.create_user('admin', 'admin@example.com', 'pass12345', is_staff=True)
+        mosque = Mosque.objects.create(name='Star Mosque', address='Dhaka', city=make_city())
+
+        send_mosque_registration_email.run(mosque.id, 'pending', 'https://example.com/admin/')
+
+        [email] = mail.outbox
+        self.assertIn('Pending: still being fetched', email.body)
+        self.assertNotIn('example.com/timetable', email.body)
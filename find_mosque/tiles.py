@@ -0,0 +1,165 @@
+"""
+Map tiles of verified mosques, for MosqueViewSet.tile.
+
+Tiles use the usual web map z/x/y (Web Mercator) scheme, so a map client
+requests only the tiles in view. A tile is one small JSON document:
+
+    {"z": 14, "x": 12213, "y": 7119, "extent": 4096,
+     "markers": [[id, x, y, flags], ...],
+     "clusters": [[x, y, count], ...]}
+
+Marker and cluster positions are integer pixel coordinates inside the
+tile (0..extent-1, origin top left), which is all the precision a marker
+needs. `flags` is a bitfield over FLAG_FIELDS: bit 0 is has_jumuah, bit 1
+has_women_facility, and so on.
+
+Below MOSQUE_TILE_CLUSTER_ZOOM the tile is split into a CLUSTER_GRID x
+CLUSTER_GRID grid, grouped in the database. A cell holding one mosque
+gives a marker; a fuller cell gives a cluster at its members' mean
+position. Cells are even in latitude rather than in Mercator y, which is
+indistinguishable at the zooms where a single tile covers a country or a
+city.
+
+Rendered tiles are cached as bytes. Saving or deleting a mosque drops
+every cached tile, at every zoom, that held its old or new position.
+"""
+import hashlib
+import json
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, FloatField, Min
+from django.db.models.functions import Cast, Floor
+
+EXTENT = 4096
+CLUSTER_GRID = 8
+MAX_LATITUDE = 85.0511287798
+FLAG_FIELDS = (
+    'has_jumuah', 'has_women_facility', 'has_wudu_area',
+    'has_parking', 'has_quran_classes', 'has_ramadan_iftar',
+)
+# Fields whose change moves a mosque on, onto or off the map
+TILE_FIELDS = {'latitude', 'longitude', 'is_verified', 'is_active', *FLAG_FIELDS}
+CACHE_PREFIX = 'mosque-tile'
+
+
+def max_zoom():
+    return getattr(settings, 'MOSQUE_TILE_MAX_ZOOM', 18)
+
+
+def tile_bounds(z, x, y):
+    """(west, south, east, north) of a tile, in degrees."""
+    n = 2 ** z
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, latitude(y + 1), (x + 1) / n * 360 - 180, latitude(y)
+
+
+def _tile_position(latitude, longitude, z):
+    """Fractional (x, y) tile coordinates of a point at zoom z."""
+    n = 2 ** z
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    lat = math.radians(latitude)
+    x = (longitude + 180) / 360 * n
+    y = (1 - math.log(math.tan(lat) + 1 / math.cos(lat)) / math.pi) / 2 * n
+    return x, y
+
+
+def tile_for(latitude, longitude, z):
+    x, y = _tile_position(latitude, longitude, z)
+    n = 2 ** z
+    return min(int(x), n - 1), min(int(y), n - 1)
+
+
+def _pixel(latitude, longitude, z, x, y):
+    tx, ty = _tile_position(float(latitude), float(longitude), z)
+    clamp = EXTENT - 1
+    return (
+        max(0, min(clamp, int((tx - x) * EXTENT))),
+        max(0, min(clamp, int((ty - y) * EXTENT))),
+    )
+
+
+def _flags(values):
+    return sum(1 << bit for bit, value in enumerate(values) if value)
+
+
+def _mosques(z, x, y):
+    from .models import Mosque
+
+    west, south, east, north = tile_bounds(z, x, y)
+    # Half-open so a mosque on a tile edge appears in exactly one tile: the
+    # one tile_for() picks. Tile y grows southwards, so the north edge is in.
+    return Mosque.objects.filter(
+        is_verified=True,
+        is_active=True,
+        latitude__gt=south, latitude__lte=north,
+        longitude__gte=west, longitude__lt=east,
+    ).order_by()
+
+
+def _markers(queryset, z, x, y):
+    rows = queryset.values_list('id', 'latitude', 'longitude', *FLAG_FIELDS)
+    return [
+        [mosque_id, *_pixel(latitude, longitude, z, x, y), _flags(flags)]
+        for mosque_id, latitude, longitude, *flags in rows
+    ]
+
+
+def build_tile(z, x, y):
+    queryset = _mosques(z, x, y)
+    tile = {'z': z, 'x': x, 'y': y, 'extent': EXTENT, 'markers': [], 'clusters': []}
+
+    if z >= getattr(settings, 'MOSQUE_TILE_CLUSTER_ZOOM', 13):
+        tile['markers'] = _markers(queryset, z, x, y)
+        return tile
+
+    west, south, east, north = tile_bounds(z, x, y)
+    latitude, longitude = Cast('latitude', FloatField()), Cast('longitude', FloatField())
+    cells = queryset.annotate(
+        cell_x=Floor((longitude - west) / ((east - west) / CLUSTER_GRID)),
+        cell_y=Floor((latitude - south) / ((north - south) / CLUSTER_GRID)),
+    ).values('cell_x', 'cell_y').annotate(
+        count=Count('id'), mean_latitude=Avg(latitude), mean_longitude=Avg(longitude), first=Min('id'),
+    ).order_by()
+
+    singles = []
+    for cell in cells:
+        if cell['count'] == 1:
+            singles.append(cell['first'])
+        else:
+            tile['clusters'].append([
+                *_pixel(cell['mean_latitude'], cell['mean_longitude'], z, x, y), cell['count'],
+            ])
+    if singles:
+        tile['markers'] = _markers(queryset.filter(id__in=singles), z, x, y)
+    return tile
+
+
+def tile_cache_key(z, x, y):
+    return f'{CACHE_PREFIX}:{z}:{x}:{y}'
+
+
+def get_tile(z, x, y):
+    """(etag, body) of a rendered tile, from the cache when possible."""
+    key = tile_cache_key(z, x, y)
+    cached = cache.get(key)
+    if cached is None:
+        body = json.dumps(build_tile(z, x, y), separators=(',', ':')).encode()
+        cached = (f'"{hashlib.md5(body).hexdigest()}"', body)
+        cache.set(key, cached, getattr(settings, 'MOSQUE_TILE_CACHE_SECONDS', 3600))
+    return cached
+
+
+def invalidate_point(latitude, longitude):
+    """Drop every cached tile containing this position."""
+    if latitude is None or longitude is None:
+        return
+    keys = [
+        tile_cache_key(z, *tile_for(float(latitude), float(longitude), z))
+        for z in range(max_zoom() + 1)
+    ]
+    cache.delete_many(keys)
@@ -2,12 +2,17 @@ from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, AllowAny
+from django.db import transaction
 from django.db.models import Q
+from django.http import HttpResponse
 from django.utils import timezone
 from django.conf import settings
 from datetime import datetime, timedelta
 import logging
+from api.fieldsets import SparseFieldsetMixin
 from .models import Mosque, MosqueImage, FavoriteMosque, MosqueAnnouncement
+from .search import MosqueSearchFilter
+from .tiles import get_tile, max_zoom
 from Authentication.permissions import is_imam_user
 from .serializers import (
     MosqueSerializer,
@@ -22,6 +27,10 @@ from .serializers import (
 )
 
 
+# Mosque.image_status -> what the registration email shows instead of an image URL
+REGISTRATION_IMAGE_STATUS = {'pending': 'pending', 'failed': 'rejected'}
+
+
 def build_image_url(request, image_url_path):
     """
     Build absolute URL for images using API_BASE_URL if available.
@@ -46,13 +55,14 @@ def build_image_url(request, image_url_path):
 logger = logging.getLogger(__name__)
 
 
-class MosqueViewSet(viewsets.ModelViewSet):
+class MosqueViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing mosques.
     """
     queryset = Mosque.objects.all()
     serializer_class = MosqueSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    # Searching runs after ordering so it can sort by rank when no ?ordering= is given
+    filter_backends = [filters.OrderingFilter, MosqueSearchFilter]
     search_fields = ['name', 'address', 'city__name', 'city__country__name']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
@@ -156,6 +166,9 @@ class MosqueViewSet(viewsets.ModelViewSet):
         has_jumuah = self.request.query_params.get('has_jumuah')
         if has_jumuah is not None:
             queryset = queryset.filter(has_jumuah=has_jumuah.lower() == 'true')
+
+        if self.action == 'list':
+            queryset = queryset.select_related('city__country').prefetch_related('images')
         
         return queryset
     
@@ -213,6 +226,23 @@ class MosqueViewSet(viewsets.ModelViewSet):
             result.append(data)
         
         return Response(result)
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny],
+            url_path=r'tiles/(?P<z>[0-9]+)/(?P<x>[0-9]+)/(?P<y>[0-9]+)')
+    def tile(self, request, z, x, y):
+        """Compact markers for every verified mosque in a z/x/y map tile (see find_mosque.tiles)."""
+        z, x, y = int(z), int(x), int(y)
+        if z > max_zoom() or x >= 2 ** z or y >= 2 ** z:
+            return Response({'detail': 'Tile out of range.'}, status=status.HTTP_404_NOT_FOUND)
+
+        etag, body = get_tile(z, x, y)
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = f"public, max-age={getattr(settings, 'MOSQUE_TILE_MAX_AGE', 300)}"
+        return response
     
     @action(detail=True, methods=['get'])
     def prayer_times(self, request, pk=None):
@@ -406,8 +436,13 @@ class MosqueViewSet(viewsets.ModelViewSet):
         serializer = RegisterMosqueSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         mosque = serializer.save()
+        # A remote image may already have been fetched (or refused) inline.
+        mosque.refresh_from_db(fields=['image_status'])
         primary_image = mosque.images.filter(is_primary=True).first() or mosque.images.first()
         image_url = build_image_url(request, primary_image.image.url) if primary_image else None
+        # The submitted URL itself is never passed on: only our stored copy, or
+        # the fetch status while there is none.
+        email_image = image_url or REGISTRATION_IMAGE_STATUS.get(mosque.image_status, '')
 
         # Send email notification to super admin — run in background via Celery
         # so the HTTP response returns immediately without waiting for SMTP.
@@ -417,7 +452,7 @@ class MosqueViewSet(viewsets.ModelViewSet):
             admin_panel_url = f"{api_base_url}/admin/" if api_base_url else request.build_absolute_uri('/admin/')
             send_mosque_registration_email.delay(
                 mosque_id=mosque.id,
-                image_url=image_url or '',
+                image_url=email_image,
                 admin_panel_url=admin_panel_url,
             )
         except Exception as e:
@@ -433,6 +468,7 @@ class MosqueViewSet(viewsets.ModelViewSet):
             'is_verified': mosque.is_verified,
             'is_active': mosque.is_active,
             'prayer_timetable_image_url': image_url,
+            'image_status': mosque.image_status,
             'registration_whatsapp': registration_whatsapp,
         }, status=status.HTTP_201_CREATED)
 
@@ -533,6 +569,14 @@ class MosqueViewSet(viewsets.ModelViewSet):
             for row in mosque.monthly_prayer_times.filter(year=year, month=month)
         }
 
+        with transaction.atomic():
+            updated_rows = self._upsert_monthly_entries(mosque, year, month, entries, existing)
+
+        response_serializer = MosqueMonthlyPrayerTimeSerializer(updated_rows, many=True)
+        return Response(response_serializer.data, status=status.HTTP_200_OK)
+
+    def _upsert_monthly_entries(self, mosque, year, month, entries, existing):
+        """Create or update one month of timetable rows in a single transaction."""
         updated_rows = []
         for entry in entries:
             day = entry['day']
@@ -574,9 +618,8 @@ class MosqueViewSet(viewsets.ModelViewSet):
                     jumuah_iqamah=jumuah_iqamah,
                 )
             updated_rows.append(row)
+        return updated_rows
 
-        response_serializer = MosqueMonthlyPrayerTimeSerializer(updated_rows, many=True)
-        return Response(response_serializer.data, status=status.HTTP_200_OK)
     @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
     def favorite(self, request, pk=None):
         """Add or remove a mosque from user's favorites."""
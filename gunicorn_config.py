@@ -6,6 +6,23 @@ Production-ready settings optimized for performance and security.
 import multiprocessing
 import os
 
+# ===================================================================
+# Deployment Profile
+# ===================================================================
+
+# "sync": WSGI app on sync workers (one request per worker at a time).
+# "asgi": ASGI app on gunicorn's native asyncio worker. Async views (health)
+# then never hold a worker while waiting on I/O, and sync
+# DRF views run in per-request threads. Set
+# GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker to use uvicorn instead
+# (requires the uvicorn package).
+profile = os.environ.get("GUNICORN_PROFILE", "sync")
+if profile not in ("sync", "asgi"):
+    raise ValueError(f"GUNICORN_PROFILE must be 'sync' or 'asgi', not {profile!r}")
+
+# Application to load when none is given on the command line
+wsgi_app = "config.asgi:application" if profile == "asgi" else "config.wsgi:application"
+
 # ===================================================================
 # Server Socket Configuration
 # ===================================================================
@@ -21,19 +38,22 @@ backlog = 2048
 # ===================================================================
 
 # Number of worker processes
-# Formula: CPU cores * 2 + 1 (for I/O bound applications)
-workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# Sync: CPU cores * 2 + 1 (for I/O bound applications)
+# ASGI: one event loop per core is enough; concurrency comes from the loop
+_default_workers = multiprocessing.cpu_count() + 1 if profile == "asgi" else multiprocessing.cpu_count() * 2 + 1
+workers = int(os.environ.get("GUNICORN_WORKERS", _default_workers))
 
 # Worker class
-# Options: sync, gevent, eventlet, tornado
-worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+# Options: sync, gthread, gevent, asgi, uvicorn.workers.UvicornWorker
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "asgi" if profile == "asgi" else "sync")
 
 # Number of concurrent connections per worker (for async workers)
 worker_connections = 1000
 
 # Maximum requests a worker will process before restarting
-# Helps prevent memory leaks
-max_requests = 1000
+# Helps prevent memory leaks. Off for ASGI: an async worker holds many
+# keep-alive connections, and a restart stalls them for graceful_timeout.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0 if profile == "asgi" else 1000))
 
 # Add random jitter to prevent all workers restarting at once
 max_requests_jitter = 50
@@ -48,8 +68,10 @@ timeout = 60
 # Graceful timeout for worker shutdown
 graceful_timeout = 30
 
-# Keep-alive connections
-keepalive = 2
+# Keep-alive connections (ignored by sync workers). Longer than nginx's
+# upstream keepalive_timeout (60s), so nginx never reuses a connection
+# gunicorn has just closed.
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 75 if profile == "asgi" else 2))
 
 # ===================================================================
 # Logging
@@ -116,7 +138,7 @@ def on_reload(server):
 
 def when_ready(server):
     """Called just after the server is started."""
-    print(f"Gunicorn server started with {workers} workers")
+    print(f"Gunicorn server started with {workers} {worker_class} workers ({profile} profile)")
 
 def pre_fork(server, worker):
     """Called just before a worker is forked."""
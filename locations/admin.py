@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import Country, City
 from unfold.admin import ModelAdmin
+from Authentication.permissions import is_imam_user
 
 @admin.register(Country)
 class CountryAdmin(ModelAdmin):
@@ -14,7 +15,7 @@ class CountryAdmin(ModelAdmin):
         """Hide from Imam users."""
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
 
 @admin.register(City)
@@ -30,7 +31,7 @@ class CityAdmin(ModelAdmin):
         """Hide from Imam users."""
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
     def has_view_permission(self, request, obj=None):
         return request.user.is_superuser
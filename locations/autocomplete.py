@@ -0,0 +1,154 @@
+"""
+In-memory typeahead index for CityViewSet.search.
+
+Every active city is indexed under each word of its normalized name (see
+find_mosque.search.normalize, so Bangla and accented names match their
+Latin spelling) in one sorted array. A query is a bisect to the first
+key with the query as prefix, then a scan of the matching range, ranked
+by exact match, match on the first word and popularity (mosques,
+subscriptions and users in the city, plus a boost for capitals). Words
+are also indexed by consonant skeleton, which catches vowel spelling
+variants once the query has three consonants.
+
+The index is built lazily on first use. City and Country saves in this
+process mark it stale; other workers pick changes up within
+CITY_INDEX_REFRESH_SECONDS.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+CAPITAL_BOOST = 1000
+
+
+def _normalize(text):
+    from find_mosque.search import normalize
+
+    return normalize(text)
+
+
+def skeleton(word):
+    from find_mosque.search import skeleton
+
+    return skeleton(word)
+
+
+def _popularity():
+    """city_id -> number of mosques, subscriptions and users in that city."""
+    from find_mosque.models import Mosque
+    from push_notification.models import WhatsAppNotification
+    from subscribe.models import Subscription
+    from users.models import UserProfile
+
+    scores = {}
+    for model, field in (
+        (Mosque, 'city_id'),
+        (Subscription, 'city_id'),
+        (WhatsAppNotification, 'city_id'),
+        (UserProfile, 'current_city_id'),
+    ):
+        rows = model.objects.filter(**{f'{field}__isnull': False}).values(field).annotate(n=Count('pk'))
+        for row in rows.order_by():
+            scores[row[field]] = scores.get(row[field], 0) + row['n']
+    return scores
+
+
+class CityIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (sorted keys, (city_id, word position) per key,
+        #  city_id -> (payload, normalized name, popularity)), swapped as one
+        self._index = ([], [], {})
+        self._built_at = 0.0
+        self._stale = True
+
+    def invalidate(self):
+        self._stale = True
+
+    def _expired(self):
+        ttl = getattr(settings, 'CITY_INDEX_REFRESH_SECONDS', 300)
+        return self._stale or time.monotonic() - self._built_at > ttl
+
+    def _ensure(self):
+        if not self._expired():
+            return
+        with self._lock:
+            if self._expired():
+                self._build()
+
+    def _build(self):
+        from locations.models import City
+
+        self._stale = False  # changes made while building mark it stale again
+        popularity = _popularity()
+        cities = {}
+        pairs = []
+        rows = City.objects.filter(is_active=True).values(
+            'id', 'name', 'timezone', 'is_capital', 'country__name'
+        ).order_by()
+        for row in rows:
+            normalized = _normalize(row['name'])
+            score = popularity.get(row['id'], 0) + (CAPITAL_BOOST if row['is_capital'] else 0)
+            payload = {
+                'id': row['id'],
+                'name': row['name'],
+                'country_name': row['country__name'],
+                'timezone': row['timezone'],
+                'is_capital': row['is_capital'],
+            }
+            cities[row['id']] = (payload, normalized, score)
+            words = normalized.split()
+            for position, word in enumerate(words):
+                # Index from each word to the end of the name, so multi-word
+                # queries like "cox s baz" still work as prefixes, and by
+                # consonant skeleton, so vowel spellings don't matter.
+                pairs.append((' '.join(words[position:]), row['id'], position))
+                pairs.append((f'~{skeleton(word)}', row['id'], position))
+        pairs.sort()
+        self._index = (
+            [key for key, _, _ in pairs],
+            [(city_id, position) for _, city_id, position in pairs],
+            cities,
+        )
+        self._built_at = time.monotonic()
+
+    def search(self, query, limit=10):
+        """Payloads of the best `limit` active cities matching `query`."""
+        self._ensure()
+        prefix = _normalize(query)
+        if not prefix:
+            return []
+        keys, entries, cities = self._index
+        best = {}
+        lookups = [(prefix, True)]
+        if ' ' not in prefix and len(skeleton(prefix)) >= 3:
+            lookups.append((f'~{skeleton(prefix)}', False))
+        for key_prefix, literal in lookups:
+            index = bisect_left(keys, key_prefix)
+            while index < len(keys) and keys[index].startswith(key_prefix):
+                city_id, position = entries[index]
+                payload, normalized, score = cities[city_id]
+                rank = (literal, normalized == prefix, position == 0, score, -len(normalized))
+                if rank > best.get(city_id, (False, False, False, -1, 0)):
+                    best[city_id] = rank
+                index += 1
+        top = heapq.nlargest(limit, best.items(), key=lambda item: (item[1], -item[0]))
+        return [cities[city_id][0] for city_id, _ in top]
+
+
+city_index = CityIndex()
+
+
+@receiver(post_save, sender='locations.City')
+@receiver(post_delete, sender='locations.City')
+@receiver(post_save, sender='locations.Country')
+@receiver(post_delete, sender='locations.Country')
+def invalidate_city_index(sender, **kwargs):
+    city_index.invalidate()
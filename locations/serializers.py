@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from api.fieldsets import SparseFieldsetSerializerMixin
 from .models import Country, City
 
 
@@ -14,7 +15,7 @@ class CountrySerializer(serializers.ModelSerializer):
         return obj.cities.count()
 
 
-class CitySerializer(serializers.ModelSerializer):
+class CitySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     country_name = serializers.CharField(source='country.name', read_only=True)
     country_code = serializers.CharField(source='country.code', read_only=True)
     
@@ -28,7 +29,7 @@ class CitySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class CityListSerializer(serializers.ModelSerializer):
+class CityListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Simplified serializer for list views."""
     country_name = serializers.CharField(source='country.name', read_only=True)
     
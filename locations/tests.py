@@ -1,3 +1,73 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .autocomplete import city_index
+from .models import City, Country
+from .serializers import CityListSerializer
+
+
+class CityIndexTests(TestCase):
+
+    def setUp(self):
+        city_index.invalidate()
+        self.addCleanup(city_index.invalidate)
+        self.bangladesh = Country.objects.create(name='Bangladesh', code='BGD')
+        self.dhaka = self._city('Dhaka', is_capital=True)
+        self.dhanmondi = self._city('Dhanmondi')
+        self.coxs_bazar = self._city("Cox's Bazar")
+        self.chattogram = self._city('Chattogram')
+
+    def _city(self, name, country=None, **fields):
+        return City.objects.create(
+            name=name, country=country or self.bangladesh, latitude=0, longitude=0, timezone='Asia/Dhaka', **fields
+        )
+
+    def _names(self, query):
+        return [city['name'] for city in city_index.search(query)]
+
+    def test_prefix_matches_rank_capitals_first(self):
+        self.assertEqual(self._names('dha'), ['Dhaka', 'Dhanmondi'])
+        self.assertEqual(self._names('dhan'), ['Dhanmondi'])
+        self.assertEqual(self._names('bazar'), ["Cox's Bazar"])
+        self.assertEqual(self._names('cox s baz'), ["Cox's Bazar"])
+        self.assertEqual(self._names('x'), [])
+
+    def test_case_diacritics_and_bangla_fold_to_the_same_keys(self):
+        brazil = Country.objects.create(name='Brazil', code='BRA')
+        self._city('São Paulo', country=brazil)
+
+        self.assertEqual(self._names('DHAKA'), ['Dhaka'])
+        self.assertEqual(self._names('ঢাকা'), ['Dhaka'])
+        self.assertEqual(self._names('sao pau'), ['São Paulo'])
+        self.assertEqual(self._names('Chottogram'), ['Chattogram'])
+
+    def test_index_follows_created_renamed_and_deactivated_cities(self):
+        self.assertEqual(self._names('sylhet'), [])
+
+        sylhet = self._city('Sylhet')
+        self.assertEqual(self._names('sylhet'), ['Sylhet'])
+
+        sylhet.name = 'Srimangal'
+        sylhet.save()
+        self.assertEqual(self._names('sylhet'), [])
+        self.assertEqual(self._names('srim'), ['Srimangal'])
+
+        sylhet.is_active = False
+        sylhet.save()
+        self.assertEqual(self._names('srim'), [])
+
+    def test_payload_matches_the_list_serializer(self):
+        [payload] = city_index.search('dhaka')
+        self.assertEqual(payload, CityListSerializer(self.dhaka).data)
+        self.assertEqual(set(payload), set(CityListSerializer.Meta.fields))
+
+    def test_search_endpoint_serves_the_index(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('reader', 'reader@example.com', 'pass12345'))
+
+        response = client.get('/api/locations/cities/search/', {'q': 'dha'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([city['id'] for city in response.data], [self.dhaka.id, self.dhanmondi.id])
+
+        self.assertEqual(client.get('/api/locations/cities/search/', {'q': 'd'}).status_code, 400)
@@ -1,7 +1,9 @@
 from rest_framework import viewsets, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from api.fieldsets import SparseFieldsetMixin
 from .models import Country, City
+from .autocomplete import city_index
 from .serializers import CountrySerializer, CitySerializer, CityListSerializer
 
 
@@ -24,7 +26,7 @@ class CountryViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class CityViewSet(viewsets.ModelViewSet):
+class CityViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing cities.
     """
@@ -62,9 +64,8 @@ class CityViewSet(viewsets.ModelViewSet):
         if len(query) < 2:
             return Response({'detail': 'Query must be at least 2 characters.'}, status=400)
         
-        cities = City.objects.filter(name__icontains=query, is_active=True)[:10]
-        serializer = CityListSerializer(cities, many=True)
-        return Response(serializer.data)
+        # Served from the in-memory index; same fields as CityListSerializer
+        return Response(city_index.search(query, limit=10))
     
     @action(detail=False, methods=['get'])
     def by_coordinates(self, request):
@@ -3,6 +3,7 @@ from django.contrib import messages
 from django.utils.html import format_html
 from .models import NewsletterSubscription, NewsletterCampaign, NewsletterLog
 from unfold.admin import ModelAdmin
+from Authentication.permissions import is_imam_user
 
 
 @admin.register(NewsletterSubscription)
@@ -32,7 +33,7 @@ class NewsletterSubscriptionAdmin(ModelAdmin):
     def has_module_permission(self, request):
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
     actions = ['mark_as_active', 'mark_as_inactive', 'mark_as_verified']
 
@@ -163,7 +164,9 @@ class NewsletterLogAdmin(ModelAdmin):
     list_filter = ['status', 'sent_at', 'created_at']
     search_fields = ['subscription__email', 'subject', 'message']
     readonly_fields = ['id', 'subscription', 'subject', 'message', 'created_at', 'sent_at', 'error_message']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
+    # Skip the unfiltered COUNT(*) over the whole log table
+    show_full_result_count = False
 
     def has_add_permission(self, request):
         return False
@@ -171,6 +174,6 @@ class NewsletterLogAdmin(ModelAdmin):
     def has_module_permission(self, request):
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
 
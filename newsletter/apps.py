@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class NewsletterConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'newsletter'
+
+    def ready(self):
+        # Task latency/queue-wait hooks cover newsletter.* tasks as well
+        from push_notification import task_metrics  # noqa: F401
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-19 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletter', '0002_add_newsletter_campaign'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newsletterlog',
+            index=models.Index(fields=['-created_at', '-id'], name='newsletter__created_319abd_idx'),
+        ),
+    ]
@@ -113,6 +113,9 @@ class NewsletterLog(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Newsletter Log'
         verbose_name_plural = 'Newsletter Logs'
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.subject} - {self.subscription.email}"
@@ -5,6 +5,8 @@ from celery import shared_task
 from django.utils import timezone
 import logging
 
+from push_notification.task_metrics import external_call
+
 logger = logging.getLogger(__name__)
 
 
@@ -100,7 +102,8 @@ def send_newsletter_email(self, subscription_id, campaign_id):
                 to=[subscription.email],
             )
             msg.attach_alternative(html_content, "text/html")
-            msg.send(fail_silently=False)
+            with external_call('smtp'):
+                msg.send(fail_silently=False)
 
             log.status = 'sent'
             log.sent_at = timezone.now()
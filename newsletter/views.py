@@ -3,6 +3,7 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.utils import timezone
+from api.pagination import KeysetPagination
 from .models import NewsletterSubscription, NewsletterLog
 from .serializers import NewsletterSubscriptionSerializer, NewsletterSubscribeSerializer, NewsletterLogSerializer
 import logging
@@ -109,4 +110,7 @@ class NewsletterLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     queryset = NewsletterLog.objects.all()
     serializer_class = NewsletterLogSerializer
+    pagination_class = KeysetPagination
+    # sent_at is null until the mail goes out
+    keyset_fields = ('created_at', 'id')
 
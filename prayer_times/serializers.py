@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from api.fieldsets import SparseFieldsetSerializerMixin
+from locations.serializers import CityListSerializer
 from .models import PrayerTime, MonthlyPrayerTime, PrayerTimeAdjustment
 
 
@@ -9,7 +11,7 @@ class PrayerTimeSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class MonthlyPrayerTimeSerializer(serializers.ModelSerializer):
+class MonthlyPrayerTimeSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     city_name = serializers.CharField(source='city.name', read_only=True)
     country_name = serializers.CharField(source='city.country.name', read_only=True)
     
@@ -22,6 +24,9 @@ class MonthlyPrayerTimeSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+    def get_expandable_fields(self):
+        return {'city': CityListSerializer(read_only=True)}
+
 
 class PrayerTimeAdjustmentSerializer(serializers.ModelSerializer):
     city_name = serializers.CharField(source='city.name', read_only=True)
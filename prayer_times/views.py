@@ -2,6 +2,7 @@ from rest_framework import viewsets, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
+from api.fieldsets import SparseFieldsetMixin
 from .models import PrayerTime, MonthlyPrayerTime, PrayerTimeAdjustment
 from .serializers import PrayerTimeSerializer, MonthlyPrayerTimeSerializer, PrayerTimeAdjustmentSerializer
 
@@ -44,7 +45,7 @@ class PrayerTimeViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'Invalid date format. Use YYYY-MM-DD.'}, status=400)
 
 
-class MonthlyPrayerTimeViewSet(viewsets.ModelViewSet):
+class MonthlyPrayerTimeViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing monthly prayer times.
     """
@@ -54,6 +55,7 @@ class MonthlyPrayerTimeViewSet(viewsets.ModelViewSet):
     search_fields = ['city__name']
     ordering_fields = ['year', 'month', 'day']
     ordering = ['year', 'month', 'day']
+    sparse_actions = ('list', 'retrieve', 'current_month')
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -78,11 +80,11 @@ class MonthlyPrayerTimeViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'City parameter is required.'}, status=400)
         
         today = timezone.now().date()
-        prayer_times = MonthlyPrayerTime.objects.filter(
+        prayer_times = self.project_queryset(MonthlyPrayerTime.objects.filter(
             city_id=city_id,
             year=today.year,
             month=today.month
-        )
+        ))
         serializer = self.get_serializer(prayer_times, many=True)
         return Response(serializer.data)
 
@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import WhatsAppNotification, WhatsAppNotificationLog
+from .models import WhatsAppNotification, WhatsAppNotificationLog, PlannedReminder, SpooledTask
 from unfold.admin import ModelAdmin
+from Authentication.permissions import is_imam_user
 
 @admin.register(WhatsAppNotification)
 class WhatsAppNotificationAdmin(ModelAdmin):
@@ -36,7 +37,7 @@ class WhatsAppNotificationAdmin(ModelAdmin):
         """Hide from Imam users."""
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
 
 @admin.register(WhatsAppNotificationLog)
@@ -45,6 +46,9 @@ class WhatsAppNotificationLogAdmin(ModelAdmin):
     list_filter = ['status', 'prayer_name', 'sent_at']
     search_fields = ['whatsapp__phone_number', 'twilio_sid', 'error_message']
     readonly_fields = ['whatsapp', 'message', 'prayer_name', 'status', 'twilio_sid', 'error_message', 'sent_at', 'delivered_at']
+    ordering = ['-sent_at', '-id']
+    # Skip the unfiltered COUNT(*) over the whole log table
+    show_full_result_count = False
     
     def has_add_permission(self, request):
         return False
@@ -56,5 +60,45 @@ class WhatsAppNotificationLogAdmin(ModelAdmin):
         """Hide from Imam users."""
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
+
+
+@admin.register(PlannedReminder)
+class PlannedReminderAdmin(ModelAdmin):
+    list_display = ['channel', 'prayer_name', 'prayer_time', 'minutes_before', 'fire_at', 'status', 'whatsapp', 'subscription', 'mosque']
+    list_filter = ['channel', 'status', 'prayer_name']
+    search_fields = ['whatsapp__phone_number', 'subscription__email', 'mosque__name', 'task_id']
+    readonly_fields = ['channel', 'whatsapp', 'subscription', 'mosque', 'prayer_name', 'prayer_time', 'minutes_before', 'fire_at', 'task_id', 'status', 'created_at', 'updated_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_module_permission(self, request):
+        """Hide from Imam users."""
+        if request.user.is_superuser:
+            return True
+        return not is_imam_user(request.user)
+
+
+@admin.register(SpooledTask)
+class SpooledTaskAdmin(ModelAdmin):
+    list_display = ['task_name', 'queue', 'status', 'attempts', 'created_at', 'published_at']
+    list_filter = ['status', 'queue', 'task_name']
+    search_fields = ['task_name', 'last_error']
+    readonly_fields = ['task_name', 'args', 'kwargs', 'queue', 'status', 'attempts', 'last_error', 'created_at', 'published_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_module_permission(self, request):
+        """Hide from Imam users."""
+        if request.user.is_superuser:
+            return True
+        return not is_imam_user(request.user)
@@ -5,6 +5,7 @@ class PushNotificationConfig(AppConfig):
     name = 'push_notification'
 
     def ready(self):
+        from . import signals, task_metrics  # noqa: F401
         from django.contrib import admin
         from django_celery_beat.models import (
             ClockedSchedule,
@@ -0,0 +1,201 @@
+"""
+Shared helpers for publishing Celery tasks.
+
+- enqueue_task(): publish one task without blocking on broker retries.
+- enqueue_batch(): collect every enqueue_task() call made inside the block
+  and publish them over a single producer connection on exit.
+- broker_breaker: a circuit breaker in front of the broker. After
+  TASK_ENQUEUE_BREAKER_FAILURES consecutive failures it opens and publishes
+  fail fast for TASK_ENQUEUE_BREAKER_SECONDS. After that a single probe is
+  let through (half-open): success closes it, failure opens it again.
+
+Tasks that cannot be published are spooled to SpooledTask and replayed by
+push_notification.tasks.drain_task_spool (or run inline when
+TASK_SPOOL_ENABLED is off).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Per-process closed / open / half-open circuit breaker."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    @property
+    def failure_threshold(self):
+        return self._failure_threshold or getattr(settings, 'TASK_ENQUEUE_BREAKER_FAILURES', 3)
+
+    @property
+    def reset_timeout(self):
+        return self._reset_timeout or getattr(settings, 'TASK_ENQUEUE_BREAKER_SECONDS', 30)
+
+    def allow(self):
+        """Whether a publish may be attempted right now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Celery broker reachable again, closing enqueue circuit")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(
+                        "Celery broker failing (%d errors), opening enqueue circuit for %ss",
+                        self.failures, self.reset_timeout,
+                    )
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+broker_breaker = CircuitBreaker()
+
+_batch = threading.local()
+
+
+def _task_queue(task_name):
+    """The queue CELERY_TASK_ROUTES sends `task_name` to, glob keys included."""
+    from celery.app.routes import MapRoute
+
+    route = MapRoute(getattr(settings, 'CELERY_TASK_ROUTES', {}))(task_name) or {}
+    return route.get('queue', '')
+
+
+def _spool(calls, error):
+    """Persist tasks the broker rejected, or run them inline if the spool is off."""
+    if not getattr(settings, 'TASK_SPOOL_ENABLED', True):
+        for task, args, kwargs in calls:
+            task.apply(args=args, kwargs=kwargs)
+        return 'inline'
+
+    from push_notification.models import SpooledTask
+
+    SpooledTask.objects.bulk_create([
+        SpooledTask(
+            task_name=task.name,
+            args=list(args),
+            kwargs=kwargs,
+            queue=_task_queue(task.name),
+            last_error=str(error)[:1000],
+        )
+        for task, args, kwargs in calls
+    ])
+    return 'spooled'
+
+
+def publish_many(calls):
+    """
+    Publish (task, args, kwargs) calls over one pooled producer connection.
+    Whatever could not be published is spooled. Returns the number published.
+    """
+    if not calls:
+        return 0
+    if not broker_breaker.allow():
+        _spool(calls, 'broker circuit open')
+        return 0
+
+    from config.celery import app
+
+    published = 0
+    try:
+        with app.producer_pool.acquire(block=True) as producer:
+            for task, args, kwargs in calls:
+                task.apply_async(args=args, kwargs=kwargs, producer=producer, retry=False)
+                published += 1
+    except Exception as exc:
+        broker_breaker.record_failure()
+        remaining = calls[published:]
+        logger.warning(
+            "Celery broker unavailable, %d of %d tasks not published. %s Error: %s",
+            len(remaining), len(calls),
+            'Spooling.' if getattr(settings, 'TASK_SPOOL_ENABLED', True) else 'Running inline.',
+            exc,
+        )
+        _spool(remaining, exc)
+        return published
+
+    broker_breaker.record_success()
+    return published
+
+
+def enqueue_task(task, *args, **kwargs):
+    """
+    Publish one task. Inside enqueue_batch() the call is only collected.
+    Returns 'queued', 'batched', 'spooled' or 'inline'.
+    """
+    pending = getattr(_batch, 'calls', None)
+    if pending is not None:
+        pending.append((task, args, kwargs))
+        return 'batched'
+
+    if not broker_breaker.allow():
+        return _spool([(task, args, kwargs)], 'broker circuit open')
+
+    try:
+        task.apply_async(args=args, kwargs=kwargs, retry=False)
+    except Exception as exc:
+        broker_breaker.record_failure()
+        logger.warning(
+            "Celery broker unavailable for task %s. %s Error: %s",
+            task.name,
+            'Spooling.' if getattr(settings, 'TASK_SPOOL_ENABLED', True) else 'Running inline.',
+            exc,
+        )
+        return _spool([(task, args, kwargs)], exc)
+
+    broker_breaker.record_success()
+    return 'queued'
+
+
+@contextmanager
+def enqueue_batch():
+    """
+    Collect enqueue_task() calls made in this thread and publish them
+    together when the block exits. Nested blocks join the outer batch.
+    """
+    if getattr(_batch, 'calls', None) is not None:
+        yield
+        return
+
+    _batch.calls = []
+    try:
+        yield
+    finally:
+        calls, _batch.calls = _batch.calls, None
+        publish_many(calls)
@@ -0,0 +1,277 @@
+"""
+Management command to benchmark the per-minute notification dispatchers.
+
+Seeds synthetic cities, mosques, timetables and subscribers, then runs both
+dispatchers for every minute of a simulated day with the senders stubbed
+out, reporting wall time, query count and messages queued per minute.
+All seeded rows are rolled back afterwards unless --keep is given.
+
+Usage:
+    python manage.py benchmark_dispatch
+    python manage.py benchmark_dispatch --cities 50 --whatsapp 20000 --subscriptions 5000
+    python manage.py benchmark_dispatch --minutes 120 --start 04:00 --csv /tmp/dispatch.csv
+"""
+import csv
+import random
+import time
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+BENCHMARK_TIMEZONES = [
+    'Asia/Dhaka',
+    'Asia/Karachi',
+    'Asia/Riyadh',
+    'Africa/Cairo',
+    'Europe/London',
+    'America/New_York',
+]
+PRAYER_NAMES = ['fajr', 'dhuhr', 'asr', 'maghrib', 'isha']
+BASE_TIMES = {
+    'fajr': dt_time(5, 0),
+    'sunrise': dt_time(6, 15),
+    'dhuhr': dt_time(12, 10),
+    'asr': dt_time(15, 30),
+    'maghrib': dt_time(18, 0),
+    'isha': dt_time(19, 20),
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _shift(value, minutes):
+    return (datetime.combine(date.min, value) + timedelta(minutes=minutes)).time()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the notification dispatchers over a simulated day (dry run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cities', type=int, default=10, help='Synthetic cities to seed')
+        parser.add_argument('--mosques-per-city', type=int, default=5, help='Synthetic mosques per city')
+        parser.add_argument('--whatsapp', type=int, default=2000, help='Synthetic WhatsApp subscribers')
+        parser.add_argument('--subscriptions', type=int, default=1000, help='Synthetic mosque subscriptions')
+        parser.add_argument(
+            '--date',
+            default=None,
+            help='UTC day to simulate (YYYY-MM-DD, default today)'
+        )
+        parser.add_argument('--start', default='00:00', help='UTC time the simulation starts (HH:MM)')
+        parser.add_argument('--minutes', type=int, default=24 * 60, help='Number of minutes to simulate')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the synthetic data')
+        parser.add_argument('--csv', default=None, help='Write per-minute results to this CSV file')
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the seeded rows instead of rolling them back'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            day = date.fromisoformat(options['date']) if options['date'] else datetime.now(dt_timezone.utc).date()
+            start = dt_time.fromisoformat(options['start'])
+        except ValueError as exc:
+            raise CommandError(f'Invalid --date/--start: {exc}')
+
+        start_at = datetime.combine(day, start, tzinfo=dt_timezone.utc)
+        rng = random.Random(options['seed'])
+
+        try:
+            with transaction.atomic():
+                seeded = self._seed(rng, day, options)
+                self.stdout.write(
+                    f"Seeded {seeded['cities']} cities, {seeded['mosques']} mosques, "
+                    f"{seeded['whatsapp']} WhatsApp subscribers, {seeded['subscriptions']} subscriptions"
+                )
+                rows = self._simulate(start_at, options['minutes'], options['verbosity'])
+                if not options['keep']:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write('Seeded rows rolled back.')
+
+        self._report(rows)
+        if options['csv']:
+            self._write_csv(options['csv'], rows)
+
+    # ------------------------------------------------------------------
+    # Seeding
+    # ------------------------------------------------------------------
+
+    def _seed(self, rng, day, options):
+        from find_mosque.models import Mosque, MosqueMonthlyPrayerTime
+        from locations.models import City, Country
+        from prayer_times.models import MonthlyPrayerTime
+        from push_notification.models import WhatsAppNotification
+        from subscribe.models import Subscription
+
+        country, _ = Country.objects.get_or_create(
+            code='BMK', defaults={'name': 'Benchmark Country'}
+        )
+        cities = City.objects.bulk_create([
+            City(
+                name=f'Benchmark City {i}',
+                country=country,
+                latitude=0,
+                longitude=0,
+                timezone=BENCHMARK_TIMEZONES[i % len(BENCHMARK_TIMEZONES)],
+            )
+            for i in range(options['cities'])
+        ])
+        if not cities:
+            raise CommandError('--cities must be at least 1')
+
+        # The simulated UTC day spans up to three local dates across zones.
+        days = [day + timedelta(days=offset) for offset in (-1, 0, 1)]
+
+        city_times = []
+        for city in cities:
+            offset = rng.randint(-30, 30)
+            for d in days:
+                city_times.append(MonthlyPrayerTime(
+                    city=city, year=d.year, month=d.month, day=d.day,
+                    **{name: _shift(value, offset) for name, value in BASE_TIMES.items()},
+                ))
+        MonthlyPrayerTime.objects.bulk_create(city_times)
+
+        mosques = Mosque.objects.bulk_create([
+            Mosque(name=f'Benchmark Mosque {city.id}-{i}', city=city, address='Benchmark')
+            for city in cities
+            for i in range(options['mosques_per_city'])
+        ])
+
+        mosque_times = []
+        for mosque in mosques:
+            offset = rng.randint(-30, 30)
+            for d in days:
+                times = {name: _shift(value, offset) for name, value in BASE_TIMES.items()}
+                mosque_times.append(MosqueMonthlyPrayerTime(
+                    mosque=mosque, year=d.year, month=d.month, day=d.day,
+                    sunrise=times['sunrise'],
+                    **{
+                        f'{name}_{kind}': _shift(times[name], 15 if kind == 'iqamah' else 0)
+                        for name in PRAYER_NAMES
+                        for kind in ('adhan', 'iqamah')
+                    },
+                ))
+        MosqueMonthlyPrayerTime.objects.bulk_create(mosque_times)
+
+        whatsapp = WhatsAppNotification.objects.bulk_create([
+            WhatsAppNotification(
+                phone_number=f'9{i:09d}',
+                country_code='+000',
+                full_phone=f'+0009{i:09d}',
+                city=rng.choice(cities),
+                notification_types=rng.sample(PRAYER_NAMES, rng.randint(1, len(PRAYER_NAMES))),
+                notification_minutes_before=rng.choice([10, 20, 30]),
+            )
+            for i in range(options['whatsapp'])
+        ], batch_size=1000)
+
+        subscriptions = Subscription.objects.bulk_create([
+            Subscription(
+                email=f'benchmark-{i}@example.invalid',
+                phone=f'+0009{i:09d}',
+                notification_method=rng.choice(['whatsapp', 'email']),
+                selected_prayers=rng.sample(PRAYER_NAMES, rng.randint(1, len(PRAYER_NAMES))),
+                notification_minutes_before=rng.choice([10, 20, 30]),
+            )
+            for i in range(options['subscriptions'])
+        ], batch_size=1000)
+
+        if mosques:
+            through = Subscription.selected_mosques.through
+            through.objects.bulk_create([
+                through(subscription_id=subscription.id, mosque_id=mosque.id)
+                for subscription in subscriptions
+                for mosque in rng.sample(mosques, min(len(mosques), rng.randint(1, 3)))
+            ], batch_size=1000)
+
+        return {
+            'cities': len(cities),
+            'mosques': len(mosques),
+            'whatsapp': len(whatsapp),
+            'subscriptions': len(subscriptions),
+        }
+
+    # ------------------------------------------------------------------
+    # Simulation
+    # ------------------------------------------------------------------
+
+    def _simulate(self, start_at, minutes, verbosity):
+        from push_notification import tasks
+
+        queued = []
+
+        def fake_enqueue(task, *args, **kwargs):
+            queued.append(task.name)
+
+        rows = []
+        with mock.patch.object(tasks, '_enqueue_task', side_effect=fake_enqueue):
+            for minute in range(minutes):
+                scheduled_at = (start_at + timedelta(minutes=minute)).isoformat()
+                row = {'minute': scheduled_at}
+                for key, dispatcher in (
+                    ('whatsapp', tasks.dispatch_due_prayer_notifications),
+                    ('subscription', tasks.dispatch_subscription_notifications),
+                ):
+                    queued.clear()
+                    connection.queries_log.clear()
+                    with CaptureQueriesContext(connection) as ctx:
+                        began = time.perf_counter()
+                        dispatcher(scheduled_at=scheduled_at)
+                        elapsed = time.perf_counter() - began
+                    row[f'{key}_ms'] = round(elapsed * 1000, 2)
+                    row[f'{key}_queries'] = len(ctx.captured_queries)
+                    row[f'{key}_messages'] = len(queued)
+                rows.append(row)
+
+                if verbosity >= 2:
+                    self.stdout.write(
+                        f"{scheduled_at}  whatsapp {row['whatsapp_ms']:8.2f}ms "
+                        f"{row['whatsapp_queries']:4d}q {row['whatsapp_messages']:5d}msg  "
+                        f"subscription {row['subscription_ms']:8.2f}ms "
+                        f"{row['subscription_queries']:4d}q {row['subscription_messages']:5d}msg"
+                    )
+        return rows
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def _report(self, rows):
+        if not rows:
+            self.stdout.write(self.style.WARNING('Nothing simulated.'))
+            return
+
+        self.stdout.write('\n=== Dispatcher benchmark ===')
+        for key in ('whatsapp', 'subscription'):
+            timings = sorted(row[f'{key}_ms'] for row in rows)
+            queries = [row[f'{key}_queries'] for row in rows]
+            messages = sum(row[f'{key}_messages'] for row in rows)
+            slowest = max(rows, key=lambda row: row[f'{key}_ms'])
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+            self.stdout.write(f'\n[{key}]')
+            self.stdout.write(f'  Minutes       : {len(rows)}')
+            self.stdout.write(f'  Messages      : {messages}')
+            self.stdout.write(
+                f'  Wall time ms  : total {sum(timings):.1f}  mean {sum(timings) / len(timings):.2f}  '
+                f'p95 {p95:.2f}  max {timings[-1]:.2f} ({slowest["minute"]})'
+            )
+            self.stdout.write(
+                f'  Queries/minute: mean {sum(queries) / len(queries):.1f}  max {max(queries)}'
+            )
+
+    def _write_csv(self, path, rows):
+        if not rows:
+            return
+        with open(path, 'w', newline='') as handle:
+            writer = csv.DictWriter(handle, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        self.stdout.write(self.style.SUCCESS(f'Per-minute results written to {path}'))
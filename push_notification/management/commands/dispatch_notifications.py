@@ -4,7 +4,7 @@ Use for testing without Celery.
 
 Usage:
     python manage.py dispatch_notifications            # dispatch now
-    python manage.py dispatch_notifications --status  # show subscription status
+    python manage.py dispatch_notifications --status  # show subscription status and task lag
 """
 from django.core.management.base import BaseCommand
 from django.utils import timezone
@@ -28,6 +28,7 @@ class Command(BaseCommand):
         self._check_whatsapp_config()
         self._check_subscriptions()
         self._check_celery()
+        self._check_task_metrics()
 
         if options['status']:
             return
@@ -119,20 +120,19 @@ class Command(BaseCommand):
 
         # Check which prayers are due within 30 min
         from find_mosque.models import Mosque
-        from datetime import timedelta
+        from push_notification.tasks import _zone_for
         prayer_fields = ['fajr_beginning', 'dhuhr_beginning', 'asr_beginning',
                          'maghrib_sunset', 'isha_beginning']
         prayer_names = ['fajr', 'dhuhr', 'asr', 'maghrib', 'isha']
         due_soon = []
-        for mosque in Mosque.objects.filter(is_active=True)[:10]:
+        for mosque in Mosque.objects.filter(is_active=True).select_related('city')[:10]:
+            zone = _zone_for(mosque.city.timezone)
+            mosque_now = now.astimezone(zone)
             for field, name in zip(prayer_fields, prayer_names):
                 pt = getattr(mosque, field, None)
                 if not pt:
                     continue
-                prayer_dt = timezone.make_aware(
-                    timezone.datetime.combine(now.date(), pt),
-                    timezone.get_current_timezone()
-                )
+                prayer_dt = timezone.datetime.combine(mosque_now.date(), pt, tzinfo=zone)
                 diff = (prayer_dt - now).total_seconds() / 60
                 if 0 < diff <= 30:
                     due_soon.append(f'{mosque.name} → {name} at {pt.strftime("%H:%M")} ({int(diff)} min)')
@@ -185,3 +185,43 @@ class Command(BaseCommand):
             '  Worker: celery -A config worker -l info\n'
             '  Beat  : celery -A config beat -l info --scheduler django_celery_beat.schedulers:DatabaseScheduler'
         ))
+
+    def _check_task_metrics(self):
+        self.stdout.write('\n[Reminder lag — last 15 min]')
+        try:
+            from push_notification.task_metrics import summarize
+            summary = summarize(minutes=15)
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f'  ⚠ Task metrics unavailable: {e}'))
+            return
+
+        reminder_tasks = (
+            'push_notification.tasks.fire_planned_reminders',
+            'push_notification.tasks.send_whatsapp_notification',
+            'push_notification.tasks.queue_whatsapp_for_subscription',
+            'push_notification.tasks.queue_email_for_subscription',
+        )
+        rows = 0
+        for minute in summary:
+            for name in reminder_tasks:
+                entry = minute['tasks'].get(name)
+                if not entry or 'wait' not in entry:
+                    continue
+                wait = entry['wait']
+                self.stdout.write(
+                    f"  {minute['minute'][11:16]} {name.rsplit('.', 1)[-1]:<34} "
+                    f"n={wait['samples']:<5} p50={wait['p50']}s p95={wait['p95']}s p99={wait['p99']}s "
+                    f"retries={entry['retries']} failures={entry['failures']}"
+                )
+                rows += 1
+        if not rows:
+            self.stdout.write('  No reminder tasks recorded in the last 15 min')
+
+        for minute in summary[:1]:
+            for name, entry in minute['tasks'].items():
+                if name.startswith('external:') and 'run' in entry:
+                    run = entry['run']
+                    self.stdout.write(
+                        f"  {name[9:]:<8} p50={run['p50']}s p95={run['p95']}s p99={run['p99']}s "
+                        f"calls={entry['count']} errors={entry['errors']}"
+                    )
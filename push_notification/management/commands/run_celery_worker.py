@@ -1,9 +1,13 @@
 """
 Management command to run Celery worker.
+
+Usage:
+    python manage.py run_celery_worker                      # all queues, reminders first
+    python manage.py run_celery_worker --queues reminders   # dedicated reminders worker
+    python manage.py run_celery_worker --queues bulk-email --concurrency 8
 """
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from celery import Celery
-from celery.bin import worker
 
 
 class Command(BaseCommand):
@@ -15,25 +19,40 @@ class Command(BaseCommand):
             default='info',
             help='Log level'
         )
+        parser.add_argument(
+            '--queues',
+            default=None,
+            help='Comma-separated queues to consume (default: all, in priority order)'
+        )
         parser.add_argument(
             '--concurrency',
             type=int,
-            default=4,
-            help='Number of concurrent workers'
+            default=None,
+            help='Number of concurrent workers (default: WORKER_QUEUE_CONCURRENCY for the queues)'
         )
 
     def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS('Starting Celery worker...'))
-        
-        app = Celery('salahtime')
-        app.config_from_object('django.conf:settings', namespace='CELERY')
-        
-        worker_cmd = worker.worker(app=app)
-        options = {
-            'loglevel': options['loglevel'],
-            'concurrency': options['concurrency'],
-            'pool': 'prefork',
-        }
-        
-        worker_cmd.run(**options)
+        from config.celery import app
+
+        queues = (
+            [queue.strip() for queue in options['queues'].split(',') if queue.strip()]
+            if options['queues'] else list(settings.WORKER_QUEUES)
+        )
+        concurrency = options['concurrency']
+        if concurrency is None:
+            per_queue = getattr(settings, 'WORKER_QUEUE_CONCURRENCY', {})
+            concurrency = sum(per_queue.get(queue, 1) for queue in queues)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Starting Celery worker on {", ".join(queues)} (concurrency {concurrency})...'
+        ))
 
+        hostname = queues[0] if len(queues) == 1 else 'all'
+        app.worker_main(argv=[
+            'worker',
+            f'--loglevel={options["loglevel"]}',
+            f'--concurrency={concurrency}',
+            f'--queues={",".join(queues)}',
+            f'--hostname={hostname}@%h',
+            '--pool=prefork',
+        ])
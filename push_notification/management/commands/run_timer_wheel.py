@@ -0,0 +1,68 @@
+"""
+Management command to run the reminder timer-wheel daemon.
+
+Pops due reminders from the Redis sorted set and hands them, in batches,
+to fire_planned_reminders. Run as many copies as needed; pops are atomic.
+
+Usage:
+    python manage.py run_timer_wheel
+    python manage.py run_timer_wheel --batch-size 1000 --max-sleep 0.5
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Run the Redis timer-wheel daemon that fires planned reminders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Maximum reminders handed to one fire_planned_reminders task'
+        )
+        parser.add_argument(
+            '--max-sleep',
+            type=float,
+            default=1.0,
+            help='Maximum seconds to sleep when nothing is due'
+        )
+        parser.add_argument(
+            '--visibility-timeout',
+            type=int,
+            default=None,
+            help='Seconds before an unacknowledged batch is popped again'
+        )
+
+    def handle(self, *args, **options):
+        from push_notification.tasks import _enqueue_task, fire_planned_reminders
+        from push_notification.timer_wheel import TimerWheel
+
+        wheel = TimerWheel(visibility_timeout=options['visibility_timeout'])
+        self._running = True
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Starting timer wheel (visibility timeout {wheel.visibility_timeout}s)...'
+        ))
+
+        while self._running:
+            wheel.requeue_expired()
+            reminder_ids = wheel.pop_due(limit=options['batch_size'])
+            if reminder_ids:
+                _enqueue_task(fire_planned_reminders, reminder_ids)
+                wheel.ack(reminder_ids)
+                continue
+
+            next_due = wheel.next_due_in()
+            sleep_for = options['max_sleep'] if next_due is None else min(next_due, options['max_sleep'])
+            time.sleep(sleep_for)
+
+        self.stdout.write('Timer wheel stopped.')
+
+    def _stop(self, signum, frame):
+        self._running = False
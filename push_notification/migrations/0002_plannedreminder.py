@@ -0,0 +1,40 @@
+# Generated by Django 4.2.27 on 2026-10-19 02:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('find_mosque', '0008_add_jumuah_fields_to_mosquemonthlyprayertime'),
+        ('subscribe', '0003_subscriptionlog_prayer_name'),
+        ('push_notification', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlannedReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('whatsapp', 'WhatsApp Notification'), ('subscription', 'Subscription')], max_length=20)),
+                ('prayer_name', models.CharField(max_length=20)),
+                ('prayer_time', models.TimeField(help_text='Local prayer time shown in the message')),
+                ('minutes_before', models.PositiveSmallIntegerField(default=10)),
+                ('fire_at', models.DateTimeField(help_text='UTC minute the reminder is sent')),
+                ('task_id', models.CharField(blank=True, help_text='Celery task carrying this reminder', max_length=255)),
+                ('status', models.CharField(choices=[('planned', 'Planned'), ('sent', 'Sent'), ('cancelled', 'Cancelled')], default='planned', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('mosque', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='planned_reminders', to='find_mosque.mosque')),
+                ('subscription', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='planned_reminders', to='subscribe.subscription')),
+                ('whatsapp', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='planned_reminders', to='push_notification.whatsappnotification')),
+            ],
+            options={
+                'verbose_name': 'Planned Reminder',
+                'verbose_name_plural': 'Planned Reminders',
+                'ordering': ['fire_at'],
+                'indexes': [models.Index(fields=['status', 'fire_at'], name='push_notifi_status_4275b6_idx')],
+            },
+        ),
+    ]
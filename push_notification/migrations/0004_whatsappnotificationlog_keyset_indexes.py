@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-19 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('push_notification', '0003_spooledtask'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='whatsappnotificationlog',
+            index=models.Index(fields=['-sent_at', '-id'], name='push_notifi_sent_at_b33861_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='whatsappnotificationlog',
+            index=models.Index(fields=['whatsapp', '-sent_at', '-id'], name='push_notifi_whatsap_7d31c9_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.utils import timezone
+
+# Beat entries replaced by coordinate-notification-dispatch. DatabaseScheduler
+# never removes rows that drop out of CELERY_BEAT_SCHEDULE, so left alone they
+# keep firing every minute alongside the coordinator.
+LEGACY_TASK_NAMES = [
+    'dispatch-due-prayer-notifications',
+    'dispatch-subscription-notifications',
+]
+
+
+def remove_legacy_dispatch_tasks(apps, schema_editor):
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+    if PeriodicTask.objects.filter(name__in=LEGACY_TASK_NAMES).delete()[0]:
+        # Tell a running beat to reload its schedule.
+        PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('push_notification', '0004_whatsappnotificationlog_keyset_indexes'),
+        ('django_celery_beat', '0018_improve_crontab_helptext'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_legacy_dispatch_tasks, migrations.RunPython.noop),
+    ]
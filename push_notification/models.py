@@ -95,7 +95,85 @@ class WhatsAppNotificationLog(models.Model):
         ordering = ['-sent_at']
         verbose_name = 'WhatsApp Notification Log'
         verbose_name_plural = 'WhatsApp Notification Logs'
+        indexes = [
+            models.Index(fields=['-sent_at', '-id']),
+            models.Index(fields=['whatsapp', '-sent_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.whatsapp.phone_number} - {self.status} - {self.sent_at}"
 
+
+
+class PlannedReminder(models.Model):
+    """
+    A prayer reminder computed ahead of time by the daily planner and
+    queued with a Celery ETA for the minute it has to fire.
+    """
+    CHANNELS = [
+        ('whatsapp', 'WhatsApp Notification'),
+        ('subscription', 'Subscription'),
+    ]
+
+    STATUS_CHOICES = [
+        ('planned', 'Planned'),
+        ('sent', 'Sent'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    channel = models.CharField(max_length=20, choices=CHANNELS)
+    whatsapp = models.ForeignKey(WhatsAppNotification, on_delete=models.CASCADE, null=True, blank=True, related_name='planned_reminders')
+    subscription = models.ForeignKey('subscribe.Subscription', on_delete=models.CASCADE, null=True, blank=True, related_name='planned_reminders')
+    mosque = models.ForeignKey('find_mosque.Mosque', on_delete=models.CASCADE, null=True, blank=True, related_name='planned_reminders')
+    prayer_name = models.CharField(max_length=20)
+    prayer_time = models.TimeField(help_text="Local prayer time shown in the message")
+    minutes_before = models.PositiveSmallIntegerField(default=10)
+    fire_at = models.DateTimeField(help_text="UTC minute the reminder is sent")
+    task_id = models.CharField(max_length=255, blank=True, help_text="Celery task carrying this reminder")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='planned')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['fire_at']
+        indexes = [
+            models.Index(fields=['status', 'fire_at']),
+        ]
+        verbose_name = 'Planned Reminder'
+        verbose_name_plural = 'Planned Reminders'
+
+    def __str__(self):
+        return f"{self.channel} - {self.prayer_name} - {self.fire_at}"
+
+
+class SpooledTask(models.Model):
+    """
+    A Celery task the broker rejected, kept until drain_task_spool can
+    publish it again.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('published', 'Published'),
+        ('expired', 'Expired'),
+    ]
+
+    task_name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    queue = models.CharField(max_length=50, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        verbose_name = 'Spooled Task'
+        verbose_name_plural = 'Spooled Tasks'
+
+    def __str__(self):
+        return f"{self.task_name} - {self.status} - {self.created_at}"
@@ -9,15 +9,9 @@ app = Celery('salahtime')
 
 # Configure beat schedule
 app.conf.beat_schedule = {
-    # Run every minute and dispatch notifications due at that minute
-    'dispatch-due-prayer-notifications': {
-        'task': 'push_notification.tasks.dispatch_due_prayer_notifications',
-        'schedule': crontab(minute='*'),
-    },
-    
-    # Run every minute and dispatch subscription-based notifications
-    'dispatch-subscription-notifications': {
-        'task': 'push_notification.tasks.dispatch_subscription_notifications',
+    # Run every minute and fan both notification dispatchers out into shards
+    'coordinate-notification-dispatch': {
+        'task': 'push_notification.tasks.coordinate_notification_dispatch',
         'schedule': crontab(minute='*'),
     },
     
@@ -35,11 +29,29 @@ app.conf.beat_schedule = {
         'args': (1,),
     },
     
+    # Replay tasks spooled while the broker was down
+    'drain-task-spool': {
+        'task': 'push_notification.tasks.drain_task_spool',
+        'schedule': crontab(minute='*'),
+    },
+    
     # Cleanup old logs (daily at 2 AM)
     'cleanup-old-logs': {
         'task': 'push_notification.tasks.cleanup_old_notification_logs',
         'schedule': crontab(hour=2, minute=0),  # 2:00 AM UTC
     },
+    
+    # Prune expired JWTs and rebuild the blacklist bloom filter (hourly)
+    'prune-token-blacklist': {
+        'task': 'Authentication.tasks.prune_token_blacklist',
+        'schedule': crontab(minute=15),
+    },
+    
+    # Delete content-addressed media nothing references any more (daily)
+    'collect-media-garbage': {
+        'task': 'api.tasks.collect_media_garbage',
+        'schedule': crontab(hour=3, minute=30),
+    },
 }
 
 # Timezone
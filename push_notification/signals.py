@@ -0,0 +1,114 @@
+"""
+Signal handlers that keep ETA-planned reminders in sync with the data
+they were computed from.
+
+Only active when NOTIFICATION_SCHEDULING_MODE is 'eta' or 'timer'. Changes made
+inside a transaction are collected and handed to a single replan_reminders
+task once it commits.
+"""
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from find_mosque.models import Mosque, MosqueMonthlyPrayerTime
+from prayer_times.models import MonthlyPrayerTime
+from subscribe.models import Subscription
+from .models import WhatsAppNotification
+
+_pending = threading.local()
+
+
+def _eta_scheduling_enabled():
+    return getattr(settings, 'NOTIFICATION_SCHEDULING_MODE', 'poll') in ('eta', 'timer')
+
+
+def _flush_replan():
+    pending = getattr(_pending, 'ids', None)
+    _pending.ids = None
+    if not pending or not (pending['whatsapp'] or pending['subscription']):
+        return
+
+    from .tasks import _enqueue_task, replan_reminders
+    _enqueue_task(
+        replan_reminders,
+        whatsapp_ids=sorted(pending['whatsapp']),
+        subscription_ids=sorted(pending['subscription']),
+    )
+
+
+def schedule_replan(whatsapp_ids=(), subscription_ids=()):
+    """Re-plan reminders for the given subscribers after the current transaction."""
+    if not _eta_scheduling_enabled():
+        return
+
+    pending = getattr(_pending, 'ids', None)
+    if pending is None:
+        pending = _pending.ids = {'whatsapp': set(), 'subscription': set()}
+    pending['whatsapp'].update(whatsapp_ids)
+    pending['subscription'].update(subscription_ids)
+    # The first callback to run after commit drains everything collected so
+    # far; the rest find nothing left to do.
+    transaction.on_commit(_flush_replan)
+
+
+@receiver(post_save, sender=WhatsAppNotification)
+def replan_whatsapp_subscriber(sender, instance, **kwargs):
+    schedule_replan(whatsapp_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Subscription)
+def replan_subscription(sender, instance, **kwargs):
+    schedule_replan(subscription_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Subscription.selected_mosques.through)
+def replan_subscription_mosques(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # post_clear gets no pk_set and the rows are gone by then, so note
+        # which subscriptions are losing this mosque now.
+        if _eta_scheduling_enabled():
+            instance._cleared_subscription_ids = list(instance.subscriptions.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # instance is a Mosque; pk_set holds subscription ids
+        if action == 'post_clear':
+            pk_set = instance.__dict__.pop('_cleared_subscription_ids', ())
+        schedule_replan(subscription_ids=pk_set or ())
+    else:
+        schedule_replan(subscription_ids=[instance.pk])
+
+
+@receiver(post_save, sender=MonthlyPrayerTime)
+@receiver(post_delete, sender=MonthlyPrayerTime)
+def replan_city_timetable(sender, instance, **kwargs):
+    if not _eta_scheduling_enabled():
+        return
+    schedule_replan(whatsapp_ids=WhatsAppNotification.objects.filter(
+        city_id=instance.city_id,
+        is_active=True,
+    ).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Mosque)
+def replan_mosque(sender, instance, **kwargs):
+    if not _eta_scheduling_enabled():
+        return
+    schedule_replan(subscription_ids=instance.subscriptions.filter(
+        is_active=True,
+    ).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=MosqueMonthlyPrayerTime)
+@receiver(post_delete, sender=MosqueMonthlyPrayerTime)
+def replan_mosque_timetable(sender, instance, **kwargs):
+    if not _eta_scheduling_enabled():
+        return
+    schedule_replan(subscription_ids=Subscription.objects.filter(
+        selected_mosques__id=instance.mosque_id,
+        is_active=True,
+    ).values_list('id', flat=True))
@@ -0,0 +1,214 @@
+"""
+Celery task metrics aggregated in Redis.
+
+Signal hooks record, for push_notification and newsletter tasks:
+
+- queue wait: enqueue (or ETA, for planned reminders) to task start
+- run time: task start to finish
+- retries and failures
+- external call duration (Twilio, SMTP) via the external_call() context manager
+
+Samples are bucketed into one Redis hash per minute, keyed by the minute
+the task was due (its ETA, or the time it was published), so the lag of
+each reminder minute can be read back as p50/p95/p99. Metrics are best
+effort: a Redis error never affects the task itself.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun, task_retry
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TRACKED_PREFIXES = ('push_notification.', 'newsletter.')
+KEY_PREFIX = 'salahtime:task_metrics:'
+MINUTES_KEY = 'salahtime:task_metrics:minutes'
+RETENTION_SECONDS = 2 * 24 * 3600
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+
+_client = None
+_client_lock = threading.Lock()
+_started = {}
+_paused_until = 0.0
+
+
+def _enabled():
+    return getattr(settings, 'TASK_METRICS_ENABLED', True)
+
+
+def _tracked(task_name):
+    return bool(task_name) and task_name.startswith(TRACKED_PREFIXES)
+
+
+def _redis():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import redis
+                _client = redis.from_url(
+                    settings.CELERY_BROKER_URL,
+                    socket_timeout=0.5,
+                    socket_connect_timeout=0.5,
+                )
+    return _client
+
+
+def _minute(timestamp):
+    return int(timestamp // 60 * 60)
+
+
+def _bucket(seconds):
+    return bisect_left(BUCKETS, seconds)
+
+
+def _record(minute, name, samples=(), counters=()):
+    """
+    Add samples ((kind, seconds) pairs) and counters to the hash of `minute`.
+    """
+    global _paused_until
+    if not _enabled() or time.monotonic() < _paused_until:
+        return
+    key = f'{KEY_PREFIX}{minute}'
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        for kind, seconds in samples:
+            pipe.hincrby(key, f'{name}|{kind}|{_bucket(max(seconds, 0.0))}', 1)
+        for counter in counters:
+            pipe.hincrby(key, f'{name}|{counter}', 1)
+        pipe.expire(key, RETENTION_SECONDS)
+        pipe.zadd(MINUTES_KEY, {minute: minute})
+        pipe.zremrangebyscore(MINUTES_KEY, 0, minute - RETENTION_SECONDS)
+        pipe.execute()
+    except Exception as exc:
+        # Back off so an unreachable Redis does not slow every task down.
+        _paused_until = time.monotonic() + 30
+        logger.debug("Task metrics not recorded: %s", exc)
+
+
+def _due_timestamp(request):
+    """When the task was meant to run: its ETA, else when it was published."""
+    eta = getattr(request, 'eta', None)
+    if eta:
+        try:
+            return datetime.fromisoformat(eta).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return getattr(request, 'enqueued_at', None)
+
+
+@contextmanager
+def external_call(name):
+    """
+    Time a call to an external service (e.g. 'twilio', 'smtp').
+    Exceptions are counted as errors and re-raised.
+    """
+    started = time.monotonic()
+    counters = ('count',)
+    try:
+        yield
+    except Exception:
+        counters = ('count', 'errors')
+        raise
+    finally:
+        _record(
+            _minute(time.time()),
+            f'external:{name}',
+            samples=[('run', time.monotonic() - started)],
+            counters=counters,
+        )
+
+
+@before_task_publish.connect(dispatch_uid='task_metrics_publish')
+def _on_publish(sender=None, headers=None, **kwargs):
+    if headers is not None and _tracked(sender):
+        headers.setdefault('enqueued_at', time.time())
+
+
+@task_prerun.connect(dispatch_uid='task_metrics_prerun')
+def _on_prerun(sender=None, task_id=None, task=None, **kwargs):
+    if task is not None and _tracked(task.name):
+        _started[task_id] = (time.time(), time.monotonic())
+
+
+@task_postrun.connect(dispatch_uid='task_metrics_postrun')
+def _on_postrun(sender=None, task_id=None, task=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is None:
+        return
+    started_at, started_monotonic = started
+    samples = [('run', time.monotonic() - started_monotonic)]
+    due = _due_timestamp(task.request)
+    if due is not None:
+        samples.append(('wait', started_at - due))
+    _record(_minute(due if due is not None else started_at), task.name, samples, ('count',))
+
+
+@task_retry.connect(dispatch_uid='task_metrics_retry')
+def _on_retry(sender=None, request=None, **kwargs):
+    if sender is not None and _tracked(sender.name):
+        _record(_minute(time.time()), sender.name, counters=('retries',))
+
+
+@task_failure.connect(dispatch_uid='task_metrics_failure')
+def _on_failure(sender=None, task_id=None, **kwargs):
+    if sender is not None and _tracked(sender.name):
+        _record(_minute(time.time()), sender.name, counters=('failures',))
+
+
+def _percentile(counts, total, quantile):
+    threshold = quantile * total
+    cumulative = 0
+    for index in sorted(counts):
+        cumulative += counts[index]
+        if cumulative >= threshold:
+            return BUCKETS[index] if index < len(BUCKETS) else float('inf')
+    return None
+
+
+def summarize(minutes=60, now=None):
+    """
+    Return per-minute, per-task metrics for the last `minutes` minutes,
+    newest first. Percentiles are bucket upper bounds in seconds.
+    """
+    now = now or time.time()
+    client = _redis()
+    minute_keys = [
+        int(minute)
+        for minute in client.zrevrangebyscore(MINUTES_KEY, now, now - minutes * 60)
+    ]
+    pipe = client.pipeline(transaction=False)
+    for minute in minute_keys:
+        pipe.hgetall(f'{KEY_PREFIX}{minute}')
+
+    summary = []
+    for minute, raw in zip(minute_keys, pipe.execute()):
+        tasks = {}
+        for field, value in raw.items():
+            name, _, rest = field.decode().partition('|')
+            entry = tasks.setdefault(name, {'count': 0, 'retries': 0, 'failures': 0, 'errors': 0, '_hist': {}})
+            kind, _, bucket = rest.partition('|')
+            if bucket:
+                entry['_hist'].setdefault(kind, {})[int(bucket)] = int(value)
+            else:
+                entry[kind] = int(value)
+
+        for entry in tasks.values():
+            for kind, counts in entry.pop('_hist').items():
+                total = sum(counts.values())
+                entry[kind] = {
+                    'samples': total,
+                    'p50': _percentile(counts, total, 0.50),
+                    'p95': _percentile(counts, total, 0.95),
+                    'p99': _percentile(counts, total, 0.99),
+                }
+        summary.append({
+            'minute': datetime.fromtimestamp(minute, tz=dt_timezone.utc).isoformat(),
+            'tasks': tasks,
+        })
+    return summary
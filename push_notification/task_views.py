@@ -68,6 +68,29 @@ def task_status_view(request, task_id):
     })
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def task_metrics_view(request):
+    """
+    Per-minute Celery task metrics: queue wait and run time percentiles,
+    retries, failures and external call durations.
+    """
+    from push_notification.task_metrics import summarize
+
+    try:
+        minutes = min(max(int(request.query_params.get('minutes', 60)), 1), 24 * 60)
+    except ValueError:
+        return Response({'error': 'minutes must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return Response({'minutes': minutes, 'results': summarize(minutes)})
+    except Exception as exc:
+        return Response(
+            {'error': f'Task metrics unavailable: {exc}'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def celery_health_check(request):
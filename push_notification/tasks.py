@@ -2,9 +2,20 @@
 Celery tasks for push notifications.
 """
 from celery import shared_task
+from django.db.models import F, Q
+from django.db.models.functions import Mod
 from django.utils import timezone
-from datetime import timedelta
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from itertools import product
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import logging
+import time
+import uuid
+
+from push_notification.enqueue import broker_breaker, enqueue_batch, enqueue_task as _enqueue_task, publish_many
+from push_notification.task_metrics import external_call
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +39,8 @@ def _send_whatsapp_via_twilio(to_phone, message):
         client = Client(account_sid, auth_token)
         # Ensure to_phone has whatsapp: prefix
         to_wa = to_phone if to_phone.startswith('whatsapp:') else f'whatsapp:{to_phone}'
-        msg = client.messages.create(body=message, from_=from_number, to=to_wa)
+        with external_call('twilio'):
+            msg = client.messages.create(body=message, from_=from_number, to=to_wa)
         logger.info(f"[WhatsApp] Sent to {to_phone} — SID: {msg.sid}")
         return msg.sid, None
     except Exception as e:
@@ -36,23 +48,6 @@ def _send_whatsapp_via_twilio(to_phone, message):
         return None, str(e)
 
 
-def _enqueue_task(task, *args, **kwargs):
-    """
-    Enqueue a Celery task; fall back to local execution if broker is unavailable.
-    """
-    try:
-        task.delay(*args, **kwargs)
-        return 'queued'
-    except Exception as exc:
-        logger.warning(
-            "Celery broker unavailable for task %s. Running inline. Error: %s",
-            getattr(task, 'name', str(task)),
-            exc,
-        )
-        task.apply(args=args, kwargs=kwargs)
-        return 'inline'
-
-
 @shared_task(bind=True, max_retries=3)
 def send_whatsapp_notification(self, notification_id, message, prayer_name=''):
     """
@@ -91,13 +86,109 @@ def send_whatsapp_notification(self, notification_id, message, prayer_name=''):
         self.retry(exc=exc, countdown=60)
 
 
-def _is_notification_due(now_local, prayer_time, minutes_before):
-    prayer_datetime = timezone.make_aware(
-        timezone.datetime.combine(now_local.date(), prayer_time),
-        timezone.get_current_timezone()
-    )
-    due_datetime = prayer_datetime - timedelta(minutes=minutes_before)
-    return due_datetime.replace(second=0, microsecond=0) == now_local.replace(second=0, microsecond=0)
+# Mosque fields holding each prayer's adhan time: monthly timetable first, static fallback
+MONTHLY_FIELD_MAP = {
+    'fajr': 'fajr_adhan',
+    'dhuhr': 'dhuhr_adhan',
+    'asr': 'asr_adhan',
+    'maghrib': 'maghrib_adhan',
+    'isha': 'isha_adhan',
+}
+STATIC_FIELD_MAP = {
+    'fajr': 'fajr_beginning',
+    'dhuhr': 'dhuhr_beginning',
+    'asr': 'asr_beginning',
+    'maghrib': 'maghrib_sunset',  # correct field name on Mosque model
+    'isha': 'isha_beginning',
+}
+
+
+@lru_cache(maxsize=None)
+def _zone_for(tz_name):
+    """Return a cached ZoneInfo for a City.timezone value, falling back to UTC."""
+    try:
+        return ZoneInfo(tz_name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning("Unknown city timezone %r — using UTC", tz_name)
+        return ZoneInfo('UTC')
+
+
+def _city_zones(city_ids):
+    """Resolve {city_id: ZoneInfo} for a set of cities in a single query."""
+    from locations.models import City
+
+    return {
+        city_id: _zone_for(tz_name)
+        for city_id, tz_name in City.objects.filter(id__in=city_ids).values_list('id', 'timezone')
+    }
+
+
+def _local_date_q(field, local_dates):
+    """
+    Build a filter matching timetable rows for (key, local date) pairs.
+    Keys sharing a calendar date are grouped into one clause.
+    """
+    keys_by_date = defaultdict(list)
+    for key, local_date in local_dates:
+        keys_by_date[local_date].append(key)
+
+    query = Q(pk__in=[])
+    for local_date, keys in keys_by_date.items():
+        query |= Q(
+            **{f'{field}__in': keys},
+            year=local_date.year,
+            month=local_date.month,
+            day=local_date.day,
+        )
+    return query
+
+
+def _prayer_instants_utc(local_date, zone, prayer_times):
+    """
+    Convert {prayer_name: local time} for one place into
+    {prayer_name: (local time, UTC datetime)}.
+    """
+    return {
+        prayer_name: (
+            prayer_time,
+            datetime.combine(local_date, prayer_time, tzinfo=zone).astimezone(dt_timezone.utc),
+        )
+        for prayer_name, prayer_time in prayer_times.items()
+        if prayer_time
+    }
+
+
+def _mosque_prayer_times(mosque, monthly=None):
+    """
+    Map prayer name → adhan time for a mosque: the monthly timetable row
+    when there is one, falling back to the static mosque fields.
+    """
+    prayer_times = {}
+    for prayer_name, static_field in STATIC_FIELD_MAP.items():
+        prayer_time_value = getattr(monthly, MONTHLY_FIELD_MAP[prayer_name], None) if monthly else None
+        prayer_times[prayer_name] = prayer_time_value or getattr(mosque, static_field, None)
+    return prayer_times
+
+
+SUPPORTED_MINUTES_BEFORE = (10, 20, 30)
+
+
+def _normalize_minutes_before(minutes_before):
+    """Only 10/20/30 minute reminders are supported; anything else means 10."""
+    return minutes_before if minutes_before in SUPPORTED_MINUTES_BEFORE else 10
+
+
+def _dispatch_dates(now_utc, zone):
+    """
+    Local dates whose prayers can be due at `now_utc`: today's, plus
+    tomorrow's when a reminder sent now may be for a prayer after midnight.
+    """
+    return _planning_dates(zone, now_utc, now_utc + timedelta(minutes=max(SUPPORTED_MINUTES_BEFORE)))
+
+
+def _is_notification_due(now_utc, prayer_instant, minutes_before):
+    due_datetime = prayer_instant - timedelta(minutes=minutes_before)
+    return due_datetime.replace(second=0, microsecond=0) == now_utc.replace(second=0, microsecond=0)
 
 
 def _already_sent_for_window(subscriber_id, prayer_name, window_start, window_end):
@@ -112,84 +203,156 @@ def _already_sent_for_window(subscriber_id, prayer_name, window_start, window_en
     ).exists()
 
 
+def _get_shard_count(shard_count=None):
+    """Resolve the dispatcher shard count from the task kwarg or settings."""
+    from django.conf import settings
+
+    if shard_count is None:
+        shard_count = getattr(settings, 'NOTIFICATION_DISPATCH_SHARDS', 1)
+    try:
+        return max(int(shard_count), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def _shard_queryset(queryset, shard_index=None, shard_count=None):
+    """
+    Restrict a queryset to the rows owned by one dispatcher shard.
+    Rows are assigned by primary key modulo the shard count.
+    """
+    if shard_index is None or not shard_count or shard_count <= 1:
+        return queryset
+    return queryset.annotate(dispatch_shard=Mod('id', shard_count)).filter(dispatch_shard=shard_index)
+
+
+def _dispatch_clock(scheduled_at=None):
+    """
+    Return (now_local, lag_seconds) for a dispatch run.
+
+    Shards fanned out by the coordinator receive the minute they were
+    scheduled for, so a shard that starts late still evaluates that minute.
+    """
+    now_local = timezone.localtime()
+    if not scheduled_at:
+        return now_local, 0.0
+    scheduled = timezone.localtime(datetime.fromisoformat(scheduled_at))
+    return scheduled, max((now_local - scheduled).total_seconds(), 0.0)
+
+
+def _shard_result(result, dispatcher, shard_index, shard_count, lag_seconds, started):
+    """
+    Attach shard identity and timing to a dispatcher result.
+    Logs a warning when the shard finished after its minute had passed.
+    """
+    result.update({
+        'dispatcher': dispatcher,
+        'shard': shard_index if shard_index is not None else 0,
+        'shard_count': shard_count or 1,
+        'lag_seconds': round(lag_seconds, 3),
+        'duration_seconds': round(time.monotonic() - started, 3),
+    })
+    finished_after = result['lag_seconds'] + result['duration_seconds']
+    if finished_after >= 60:
+        logger.warning(
+            "Dispatch shard %s/%s (%s) finished %.1fs after its minute started",
+            result['shard'], result['shard_count'], dispatcher, finished_after,
+        )
+    return result
+
+
 @shared_task(bind=True)
-def dispatch_due_prayer_notifications(self):
+def dispatch_due_prayer_notifications(self, shard_index=None, shard_count=None, scheduled_at=None):
     """
     Dispatch prayer notifications that are due at current minute.
 
     Runs every minute and respects each subscriber's
     notification_minutes_before preference (10/20/30).
+    Prayer times are interpreted in the subscriber city's timezone.
+
+    When shard_index/shard_count are given only subscribers whose id falls
+    into that shard are processed (see coordinate_notification_dispatch).
     """
     from push_notification.models import WhatsAppNotification
     from prayer_times.models import MonthlyPrayerTime
 
-    now_local = timezone.localtime()
+    started = time.monotonic()
+    now_local, lag_seconds = _dispatch_clock(scheduled_at)
     prayer_names = ['fajr', 'dhuhr', 'asr', 'maghrib', 'isha']
 
     subscribers = WhatsAppNotification.objects.filter(
         is_active=True,
         city__isnull=False,
     ).exclude(notification_types=[])
+    subscribers = _shard_queryset(subscribers, shard_index, shard_count)
 
     if not subscribers.exists():
-        return {'status': 'success', 'messages_queued': 0, 'reason': 'no_active_subscribers'}
-
-    city_ids = subscribers.values_list('city_id', flat=True).distinct()
-    prayer_time_map = {
-        pt.city_id: pt
-        for pt in MonthlyPrayerTime.objects.filter(
-            city_id__in=city_ids,
-            year=now_local.year,
-            month=now_local.month,
-            day=now_local.day,
+        return _shard_result(
+            {'status': 'success', 'messages_queued': 0, 'reason': 'no_active_subscribers'},
+            'whatsapp', shard_index, shard_count, lag_seconds, started,
         )
-    }
+
+    # Resolve every city's zone once and convert its prayer times to UTC up front,
+    # so the subscriber loop below only compares UTC instants.
+    now_utc = now_local.astimezone(dt_timezone.utc)
+    city_ids = list(subscribers.values_list('city_id', flat=True).distinct())
+    zones = _city_zones(city_ids)
+    local_dates = [
+        (city_id, local_date)
+        for city_id in city_ids
+        for local_date in _dispatch_dates(now_utc, zones.get(city_id, _zone_for('UTC')))
+    ]
+    prayer_instants = defaultdict(list)
+    for pt in MonthlyPrayerTime.objects.filter(_local_date_q('city_id', local_dates)):
+        prayer_instants[pt.city_id].append(_prayer_instants_utc(
+            date(pt.year, pt.month, pt.day),
+            zones.get(pt.city_id, _zone_for('UTC')),
+            {prayer_name: getattr(pt, prayer_name, None) for prayer_name in prayer_names},
+        ))
 
     messages_queued = 0
-    window_start = now_local.replace(second=0, microsecond=0)
+    window_start = now_utc.replace(second=0, microsecond=0)
     window_end = window_start + timedelta(minutes=1)
 
-    for subscriber in subscribers:
-        if not subscriber.city_id:
-            continue
+    with enqueue_batch():
+        for subscriber in subscribers:
+            if not subscriber.city_id:
+                continue
 
-        prayer_times = prayer_time_map.get(subscriber.city_id)
-        if not prayer_times:
-            continue
+            instants_by_date = prayer_instants.get(subscriber.city_id)
+            if not instants_by_date:
+                continue
 
-        requested_prayers = [p for p in subscriber.notification_types if p in prayer_names]
-        if not requested_prayers:
-            continue
+            requested_prayers = [p for p in subscriber.notification_types if p in prayer_names]
+            if not requested_prayers:
+                continue
 
-        minutes_before = subscriber.notification_minutes_before or 10
-        if minutes_before not in [10, 20, 30]:
-            minutes_before = 10
+            minutes_before = _normalize_minutes_before(subscriber.notification_minutes_before)
 
-        for prayer_name in requested_prayers:
-            prayer_time_value = getattr(prayer_times, prayer_name, None)
-            if not prayer_time_value:
-                continue
+            for instants, prayer_name in product(instants_by_date, requested_prayers):
+                if prayer_name not in instants:
+                    continue
+                prayer_time_value, prayer_instant = instants[prayer_name]
 
-            if not _is_notification_due(now_local, prayer_time_value, minutes_before):
-                continue
+                if not _is_notification_due(now_utc, prayer_instant, minutes_before):
+                    continue
 
-            if _already_sent_for_window(subscriber.id, prayer_name, window_start, window_end):
-                continue
+                if _already_sent_for_window(subscriber.id, prayer_name, window_start, window_end):
+                    continue
 
-            message = prepare_prayer_message(
-                subscriber.language,
-                prayer_name,
-                prayer_time_value.strftime('%H:%M'),
-                minutes_before,
-            )
-            _enqueue_task(send_whatsapp_notification, subscriber.id, message, prayer_name)
-            messages_queued += 1
+                message = prepare_prayer_message(
+                    subscriber.language,
+                    prayer_name,
+                    prayer_time_value.strftime('%H:%M'),
+                    minutes_before,
+                )
+                _enqueue_task(send_whatsapp_notification, subscriber.id, message, prayer_name)
+                messages_queued += 1
 
-    return {
+    return _shard_result({
         'status': 'success',
         'checked_at': now_local.isoformat(),
         'messages_queued': messages_queued,
-    }
+    }, 'whatsapp', shard_index, shard_count, lag_seconds, started)
 
 
 @shared_task(bind=True)
@@ -239,17 +402,18 @@ def send_prayer_notification(self, prayer_name, city_id, minutes_before=None):
     
     # Prepare message templates
     messages_sent = 0
-    for subscriber in subscribers:
-        message = prepare_prayer_message(
-            subscriber.language,
-            prayer_name,
-            prayer_time_value.strftime('%H:%M'),
-            subscriber.notification_minutes_before
-        )
+    with enqueue_batch():
+        for subscriber in subscribers:
+            message = prepare_prayer_message(
+                subscriber.language,
+                prayer_name,
+                prayer_time_value.strftime('%H:%M'),
+                subscriber.notification_minutes_before
+            )
         
-        # Queue the notification task
-        _enqueue_task(send_whatsapp_notification, subscriber.id, message, prayer_name)
-        messages_sent += 1
+            # Queue the notification task
+            _enqueue_task(send_whatsapp_notification, subscriber.id, message, prayer_name)
+            messages_sent += 1
     
     return {
         'status': 'success',
@@ -260,7 +424,7 @@ def send_prayer_notification(self, prayer_name, city_id, minutes_before=None):
 
 
 @shared_task(bind=True)
-def dispatch_subscription_notifications(self):
+def dispatch_subscription_notifications(self, shard_index=None, shard_count=None, scheduled_at=None):
     """
     Dispatch notifications for all active subscriptions based on their
     selected mosques and prayer preferences.
@@ -269,126 +433,161 @@ def dispatch_subscription_notifications(self):
     notification_minutes_before preference (10/20/30).
 
     Sends via WhatsApp or Email based on notification_method.
+    Prayer times are interpreted in the timezone of the mosque's city.
+    Supports the same shard arguments as dispatch_due_prayer_notifications.
     """
     from subscribe.models import Subscription
 
-    now_local = timezone.localtime()
+    started = time.monotonic()
+    now_local, lag_seconds = _dispatch_clock(scheduled_at)
     prayer_names = ['fajr', 'dhuhr', 'asr', 'maghrib', 'isha']
 
-    subscriptions = Subscription.objects.filter(
-        is_active=True,
+    subscriptions = _shard_queryset(
+        Subscription.objects.filter(is_active=True),
+        shard_index,
+        shard_count,
     ).prefetch_related('selected_mosques')
 
     if not subscriptions.exists():
-        return {
+        return _shard_result({
             'status': 'success',
             'notifications_queued': 0,
             'reason': 'no_active_subscriptions'
-        }
+        }, 'subscription', shard_index, shard_count, lag_seconds, started)
 
-    notifications_queued = 0
-    window_start = now_local.replace(second=0, microsecond=0)
-    window_end = window_start + timedelta(minutes=1)
+    from find_mosque.models import MosqueMonthlyPrayerTime
 
+    # Resolve each selected mosque's prayer times once for this run: today's
+    # monthly timetable in the mosque's own timezone, falling back to the
+    # static mosque fields, converted to UTC in bulk.
+    now_utc = now_local.astimezone(dt_timezone.utc)
+    mosques_by_id = {}
     for subscription in subscriptions:
-        mosques = subscription.selected_mosques.all()
-        if not mosques.exists():
-            continue
-
-        requested_prayers = subscription.selected_prayers or []
-        if not requested_prayers:
-            continue
+        for mosque in subscription.selected_mosques.all():
+            mosques_by_id[mosque.id] = mosque
+
+    zones = _city_zones({mosque.city_id for mosque in mosques_by_id.values()})
+    local_dates = [
+        (mosque_id, local_date)
+        for mosque_id, mosque in mosques_by_id.items()
+        for local_date in _dispatch_dates(now_utc, zones.get(mosque.city_id, _zone_for('UTC')))
+    ]
+    monthly_by_mosque = {
+        (row.mosque_id, date(row.year, row.month, row.day)): row
+        for row in MosqueMonthlyPrayerTime.objects.filter(_local_date_q('mosque_id', local_dates))
+    }
 
-        minutes_before = subscription.notification_minutes_before or 10
-        if minutes_before not in [10, 20, 30]:
-            minutes_before = 10
-
-        for mosque in mosques:
-            # Resolve today's prayer times: prefer MosqueMonthlyPrayerTime, fallback to static fields
-            from find_mosque.models import MosqueMonthlyPrayerTime
-            monthly = MosqueMonthlyPrayerTime.objects.filter(
-                mosque=mosque,
-                year=now_local.year,
-                month=now_local.month,
-                day=now_local.day,
-            ).first()
-
-            # Map prayer name → adhan time using monthly timetable or static mosque fields
-            STATIC_FIELD_MAP = {
-                'fajr': 'fajr_beginning',
-                'dhuhr': 'dhuhr_beginning',
-                'asr': 'asr_beginning',
-                'maghrib': 'maghrib_sunset',  # correct field name on Mosque model
-                'isha': 'isha_beginning',
-            }
-            MONTHLY_FIELD_MAP = {
-                'fajr': 'fajr_adhan',
-                'dhuhr': 'dhuhr_adhan',
-                'asr': 'asr_adhan',
-                'maghrib': 'maghrib_adhan',
-                'isha': 'isha_adhan',
-            }
-
-            for prayer_name in requested_prayers:
-                if prayer_name not in prayer_names:
-                    continue
+    prayer_instants = defaultdict(list)
+    for mosque_id, local_date in local_dates:
+        mosque = mosques_by_id[mosque_id]
+        prayer_instants[mosque_id].append(_prayer_instants_utc(
+            local_date,
+            zones.get(mosque.city_id, _zone_for('UTC')),
+            _mosque_prayer_times(mosque, monthly_by_mosque.get((mosque_id, local_date))),
+        ))
 
-                # Try monthly timetable adhan time first
-                if monthly:
-                    prayer_time_value = getattr(monthly, MONTHLY_FIELD_MAP.get(prayer_name, ''), None)
-                else:
-                    prayer_time_value = None
+    notifications_queued = 0
+    window_start = now_utc.replace(second=0, microsecond=0)
+    window_end = window_start + timedelta(minutes=1)
 
-                # Fallback to static mosque fields
-                if not prayer_time_value:
-                    prayer_time_value = getattr(mosque, STATIC_FIELD_MAP.get(prayer_name, ''), None)
+    with enqueue_batch():
+        for subscription in subscriptions:
+            mosques = subscription.selected_mosques.all()
+            if not mosques:
+                continue
 
-                if not prayer_time_value:
-                    continue
+            requested_prayers = subscription.selected_prayers or []
+            if not requested_prayers:
+                continue
 
-                if not _is_notification_due(now_local, prayer_time_value, minutes_before):
-                    continue
+            minutes_before = _normalize_minutes_before(subscription.notification_minutes_before)
 
-                if _already_sent_for_subscription(
-                    subscription.id, mosque.id, prayer_name, window_start, window_end
-                ):
-                    continue
+            for mosque in mosques:
+                for instants, prayer_name in product(prayer_instants.get(mosque.id, ()), requested_prayers):
+                    if prayer_name not in instants:
+                        continue
+                    prayer_time_value, prayer_instant = instants[prayer_name]
 
-                message = prepare_subscription_prayer_message(
-                    'en',
-                    prayer_name,
-                    prayer_time_value.strftime('%H:%M'),
-                    minutes_before,
-                    mosque.name
-                )
+                    if not _is_notification_due(now_utc, prayer_instant, minutes_before):
+                        continue
 
-                if subscription.notification_method == 'whatsapp' and subscription.phone:
-                    _enqueue_task(
-                        queue_whatsapp_for_subscription,
-                        subscription.id,
-                        mosque.id,
-                        prayer_name,
-                        message,
-                    )
-                elif subscription.notification_method == 'email' and subscription.email:
-                    _enqueue_task(
-                        queue_email_for_subscription,
-                        subscription.id,
-                        mosque.id,
-                        prayer_name,
-                        message,
-                        prayer_time_value.strftime('%H:%M'),
-                    )
+                    if _already_sent_for_subscription(
+                        subscription.id, mosque.id, prayer_name, window_start, window_end
+                    ):
+                        continue
 
-                notifications_queued += 1
+                    _queue_subscription_reminder(subscription, mosque, prayer_name, prayer_time_value, minutes_before)
+                    notifications_queued += 1
 
-    return {
+    return _shard_result({
         'status': 'success',
         'checked_at': now_local.isoformat(),
         'notifications_queued': notifications_queued,
+    }, 'subscription', shard_index, shard_count, lag_seconds, started)
+
+
+@shared_task(bind=True)
+def coordinate_notification_dispatch(self, shard_count=None):
+    """
+    Fan the per-minute dispatchers out into parallel shard tasks.
+
+    Every shard of dispatch_due_prayer_notifications and
+    dispatch_subscription_notifications is queued for the current minute
+    through publish_many, so the broker circuit breaker applies and shards
+    the broker rejects are spooled (or, with the spool off, run inline)
+    exactly once. Each shard logs its own start lag and runtime.
+
+    The shard count comes from the NOTIFICATION_DISPATCH_SHARDS setting and
+    can be overridden per run through the periodic task kwargs.
+    """
+    shard_count = _get_shard_count(shard_count)
+    scheduled_at = timezone.localtime().replace(second=0, microsecond=0).isoformat()
+
+    calls = [
+        (dispatcher, (), {'shard_index': index, 'shard_count': shard_count, 'scheduled_at': scheduled_at})
+        for dispatcher in (dispatch_due_prayer_notifications, dispatch_subscription_notifications)
+        for index in range(shard_count)
+    ]
+    published = publish_many(calls)
+
+    return {
+        'status': 'queued' if published == len(calls) else 'partial',
+        'scheduled_at': scheduled_at,
+        'shard_count': shard_count,
+        'tasks_queued': published,
+        'tasks_handed_off': len(calls) - published,
     }
 
 
+def _queue_subscription_reminder(subscription, mosque, prayer_name, prayer_time_value, minutes_before):
+    """Queue one subscription reminder on the channel the subscriber chose."""
+    message = prepare_subscription_prayer_message(
+        'en',
+        prayer_name,
+        prayer_time_value.strftime('%H:%M'),
+        minutes_before,
+        mosque.name
+    )
+
+    if subscription.notification_method == 'whatsapp' and subscription.phone:
+        _enqueue_task(
+            queue_whatsapp_for_subscription,
+            subscription.id,
+            mosque.id,
+            prayer_name,
+            message,
+        )
+    elif subscription.notification_method == 'email' and subscription.email:
+        _enqueue_task(
+            queue_email_for_subscription,
+            subscription.id,
+            mosque.id,
+            prayer_name,
+            message,
+            prayer_time_value.strftime('%H:%M'),
+        )
+
+
 def _already_sent_for_subscription(subscription_id, mosque_id, prayer_name, window_start, window_end):
     """Check if notification already sent in the given time window."""
     from subscribe.models import SubscriptionLog
@@ -402,6 +601,374 @@ def _already_sent_for_subscription(subscription_id, mosque_id, prayer_name, wind
     ).exists()
 
 
+def _planning_dates(zone, window_start, window_end):
+    """Local calendar dates in `zone` that overlap [window_start, window_end)."""
+    first = window_start.astimezone(zone).date()
+    last = window_end.astimezone(zone).date()
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def _fire_at(prayer_instant, minutes_before):
+    return (prayer_instant - timedelta(minutes=minutes_before)).replace(second=0, microsecond=0)
+
+
+def _plan_whatsapp_reminders(subscribers, window_start, window_end):
+    """Build unsaved PlannedReminder rows for WhatsAppNotification subscribers."""
+    from push_notification.models import PlannedReminder
+    from prayer_times.models import MonthlyPrayerTime
+
+    prayer_names = ['fajr', 'dhuhr', 'asr', 'maghrib', 'isha']
+    subscribers = [subscriber for subscriber in subscribers if subscriber.city_id]
+    zones = _city_zones({subscriber.city_id for subscriber in subscribers})
+    city_dates = [
+        (city_id, local_date)
+        for city_id, zone in zones.items()
+        for local_date in _planning_dates(zone, window_start, window_end)
+    ]
+
+    # {city_id: {prayer_name: [(local time, UTC instant), ...]}}
+    instants = defaultdict(lambda: defaultdict(list))
+    for pt in MonthlyPrayerTime.objects.filter(_local_date_q('city_id', city_dates)):
+        local_date = datetime(pt.year, pt.month, pt.day).date()
+        prayer_times = {prayer_name: getattr(pt, prayer_name, None) for prayer_name in prayer_names}
+        for prayer_name, slot in _prayer_instants_utc(local_date, zones[pt.city_id], prayer_times).items():
+            instants[pt.city_id][prayer_name].append(slot)
+
+    reminders = []
+    for subscriber in subscribers:
+        minutes_before = _normalize_minutes_before(subscriber.notification_minutes_before)
+        for prayer_name in subscriber.notification_types or []:
+            for prayer_time_value, prayer_instant in instants[subscriber.city_id].get(prayer_name, []):
+                fire_at = _fire_at(prayer_instant, minutes_before)
+                if window_start <= fire_at < window_end:
+                    reminders.append(PlannedReminder(
+                        channel='whatsapp',
+                        whatsapp_id=subscriber.id,
+                        prayer_name=prayer_name,
+                        prayer_time=prayer_time_value,
+                        minutes_before=minutes_before,
+                        fire_at=fire_at,
+                    ))
+    return reminders
+
+
+def _plan_subscription_reminders(subscriptions, window_start, window_end):
+    """Build unsaved PlannedReminder rows for mosque Subscriptions."""
+    from push_notification.models import PlannedReminder
+    from find_mosque.models import MosqueMonthlyPrayerTime
+
+    subscriptions = list(subscriptions.prefetch_related('selected_mosques'))
+    mosques_by_id = {
+        mosque.id: mosque
+        for subscription in subscriptions
+        for mosque in subscription.selected_mosques.all()
+    }
+    zones = _city_zones({mosque.city_id for mosque in mosques_by_id.values()})
+    mosque_dates = [
+        (mosque_id, local_date)
+        for mosque_id, mosque in mosques_by_id.items()
+        for local_date in _planning_dates(zones.get(mosque.city_id, _zone_for('UTC')), window_start, window_end)
+    ]
+    monthly_rows = {
+        (row.mosque_id, datetime(row.year, row.month, row.day).date()): row
+        for row in MosqueMonthlyPrayerTime.objects.filter(_local_date_q('mosque_id', mosque_dates))
+    }
+
+    # {mosque_id: {prayer_name: [(local time, UTC instant), ...]}}
+    instants = defaultdict(lambda: defaultdict(list))
+    for mosque_id, local_date in mosque_dates:
+        mosque = mosques_by_id[mosque_id]
+        prayer_times = _mosque_prayer_times(mosque, monthly_rows.get((mosque_id, local_date)))
+        zone = zones.get(mosque.city_id, _zone_for('UTC'))
+        for prayer_name, slot in _prayer_instants_utc(local_date, zone, prayer_times).items():
+            instants[mosque_id][prayer_name].append(slot)
+
+    reminders = []
+    for subscription in subscriptions:
+        minutes_before = _normalize_minutes_before(subscription.notification_minutes_before)
+        for mosque in subscription.selected_mosques.all():
+            for prayer_name in subscription.selected_prayers or []:
+                for prayer_time_value, prayer_instant in instants[mosque.id].get(prayer_name, []):
+                    fire_at = _fire_at(prayer_instant, minutes_before)
+                    if window_start <= fire_at < window_end:
+                        reminders.append(PlannedReminder(
+                            channel='subscription',
+                            subscription_id=subscription.id,
+                            mosque_id=mosque.id,
+                            prayer_name=prayer_name,
+                            prayer_time=prayer_time_value,
+                            minutes_before=minutes_before,
+                            fire_at=fire_at,
+                        ))
+    return reminders
+
+
+def _planned_key(reminder):
+    return (
+        reminder.channel,
+        reminder.whatsapp_id,
+        reminder.subscription_id,
+        reminder.mosque_id,
+        reminder.prayer_name,
+        reminder.fire_at,
+    )
+
+
+def _store_planned_reminders(reminders, window_start, window_end):
+    """Insert reminders that are not already planned or sent for the window."""
+    from push_notification.models import PlannedReminder
+
+    existing = {
+        tuple(values)
+        for values in PlannedReminder.objects.filter(
+            fire_at__gte=window_start,
+            fire_at__lt=window_end,
+            status__in=['planned', 'sent'],
+        ).values_list('channel', 'whatsapp_id', 'subscription_id', 'mosque_id', 'prayer_name', 'fire_at')
+    }
+    new_reminders = []
+    for reminder in reminders:
+        key = _planned_key(reminder)
+        if key not in existing:
+            existing.add(key)
+            new_reminders.append(reminder)
+    PlannedReminder.objects.bulk_create(new_reminders, batch_size=1000)
+    return len(new_reminders)
+
+
+def _enqueue_planned_reminders(window_start, window_end):
+    """
+    Queue every planned reminder in the window that has no Celery task yet,
+    one fire_planned_reminders task per minute (split into batches) with
+    its ETA set to that minute.
+
+    Only reminders due within NOTIFICATION_ETA_LOOKAHEAD_MINUTES are
+    queued, so no ETA outlives the broker's visibility timeout; the rest,
+    and rows left without a task id because the broker was down, are
+    picked up by queue_planned_reminders.
+    """
+    from django.conf import settings
+    from push_notification.models import PlannedReminder
+
+    batch_size = getattr(settings, 'NOTIFICATION_PLANNER_BATCH_SIZE', 500)
+    timer_mode = getattr(settings, 'NOTIFICATION_SCHEDULING_MODE', 'poll') == 'timer'
+    if not timer_mode:
+        lookahead = timedelta(minutes=getattr(settings, 'NOTIFICATION_ETA_LOOKAHEAD_MINUTES', 30))
+        window_end = min(window_end, timezone.now().replace(second=0, microsecond=0) + lookahead)
+    ids_by_minute = defaultdict(list)
+    for reminder_id, fire_at in PlannedReminder.objects.filter(
+        status='planned',
+        task_id='',
+        fire_at__gte=window_start,
+        fire_at__lt=window_end,
+    ).values_list('id', 'fire_at'):
+        ids_by_minute[fire_at].append(reminder_id)
+
+    if timer_mode:
+        return _push_to_timer_wheel(ids_by_minute)
+
+    tasks_queued = 0
+    for fire_at, reminder_ids in sorted(ids_by_minute.items()):
+        for offset in range(0, len(reminder_ids), batch_size):
+            batch = reminder_ids[offset:offset + batch_size]
+            task_id = uuid.uuid4().hex
+            try:
+                fire_planned_reminders.apply_async(args=[batch], eta=fire_at, task_id=task_id)
+            except Exception as exc:
+                logger.warning(
+                    "Celery broker unavailable — %d planned reminders left unqueued. Error: %s",
+                    sum(len(ids) for ids in ids_by_minute.values()),
+                    exc,
+                )
+                return tasks_queued
+            PlannedReminder.objects.filter(id__in=batch).update(task_id=task_id)
+            tasks_queued += 1
+    return tasks_queued
+
+
+def _push_to_timer_wheel(ids_by_minute):
+    """
+    Timer mode: add planned reminders to the Redis timer wheel instead of
+    queueing ETA tasks; the run_timer_wheel daemon fires them when due.
+    """
+    from push_notification.models import PlannedReminder
+    from push_notification.timer_wheel import TIMER_WHEEL_TASK_ID, TimerWheel
+
+    try:
+        wheel = TimerWheel()
+        minutes_queued = 0
+        for fire_at, reminder_ids in sorted(ids_by_minute.items()):
+            wheel.schedule(reminder_ids, fire_at)
+            PlannedReminder.objects.filter(id__in=reminder_ids).update(task_id=TIMER_WHEEL_TASK_ID)
+            minutes_queued += 1
+    except Exception as exc:
+        logger.warning("Timer wheel unavailable — planned reminders left unqueued. Error: %s", exc)
+        return 0
+    return minutes_queued
+
+
+def _planning_window(horizon_hours=None):
+    from django.conf import settings
+
+    if horizon_hours is None:
+        horizon_hours = getattr(settings, 'NOTIFICATION_PLANNER_HORIZON_HOURS', 25)
+    window_start = timezone.now().replace(second=0, microsecond=0)
+    return window_start, window_start + timedelta(hours=horizon_hours)
+
+
+@shared_task(bind=True)
+def plan_daily_reminders(self, horizon_hours=None):
+    """
+    Compute every prayer reminder due in the planning horizon and queue
+    the ones due soon with Celery ETAs (queue_planned_reminders queues the
+    rest as they come up), replacing the per-minute dispatchers when
+    NOTIFICATION_SCHEDULING_MODE is 'eta'.
+
+    The default horizon (25h) overlaps the next daily run so no reminder
+    falls between two plans; reminders already planned are not duplicated.
+    In 'timer' mode the reminders go to the Redis timer wheel instead.
+    """
+    from push_notification.models import WhatsAppNotification
+    from subscribe.models import Subscription
+
+    window_start, window_end = _planning_window(horizon_hours)
+
+    subscribers = WhatsAppNotification.objects.filter(
+        is_active=True,
+        city__isnull=False,
+    ).exclude(notification_types=[])
+    reminders = _plan_whatsapp_reminders(subscribers, window_start, window_end)
+    reminders += _plan_subscription_reminders(
+        Subscription.objects.filter(is_active=True), window_start, window_end
+    )
+
+    planned = _store_planned_reminders(reminders, window_start, window_end)
+    tasks_queued = _enqueue_planned_reminders(window_start, window_end)
+
+    return {
+        'status': 'success',
+        'window_start': window_start.isoformat(),
+        'window_end': window_end.isoformat(),
+        'reminders_planned': planned,
+        'tasks_queued': tasks_queued,
+    }
+
+
+@shared_task
+def queue_planned_reminders():
+    """
+    Queue ETA tasks for planned reminders about to fall due (eta mode).
+    Runs every 10 minutes, ahead of NOTIFICATION_ETA_LOOKAHEAD_MINUTES.
+    """
+    window_start, window_end = _planning_window()
+    return {'status': 'success', 'tasks_queued': _enqueue_planned_reminders(window_start, window_end)}
+
+
+@shared_task(bind=True)
+def replan_reminders(self, whatsapp_ids=None, subscription_ids=None):
+    """
+    Cancel and re-plan the upcoming reminders of the given subscribers after
+    their preferences or a timetable they depend on changed.
+    """
+    from push_notification.models import PlannedReminder, WhatsAppNotification
+    from subscribe.models import Subscription
+
+    whatsapp_ids = list(whatsapp_ids or [])
+    subscription_ids = list(subscription_ids or [])
+    window_start, window_end = _planning_window()
+
+    cancelled = PlannedReminder.objects.filter(
+        Q(whatsapp_id__in=whatsapp_ids) | Q(subscription_id__in=subscription_ids),
+        status='planned',
+        fire_at__gte=window_start,
+    ).update(status='cancelled', updated_at=timezone.now())
+
+    reminders = []
+    if whatsapp_ids:
+        subscribers = WhatsAppNotification.objects.filter(
+            id__in=whatsapp_ids,
+            is_active=True,
+            city__isnull=False,
+        ).exclude(notification_types=[])
+        reminders += _plan_whatsapp_reminders(subscribers, window_start, window_end)
+    if subscription_ids:
+        reminders += _plan_subscription_reminders(
+            Subscription.objects.filter(id__in=subscription_ids, is_active=True),
+            window_start,
+            window_end,
+        )
+
+    planned = _store_planned_reminders(reminders, window_start, window_end)
+    tasks_queued = _enqueue_planned_reminders(window_start, window_end)
+
+    return {
+        'status': 'success',
+        'reminders_cancelled': cancelled,
+        'reminders_planned': planned,
+        'tasks_queued': tasks_queued,
+    }
+
+
+@shared_task(bind=True)
+def fire_planned_reminders(self, reminder_ids):
+    """
+    Send a batch of planned reminders at their ETA.
+
+    The rows stay locked while their sends are published, and are only
+    flipped from 'planned' to 'sent' once the publish (or the spool, when
+    the broker is down) has them. If anything fails before that the
+    transaction rolls back and they are still 'planned'. Cancelled rows are
+    skipped and a redelivered task sends nothing twice.
+    """
+    from django.db import transaction
+    from push_notification.models import PlannedReminder
+
+    with transaction.atomic():
+        reminders = list(
+            PlannedReminder.objects.select_for_update(of=('self',))
+            .filter(id__in=reminder_ids, status='planned')
+            .select_related('whatsapp', 'subscription', 'mosque')
+        )
+        sent_ids, skipped_ids = _publish_planned_reminders(reminders)
+        PlannedReminder.objects.filter(id__in=sent_ids).update(status='sent', updated_at=timezone.now())
+        PlannedReminder.objects.filter(id__in=skipped_ids).update(status='cancelled', updated_at=timezone.now())
+
+    return {'status': 'success', 'claimed': len(reminders), 'sent': len(sent_ids)}
+
+
+def _publish_planned_reminders(reminders):
+    """Queue the sends of claimed reminders. Returns (sent ids, skipped ids)."""
+    sent_ids, skipped_ids = [], []
+    with enqueue_batch():
+        for reminder in reminders:
+            if reminder.channel == 'whatsapp':
+                subscriber = reminder.whatsapp
+                if not subscriber or not subscriber.is_active:
+                    skipped_ids.append(reminder.id)
+                    continue
+                message = prepare_prayer_message(
+                    subscriber.language,
+                    reminder.prayer_name,
+                    reminder.prayer_time.strftime('%H:%M'),
+                    reminder.minutes_before,
+                )
+                _enqueue_task(send_whatsapp_notification, subscriber.id, message, reminder.prayer_name)
+            else:
+                subscription = reminder.subscription
+                if not subscription or not subscription.is_active or not reminder.mosque:
+                    skipped_ids.append(reminder.id)
+                    continue
+                _queue_subscription_reminder(
+                    subscription,
+                    reminder.mosque,
+                    reminder.prayer_name,
+                    reminder.prayer_time,
+                    reminder.minutes_before,
+                )
+            sent_ids.append(reminder.id)
+    return sent_ids, skipped_ids
+
+
 @shared_task(bind=True, max_retries=3)
 def queue_whatsapp_for_subscription(self, subscription_id, mosque_id, prayer_name, message):
     """Send WhatsApp message for a Subscription via Twilio."""
@@ -499,13 +1066,14 @@ def queue_email_for_subscription(self, subscription_id, mosque_id, prayer_name,
         )
 
         try:
-            send_mail(
-                subject=subject,
-                message=email_body,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[subscription.email],
-                fail_silently=False,
-            )
+            with external_call('smtp'):
+                send_mail(
+                    subject=subject,
+                    message=email_body,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    recipient_list=[subscription.email],
+                    fail_silently=False,
+                )
             log.status = 'sent'
             logger.info(f"[Email] Sent to {subscription.email} — {subject}")
         except Exception as email_exc:
@@ -633,14 +1201,15 @@ def send_daily_summary(self, city_id):
     )
     
     messages_sent = 0
-    for subscriber in subscribers:
-        message = prepare_daily_summary_message(
-            subscriber.language,
-            prayer_times
-        )
+    with enqueue_batch():
+        for subscriber in subscribers:
+            message = prepare_daily_summary_message(
+                subscriber.language,
+                prayer_times
+            )
         
-        _enqueue_task(send_whatsapp_notification, subscriber.id, message)
-        messages_sent += 1
+            _enqueue_task(send_whatsapp_notification, subscriber.id, message)
+            messages_sent += 1
     
     return {
         'status': 'success',
@@ -649,11 +1218,21 @@ def send_daily_summary(self, city_id):
     }
 
 
+# Stand-ins for the image URL while a linked timetable image has no stored copy
+REGISTRATION_IMAGE_LINES = {
+    'pending': 'Pending: still being fetched from the submitted link. Check the admin panel.',
+    'rejected': 'Rejected: the submitted link did not return a usable image.',
+}
+
+
 @shared_task
 def send_mosque_registration_email(mosque_id, image_url, admin_panel_url):
     """
     Send admin notification email after a new mosque registration.
     Runs in the background so the HTTP response is not blocked by SMTP.
+
+    image_url is the stored image's URL, or 'pending' / 'rejected' while a
+    timetable image submitted as a link is being fetched or was refused.
     """
     from django.core.mail import send_mail
     from django.conf import settings
@@ -685,7 +1264,7 @@ Additional Information:
 {mosque.additional_info or 'None provided'}
 
 Prayer Timetable Image:
-{image_url or 'Not uploaded'}
+{REGISTRATION_IMAGE_LINES.get(image_url, image_url or 'Not uploaded')}
 
 Please review and approve this mosque registration.
 
@@ -705,33 +1284,116 @@ Jazakallahu Khairan"""
     )
 
     if admin_emails:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=admin_emails,
-            fail_silently=False,
-        )
+        with external_call('smtp'):
+            send_mail(
+                subject=subject,
+                message=message,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipient_list=admin_emails,
+                fail_silently=False,
+            )
         logger.info(f"[MosqueRegistration] Email sent to {admin_emails} for mosque '{mosque.name}'")
     else:
         logger.warning("[MosqueRegistration] No admin emails found — skipping notification")
 
 
+@shared_task
+def drain_task_spool(batch_size=500):
+    """
+    Re-publish tasks spooled while the broker was down, oldest first.
+
+    Spooled reminders older than TASK_SPOOL_REMINDER_MAX_AGE_SECONDS are
+    expired instead: a prayer reminder that arrives after the prayer is
+    worse than none. Stops at the first publish failure, leaving the
+    rest for the next run.
+    """
+    from django.conf import settings
+    from django.db import transaction
+    from config.celery import app
+    from push_notification.models import SpooledTask
+
+    if not broker_breaker.allow():
+        return {'status': 'skipped', 'reason': 'broker_circuit_open'}
+
+    reminder_cutoff = timezone.now() - timedelta(
+        seconds=getattr(settings, 'TASK_SPOOL_REMINDER_MAX_AGE_SECONDS', 900)
+    )
+    published_ids = []
+    error = None
+
+    with transaction.atomic():
+        pending = list(
+            SpooledTask.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('created_at')[:batch_size]
+        )
+        expired_ids = [
+            spooled.id for spooled in pending
+            if spooled.queue == 'reminders' and spooled.created_at < reminder_cutoff
+        ]
+        SpooledTask.objects.filter(id__in=expired_ids).update(status='expired')
+
+        # Publish everything else over a single producer connection.
+        try:
+            with app.producer_pool.acquire(block=True) as producer:
+                for spooled in pending:
+                    if spooled.id in expired_ids:
+                        continue
+                    app.send_task(
+                        spooled.task_name,
+                        args=spooled.args,
+                        kwargs=spooled.kwargs,
+                        queue=spooled.queue or None,
+                        producer=producer,
+                        retry=False,
+                    )
+                    published_ids.append(spooled.id)
+        except Exception as exc:
+            error = exc
+
+        SpooledTask.objects.filter(id__in=published_ids).update(
+            status='published', published_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if error is not None:
+            broker_breaker.record_failure()
+            SpooledTask.objects.filter(status='pending', id__in=[spooled.id for spooled in pending]).update(
+                attempts=F('attempts') + 1, last_error=str(error)[:1000]
+            )
+            logger.warning("Spool drain stopped, broker still unavailable: %s", error)
+        else:
+            broker_breaker.record_success()
+
+    published, expired = len(published_ids), len(expired_ids)
+    remaining = SpooledTask.objects.filter(status='pending').count()
+    if published or expired:
+        logger.info(f"Task spool drained: {published} published, {expired} expired, {remaining} pending")
+    return {'status': 'success', 'published': published, 'expired': expired, 'pending': remaining}
+
+
 @shared_task
 def cleanup_old_notification_logs():
     """
-    Cleanup old notification logs (older than 30 days).
+    Cleanup old notification logs (older than 30 days), planned
+    reminders whose minute passed more than two days ago and replayed or
+    expired spooled tasks.
     """
-    from push_notification.models import WhatsAppNotificationLog
+    from push_notification.models import PlannedReminder, SpooledTask, WhatsAppNotificationLog
     from datetime import timedelta
     
     cutoff_date = timezone.now() - timedelta(days=30)
     deleted_count = WhatsAppNotificationLog.objects.filter(
         sent_at__lt=cutoff_date
     ).delete()[0]
+
+    reminders_deleted = PlannedReminder.objects.filter(
+        fire_at__lt=timezone.now() - timedelta(days=2)
+    ).delete()[0]
+    SpooledTask.objects.exclude(status='pending').filter(
+        created_at__lt=timezone.now() - timedelta(days=2)
+    ).delete()
     
-    logger.info(f"Cleaned up {deleted_count} old notification logs")
-    return {'status': 'success', 'deleted_count': deleted_count}
+    logger.info(f"Cleaned up {deleted_count} old notification logs and {reminders_deleted} planned reminders")
+    return {'status': 'success', 'deleted_count': deleted_count, 'reminders_deleted': reminders_deleted}
 
 
 @shared_task(bind=True)
@@ -773,14 +1435,15 @@ def send_weekly_summary(self, city_id):
     )
     
     messages_sent = 0
-    for subscriber in subscribers:
-        message = prepare_weekly_summary_message(
-            subscriber.language,
-            prayer_times
-        )
+    with enqueue_batch():
+        for subscriber in subscribers:
+            message = prepare_weekly_summary_message(
+                subscriber.language,
+                prayer_times
+            )
         
-        _enqueue_task(send_whatsapp_notification, subscriber.id, message)
-        messages_sent += 1
+            _enqueue_task(send_whatsapp_notification, subscriber.id, message)
+            messages_sent += 1
     
     return {
         'status': 'success',
@@ -1,3 +1,499 @@
-from django.test import TestCase
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from config.celery import app
+
+from . import tasks
+from .enqueue import CircuitBreaker, _task_queue, broker_breaker, enqueue_batch, enqueue_task, publish_many
+from .models import PlannedReminder, SpooledTask, WhatsAppNotification
+
+
+@contextmanager
+def fake_broker(fail_after=None):
+    """
+    Replace the producer pool and apply_async with fakes. Publishes after
+    the first `fail_after` raise ConnectionError. Yields the list of
+    published (task name, kwargs) pairs.
+    """
+    published = []
+
+    def apply_async(task, args=None, kwargs=None, **options):
+        if fail_after is not None and len(published) >= fail_after:
+            raise ConnectionError('broker down')
+        published.append((task.name, kwargs or {}))
+
+    pool = mock.MagicMock()
+    with mock.patch.object(type(app), 'producer_pool', new_callable=mock.PropertyMock, return_value=pool), \
+            mock.patch('celery.app.task.Task.apply_async', autospec=True, side_effect=apply_async):
+        yield published
+
+
+class TaskRoutingTests(SimpleTestCase):
+
+    EXPECTED_QUEUES = {
+        'push_notification.tasks.coordinate_notification_dispatch': 'reminders',
+        'push_notification.tasks.dispatch_due_prayer_notifications': 'reminders',
+        'push_notification.tasks.dispatch_subscription_notifications': 'reminders',
+        'push_notification.tasks.send_prayer_notification': 'reminders',
+        'push_notification.tasks.send_whatsapp_notification': 'reminders',
+        'push_notification.tasks.fire_planned_reminders': 'reminders',
+        'push_notification.tasks.queue_planned_reminders': 'reminders',
+        'push_notification.tasks.send_mosque_registration_email': 'admin',
+        'Authentication.tasks.send_password_reset_email': 'admin',
+        'find_mosque.tasks.fetch_mosque_image': 'admin',
+        'push_notification.tasks.plan_daily_reminders': 'maintenance',
+        'push_notification.tasks.drain_task_spool': 'maintenance',
+        'Authentication.tasks.prune_token_blacklist': 'maintenance',
+        'api.tasks.collect_media_garbage': 'maintenance',
+        'push_notification.tasks.send_daily_summary': 'bulk-email',
+        'newsletter.tasks.send_newsletter_email': 'bulk-email',
+        'newsletter.tasks.send_newsletter_campaign': 'bulk-email',
+        'config.celery.debug_task': 'celery',
+    }
+
+    def test_every_task_is_registered(self):
+        app.loader.import_default_modules()
+        for name in self.EXPECTED_QUEUES:
+            self.assertIn(name, app.tasks)
+
+    def test_celery_router_sends_tasks_to_their_queue(self):
+        for name, queue in self.EXPECTED_QUEUES.items():
+            with self.subTest(task=name):
+                self.assertEqual(app.amqp.router.route({}, name)['queue'].name, queue)
+
+    def test_spool_records_the_routed_queue(self):
+        for name, queue in self.EXPECTED_QUEUES.items():
+            with self.subTest(task=name):
+                self.assertEqual(_task_queue(name) or 'celery', queue)
+
+
+class ShardQuerysetTests(TestCase):
+
+    def test_shards_split_rows_without_overlap(self):
+        users = [User.objects.create_user(username=f'user{i}') for i in range(7)]
+        everyone = User.objects.filter(pk__in=[user.pk for user in users])
+
+        shards = [set(tasks._shard_queryset(everyone, index, 3).values_list('pk', flat=True)) for index in range(3)]
+
+        self.assertEqual(set.union(*shards), {user.pk for user in users})
+        self.assertEqual(sum(len(shard) for shard in shards), len(users))
+        for index, shard in enumerate(shards):
+            self.assertTrue(all(pk % 3 == index for pk in shard))
+
+    def test_single_shard_is_the_whole_queryset(self):
+        queryset = User.objects.all()
+        self.assertIs(tasks._shard_queryset(queryset, 0, 1), queryset)
+        self.assertIs(tasks._shard_queryset(queryset), queryset)
+
+
+class CoordinateNotificationDispatchTests(TestCase):
+
+    def setUp(self):
+        broker_breaker.record_success()
+        self.addCleanup(broker_breaker.record_success)
+
+    def test_publishes_every_shard(self):
+        with fake_broker() as published:
+            result = tasks.coordinate_notification_dispatch.run(shard_count=2)
+
+        self.assertEqual(result['status'], 'queued')
+        self.assertEqual(result['tasks_queued'], 4)
+        self.assertEqual(
+            sorted((name.rsplit('.', 1)[1], kwargs['shard_index']) for name, kwargs in published),
+            [('dispatch_due_prayer_notifications', 0), ('dispatch_due_prayer_notifications', 1),
+             ('dispatch_subscription_notifications', 0), ('dispatch_subscription_notifications', 1)],
+        )
+
+    def test_spools_only_shards_the_broker_rejected(self):
+        with fake_broker(fail_after=1) as published:
+            result = tasks.coordinate_notification_dispatch.run(shard_count=2)
+
+        self.assertEqual(result['status'], 'partial')
+        self.assertEqual(len(published), 1)
+        spooled = list(SpooledTask.objects.values_list('task_name', 'kwargs'))
+        self.assertEqual(len(spooled), 3)
+        published_shard = (published[0][0], published[0][1]['shard_index'])
+        self.assertNotIn(published_shard, [(name, kwargs['shard_index']) for name, kwargs in spooled])
+
+    @override_settings(TASK_SPOOL_ENABLED=False)
+    def test_runs_shards_inline_once_when_the_broker_is_down(self):
+        runs = []
+
+        def record(*args, **kwargs):
+            runs.append(kwargs)
+            return {'status': 'success'}
+
+        with fake_broker(fail_after=0) as published, \
+                mock.patch.object(tasks.dispatch_due_prayer_notifications, 'run', side_effect=record), \
+                mock.patch.object(tasks.dispatch_subscription_notifications, 'run', side_effect=record):
+            result = tasks.coordinate_notification_dispatch.run(shard_count=2)
+
+        self.assertEqual(published, [])
+        self.assertEqual(result['tasks_handed_off'], 4)
+        self.assertEqual(sorted(run['shard_index'] for run in runs), [0, 0, 1, 1])
+        self.assertFalse(SpooledTask.objects.exists())
+
+
+def make_city(tz_name='UTC', name='Testville'):
+    from locations.models import City, Country
+
+    country, _ = Country.objects.get_or_create(name='Testland', code='TST')
+    return City.objects.create(name=name, country=country, latitude=0, longitude=0, timezone=tz_name)
+
+
+def add_timetable(city, local_date, **times):
+    """A MonthlyPrayerTime row; prayers not given are set to 12:00 and unused by the tests."""
+    from prayer_times.models import MonthlyPrayerTime
+
+    noon = datetime(2000, 1, 1, 12).time()
+    fields = {name: times.get(name, noon) for name in ('fajr', 'sunrise', 'dhuhr', 'asr', 'maghrib', 'isha')}
+    return MonthlyPrayerTime.objects.create(
+        city=city, year=local_date.year, month=local_date.month, day=local_date.day, **fields
+    )
+
+
+@override_settings(NOTIFICATION_SCHEDULING_MODE='eta', NOTIFICATION_ETA_LOOKAHEAD_MINUTES=30)
+class PlannedReminderTests(TestCase):
+
+    def setUp(self):
+        broker_breaker.record_success()
+        self.addCleanup(broker_breaker.record_success)
+        self.city = make_city()
+        self.subscriber = WhatsAppNotification.objects.create(
+            phone_number='1700000000', city=self.city, notification_types=['fajr'],
+            notification_minutes_before=10,
+        )
+
+    def _fajr_at(self, instant):
+        add_timetable(self.city, instant.date(), fajr=instant.time().replace(second=0, microsecond=0))
+
+    def _now(self):
+        return timezone.now().astimezone(dt_timezone.utc).replace(second=0, microsecond=0)
+
+    def test_plans_reminder_but_queues_only_those_due_soon(self):
+        prayer = self._now() + timedelta(hours=2)
+        self._fajr_at(prayer)
+
+        with fake_broker() as published:
+            result = tasks.plan_daily_reminders.run()
+
+        self.assertEqual(result['reminders_planned'], 1)
+        reminder = PlannedReminder.objects.get()
+        self.assertEqual(reminder.fire_at, prayer - timedelta(minutes=10))
+        self.assertEqual((reminder.status, reminder.task_id), ('planned', ''))
+        self.assertEqual(published, [])
+
+    def test_queue_planned_reminders_picks_up_reminders_inside_the_lookahead(self):
+        prayer = self._now() + timedelta(minutes=30)
+        self._fajr_at(prayer)
+        with fake_broker():
+            tasks.plan_daily_reminders.run()
+        PlannedReminder.objects.update(task_id='')
+
+        with fake_broker() as published:
+            result = tasks.queue_planned_reminders.run()
+
+        self.assertEqual(result['tasks_queued'], 1)
+        self.assertEqual(published[0][0], 'push_notification.tasks.fire_planned_reminders')
+        self.assertNotEqual(PlannedReminder.objects.get().task_id, '')
+
+    def test_replan_cancels_and_replaces_changed_reminders(self):
+        prayer = self._now() + timedelta(hours=2)
+        self._fajr_at(prayer)
+        with fake_broker():
+            tasks.plan_daily_reminders.run()
+
+        WhatsAppNotification.objects.filter(pk=self.subscriber.pk).update(notification_minutes_before=30)
+        with fake_broker():
+            result = tasks.replan_reminders.run(whatsapp_ids=[self.subscriber.pk])
+
+        self.assertEqual((result['reminders_cancelled'], result['reminders_planned']), (1, 1))
+        planned = PlannedReminder.objects.get(status='planned')
+        self.assertEqual(planned.fire_at, prayer - timedelta(minutes=30))
+        self.assertEqual(planned.minutes_before, 30)
+
+    def _planned(self):
+        return PlannedReminder.objects.create(
+            channel='whatsapp', whatsapp=self.subscriber, prayer_name='fajr',
+            prayer_time=datetime(2000, 1, 1, 5).time(), minutes_before=10, fire_at=self._now(),
+        )
+
+    def test_fire_marks_rows_sent_after_publishing(self):
+        reminder = self._planned()
+
+        with fake_broker() as published:
+            result = tasks.fire_planned_reminders.run([reminder.id])
+
+        self.assertEqual(result['sent'], 1)
+        self.assertEqual([name for name, _ in published], ['push_notification.tasks.send_whatsapp_notification'])
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.status, 'sent')
+
+        with fake_broker() as published:
+            tasks.fire_planned_reminders.run([reminder.id])
+        self.assertEqual(published, [])
+
+    def test_fire_leaves_rows_planned_when_publishing_fails(self):
+        reminder = self._planned()
+
+        with mock.patch('push_notification.enqueue.publish_many', side_effect=RuntimeError('spool down')):
+            with self.assertRaises(RuntimeError):
+                tasks.fire_planned_reminders.run([reminder.id])
+
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.status, 'planned')
+
+    def test_fire_cancels_rows_of_inactive_subscribers(self):
+        reminder = self._planned()
+        WhatsAppNotification.objects.filter(pk=self.subscriber.pk).update(is_active=False)
+
+        with fake_broker() as published:
+            tasks.fire_planned_reminders.run([reminder.id])
+
+        self.assertEqual(published, [])
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.status, 'cancelled')
+
+
+class DispatchAcrossMidnightTests(TestCase):
+    """Reminders sent late in the evening for a prayer just after local midnight."""
+
+    # 23:55 in Dhaka (UTC+6); fajr at 00:05 the next local day.
+    SCHEDULED_AT = '2026-03-10T17:55:00+00:00'
+
+    def setUp(self):
+        broker_breaker.record_success()
+        self.addCleanup(broker_breaker.record_success)
+        self.city = make_city('Asia/Dhaka')
+        self.fajr = datetime(2000, 1, 1, 0, 5).time()
+
+    def test_whatsapp_reminder_uses_the_next_local_days_timetable(self):
+        add_timetable(self.city, date(2026, 3, 10))
+        add_timetable(self.city, date(2026, 3, 11), fajr=self.fajr)
+        WhatsAppNotification.objects.create(
+            phone_number='1700000000', city=self.city, notification_types=['fajr'],
+            notification_minutes_before=10,
+        )
+
+        with fake_broker() as published:
+            result = tasks.dispatch_due_prayer_notifications.run(scheduled_at=self.SCHEDULED_AT)
+
+        self.assertEqual(result['messages_queued'], 1)
+        self.assertEqual([name for name, _ in published], ['push_notification.tasks.send_whatsapp_notification'])
+
+    def test_subscription_reminder_for_a_prayer_after_midnight(self):
+        from find_mosque.models import Mosque
+        from subscribe.models import Subscription
+
+        mosque = Mosque.objects.create(name='Night Mosque', city=self.city, address='1 Road', fajr_beginning=self.fajr)
+        subscription = Subscription.objects.create(
+            email='night@example.com', notification_method='email', selected_prayers=['fajr'],
+            notification_minutes_before=10,
+        )
+        subscription.selected_mosques.add(mosque)
+
+        with fake_broker():
+            result = tasks.dispatch_subscription_notifications.run(scheduled_at=self.SCHEDULED_AT)
+
+        self.assertEqual(result['notifications_queued'], 1)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = 1000.0
+        patcher = mock.patch('push_notification.enqueue.time.monotonic', side_effect=lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_one_probe_through(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+        self.clock += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_opens_the_circuit_again(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock += 30
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.clock += 29
+        self.assertFalse(self.breaker.allow())
+
+
+class EnqueueTaskTests(TestCase):
+
+    def setUp(self):
+        broker_breaker.record_success()
+        self.addCleanup(broker_breaker.record_success)
+
+    def test_publishes_without_broker_retries(self):
+        with mock.patch.object(tasks.send_whatsapp_notification, 'apply_async') as apply_async:
+            self.assertEqual(enqueue_task(tasks.send_whatsapp_notification, 1, 'hi', 'fajr'), 'queued')
+
+        apply_async.assert_called_once_with(args=(1, 'hi', 'fajr'), kwargs={}, retry=False)
+
+    def test_spools_the_task_when_the_broker_fails(self):
+        with mock.patch.object(tasks.send_whatsapp_notification, 'apply_async', side_effect=ConnectionError('down')):
+            self.assertEqual(enqueue_task(tasks.send_whatsapp_notification, 1, 'hi', 'fajr'), 'spooled')
+
+        spooled = SpooledTask.objects.get()
+        self.assertEqual(spooled.task_name, 'push_notification.tasks.send_whatsapp_notification')
+        self.assertEqual((spooled.args, spooled.queue), ([1, 'hi', 'fajr'], 'reminders'))
+        self.assertEqual(spooled.last_error, 'down')
+
+    @override_settings(TASK_SPOOL_ENABLED=False)
+    def test_runs_inline_when_the_spool_is_off(self):
+        with mock.patch.object(tasks.send_whatsapp_notification, 'apply_async', side_effect=ConnectionError('down')), \
+                mock.patch.object(tasks.send_whatsapp_notification, 'apply') as apply:
+            self.assertEqual(enqueue_task(tasks.send_whatsapp_notification, 1, 'hi', 'fajr'), 'inline')
+
+        apply.assert_called_once_with(args=(1, 'hi', 'fajr'), kwargs={})
+        self.assertFalse(SpooledTask.objects.exists())
+
+    def test_open_circuit_spools_without_touching_the_broker(self):
+        for _ in range(broker_breaker.failure_threshold):
+            broker_breaker.record_failure()
+
+        with mock.patch.object(tasks.send_whatsapp_notification, 'apply_async') as apply_async:
+            self.assertEqual(enqueue_task(tasks.send_whatsapp_notification, 1, 'hi', 'fajr'), 'spooled')
+
+        apply_async.assert_not_called()
+        self.assertEqual(SpooledTask.objects.get().last_error, 'broker circuit open')
+
+
+class DrainTaskSpoolTests(TestCase):
+
+    def setUp(self):
+        broker_breaker.record_success()
+        self.addCleanup(broker_breaker.record_success)
+
+    def _spooled(self, task_name, queue, age_seconds=0):
+        spooled = SpooledTask.objects.create(task_name=task_name, args=[1], queue=queue)
+        SpooledTask.objects.filter(pk=spooled.pk).update(
+            created_at=timezone.now() - timedelta(seconds=age_seconds)
+        )
+        return spooled
+
+    def _drain(self, send_task):
+        pool = mock.MagicMock()
+        with mock.patch.object(type(app), 'producer_pool', new_callable=mock.PropertyMock, return_value=pool), \
+                mock.patch.object(app, 'send_task', side_effect=send_task) as sent:
+            result = tasks.drain_task_spool.run()
+        return result, sent
+
+    def test_republishes_to_the_recorded_queue_and_expires_stale_reminders(self):
+        stale = self._spooled('push_notification.tasks.send_whatsapp_notification', 'reminders', age_seconds=901)
+        fresh = self._spooled('push_notification.tasks.send_whatsapp_notification', 'reminders', age_seconds=60)
+        email = self._spooled('push_notification.tasks.send_daily_summary', 'bulk-email', age_seconds=3600)
+
+        result, sent = self._drain(send_task=None)
+
+        self.assertEqual((result['published'], result['expired']), (2, 1))
+        self.assertEqual(
+            [(call.args[0], call.kwargs['queue']) for call in sent.call_args_list],
+            [('push_notification.tasks.send_daily_summary', 'bulk-email'),
+             ('push_notification.tasks.send_whatsapp_notification', 'reminders')],
+        )
+        statuses = dict(SpooledTask.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {stale.id: 'expired', fresh.id: 'published', email.id: 'published'})
+
+    def test_stops_at_the_first_failure_and_keeps_the_rest(self):
+        first = self._spooled('push_notification.tasks.send_daily_summary', 'bulk-email', age_seconds=20)
+        second = self._spooled('push_notification.tasks.send_daily_summary', 'bulk-email', age_seconds=10)
+        outcomes = iter([None, ConnectionError('down')])
+
+        def send_task(*args, **kwargs):
+            outcome = next(outcomes)
+            if outcome:
+                raise outcome
+
+        self._drain(send_task)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'published')
+        self.assertEqual((second.status, second.attempts, second.last_error), ('pending', 1, 'down'))
+
+    def test_skips_while_the_circuit_is_open(self):
+        self._spooled('push_notification.tasks.send_daily_summary', 'bulk-email')
+        for _ in range(broker_breaker.failure_threshold):
+            broker_breaker.record_failure()
+
+        result, sent = self._drain(send_task=None)
+
+        self.assertEqual(result['status'], 'skipped')
+        sent.assert_not_called()
+
+
+class EnqueueBatchTests(TestCase):
+
+    def setUp(self):
+        broker_breaker.record_success()
+        self.addCleanup(broker_breaker.record_success)
+
+    def test_collects_calls_and_publishes_them_over_one_connection(self):
+        with fake_broker() as published:
+            with enqueue_batch():
+                self.assertEqual(enqueue_task(tasks.send_whatsapp_notification, 1, 'a', 'fajr'), 'batched')
+                with enqueue_batch():
+                    enqueue_task(tasks.send_whatsapp_notification, 2, 'b', 'fajr')
+                self.assertEqual(published, [])
+
+            self.assertEqual(len(published), 2)
+            app.producer_pool.acquire.assert_called_once_with(block=True)
+
+    def test_publishes_collected_calls_when_the_block_raises(self):
+        with fake_broker() as published:
+            with self.assertRaises(ValueError):
+                with enqueue_batch():
+                    enqueue_task(tasks.send_whatsapp_notification, 1, 'a', 'fajr')
+                    raise ValueError
+
+        self.assertEqual(len(published), 1)
+
+    def test_publish_many_spools_what_the_broker_rejected(self):
+        calls = [(tasks.send_whatsapp_notification, (i, 'm', 'fajr'), {}) for i in range(3)]
+
+        with fake_broker(fail_after=1) as published:
+            self.assertEqual(publish_many(calls), 1)
+
+        self.assertEqual(len(published), 1)
+        self.assertEqual(list(SpooledTask.objects.values_list('args', flat=True)), [[1, 'm', 'fajr'], [2, 'm', 'fajr']])
+
+    def test_empty_batch_does_not_touch_the_broker(self):
+        with fake_broker():
+            with enqueue_batch():
+                pass
+            app.producer_pool.acquire.assert_not_called()
@@ -0,0 +1,97 @@
+"""
+Redis sorted-set timer wheel for planned reminders.
+
+Due reminders live in a ZSET scored by their UTC epoch. Poppers claim due
+members atomically with a Lua script that moves them into an in-flight
+ZSET scored by a visibility deadline; members that are not acknowledged
+before the deadline (e.g. the popper crashed) are moved back and fired
+again. fire_planned_reminders is idempotent, so a re-delivery never sends
+a reminder twice.
+"""
+import time
+
+from django.conf import settings
+
+DUE_KEY = 'salahtime:reminders:due'
+INFLIGHT_KEY = 'salahtime:reminders:inflight'
+
+# PlannedReminder.task_id marker for reminders handed to the wheel
+TIMER_WHEEL_TASK_ID = 'timer-wheel'
+
+# KEYS[1]=due, KEYS[2]=inflight, ARGV[1]=now, ARGV[2]=limit, ARGV[3]=deadline
+_POP_DUE_SCRIPT = """
+local members = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, member in ipairs(members) do
+    redis.call('ZREM', KEYS[1], member)
+    redis.call('ZADD', KEYS[2], ARGV[3], member)
+end
+return members
+"""
+
+# KEYS[1]=due, KEYS[2]=inflight, ARGV[1]=now
+_REQUEUE_EXPIRED_SCRIPT = """
+local members = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, member in ipairs(members) do
+    redis.call('ZREM', KEYS[2], member)
+    redis.call('ZADD', KEYS[1], ARGV[1], member)
+end
+return #members
+"""
+
+
+class TimerWheel:
+    """
+    Thin wrapper around the due/in-flight sorted sets.
+    Safe to use from any number of processes at once.
+    """
+
+    def __init__(self, client=None, visibility_timeout=None):
+        if client is None:
+            import redis
+            url = getattr(settings, 'NOTIFICATION_TIMER_REDIS_URL', '') or settings.CELERY_BROKER_URL
+            client = redis.from_url(url)
+        self.client = client
+        self.visibility_timeout = visibility_timeout or getattr(
+            settings, 'NOTIFICATION_TIMER_VISIBILITY_TIMEOUT', 120
+        )
+        self._pop_due = client.register_script(_POP_DUE_SCRIPT)
+        self._requeue_expired = client.register_script(_REQUEUE_EXPIRED_SCRIPT)
+
+    def schedule(self, reminder_ids, fire_at):
+        """Add reminder ids to the wheel, due at the datetime fire_at."""
+        if not reminder_ids:
+            return 0
+        score = fire_at.timestamp()
+        return self.client.zadd(DUE_KEY, {str(reminder_id): score for reminder_id in reminder_ids})
+
+    def pop_due(self, limit=500, now=None):
+        """Claim up to `limit` due reminder ids and mark them in flight."""
+        now = now or time.time()
+        members = self._pop_due(
+            keys=[DUE_KEY, INFLIGHT_KEY],
+            args=[now, limit, now + self.visibility_timeout],
+        )
+        return [int(member) for member in members]
+
+    def ack(self, reminder_ids):
+        """Drop handed-off reminder ids from the in-flight set."""
+        if not reminder_ids:
+            return 0
+        return self.client.zrem(INFLIGHT_KEY, *[str(reminder_id) for reminder_id in reminder_ids])
+
+    def requeue_expired(self, now=None):
+        """Move in-flight ids whose visibility deadline passed back to due."""
+        return self._requeue_expired(keys=[DUE_KEY, INFLIGHT_KEY], args=[now or time.time()])
+
+    def next_due_in(self, now=None):
+        """Seconds until the earliest due member, or None when the wheel is empty."""
+        head = self.client.zrange(DUE_KEY, 0, 0, withscores=True)
+        if not head:
+            return None
+        return max(head[0][1] - (now or time.time()), 0.0)
+
+    def stats(self):
+        return {
+            'due': self.client.zcard(DUE_KEY),
+            'in_flight': self.client.zcard(INFLIGHT_KEY),
+        }
@@ -5,6 +5,7 @@ from .task_views import (
     send_prayer_notification_view,
     send_daily_summary_view,
     task_status_view,
+    task_metrics_view,
     celery_health_check
 )
 
@@ -20,6 +21,7 @@ urlpatterns = [
     path('tasks/send_daily_summary/', send_daily_summary_view, name='send_daily_summary'),
     path('tasks/status/<str:task_id>/', task_status_view, name='task_status'),
     path('tasks/health/', celery_health_check, name='celery_health'),
+    path('tasks/metrics/', task_metrics_view, name='task_metrics'),
     
 ]
 
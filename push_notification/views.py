@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from django.db.models import Q
+from api.pagination import KeysetPagination
 from .models import WhatsAppNotification, WhatsAppNotificationLog
 from .serializers import (
     WhatsAppNotificationSerializer,
@@ -117,6 +118,7 @@ class WhatsAppNotificationLogViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ['whatsapp__phone_number', 'twilio_sid']
     ordering_fields = ['sent_at', 'status']
     ordering = ['-sent_at']
+    pagination_class = KeysetPagination
     
     def get_permissions(self):
         return [IsAuthenticated()]
@@ -4,6 +4,7 @@ from django.utils.html import format_html
 from .models import Subscription, SubscriptionLog
 from push_notification.tasks import send_whatsapp_notification
 from unfold.admin import ModelAdmin
+from Authentication.permissions import is_imam_user
 
 def send_test_notification(modeladmin, request, queryset):
     """
@@ -120,7 +121,7 @@ class SubscriptionAdmin(ModelAdmin):
         """Hide from Imam users."""
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
 
 @admin.register(SubscriptionLog)
@@ -129,11 +130,13 @@ class SubscriptionLogAdmin(ModelAdmin):
     list_filter = ['status', 'sent_at']
     search_fields = ['subscription__email', 'subject', 'message']
     readonly_fields = ['sent_at']
-    ordering = ['-sent_at']
+    ordering = ['-sent_at', '-id']
+    # Skip the unfiltered COUNT(*) over the whole log table
+    show_full_result_count = False
     
     def has_module_permission(self, request):
         """Hide from Imam users."""
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-19 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribe', '0003_subscriptionlog_prayer_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscriptionlog',
+            index=models.Index(fields=['-sent_at', '-id'], name='subscribe_s_sent_at_eef011_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscriptionlog',
+            index=models.Index(fields=['subscription', '-sent_at', '-id'], name='subscribe_s_subscri_0732ed_idx'),
+        ),
+    ]
@@ -65,6 +65,10 @@ class SubscriptionLog(models.Model):
         ordering = ['-sent_at']
         verbose_name = 'Subscription Log'
         verbose_name_plural = 'Subscription Logs'
+        indexes = [
+            models.Index(fields=['-sent_at', '-id']),
+            models.Index(fields=['subscription', '-sent_at', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.subscription.email} - {self.sent_at}"
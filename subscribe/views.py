@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.utils import timezone
+from api.pagination import KeysetPagination
 from .models import Subscription, SubscriptionLog
 from .serializers import SubscriptionSerializer, SubscriptionCreateSerializer, SubscriptionLogSerializer
 
@@ -84,6 +85,7 @@ class SubscriptionLogViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['sent_at', 'status']
     ordering = ['-sent_at']
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         user = self.request.user
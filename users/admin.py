@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.models import User
 from .models import UserProfile, UserLocation
 from unfold.admin import ModelAdmin
+from Authentication.permissions import is_imam_user
 
 @admin.register(UserProfile)
 class UserProfileAdmin(ModelAdmin):
@@ -36,7 +37,7 @@ class UserProfileAdmin(ModelAdmin):
         """Hide from Imam users."""
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
 
 @admin.register(UserLocation)
@@ -50,5 +51,5 @@ class UserLocationAdmin(ModelAdmin):
         """Hide from Imam users."""
         if request.user.is_superuser:
             return True
-        return not request.user.groups.filter(name='Imam').exists()
+        return not is_imam_user(request.user)
 
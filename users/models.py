@@ -77,9 +77,26 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Save the UserProfile instance when User is saved."""
-    profile, _ = UserProfile.objects.get_or_create(user=instance)
+def save_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Save the UserProfile together with its User, but only when it was
+    loaded through user.profile (and so may have been changed). New users
+    get theirs from create_user_profile, and partial saves such as
+    last_login updates or password rehashes never touch the profile.
+
+    A user created before profiles existed has None cached once the
+    relation was looked up (select_related, hasattr); they get one here.
+    """
+    if created or update_fields:
+        return
+    related = User.profile.related
+    if not related.is_cached(instance):
+        return
+    profile = related.get_cached_value(instance, default=None)
+    if profile is None:
+        profile, _ = UserProfile.objects.get_or_create(user=instance)
+        related.set_cached_value(instance, profile)
+        return
     profile.save()
 
 
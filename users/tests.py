@@ -1,3 +1,35 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from Authentication.serializers import LoginSerializer
+
+from .models import UserProfile
+
+
+class SaveUserProfileTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='legacy', email='legacy@example.com', password='pass12345')
+
+    def test_save_after_login_without_profile_creates_it(self):
+        UserProfile.objects.filter(user=self.user).delete()
+        serializer = LoginSerializer(data={'email': 'legacy@example.com', 'password': 'pass12345'})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        user = serializer.validated_data['user']
+
+        user.first_name = 'Legacy'
+        user.save()
+
+        self.assertTrue(UserProfile.objects.filter(user=self.user).exists())
+        self.assertEqual(user.profile.user_id, self.user.pk)
+
+    def test_save_skips_profile_that_was_not_loaded(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            user.save()
+
+    def test_save_writes_loaded_profile(self):
+        user = User.objects.select_related('profile').get(pk=self.user.pk)
+        user.profile.language = 'bn'
+        user.save()
+        self.assertEqual(UserProfile.objects.get(user=self.user).language, 'bn')
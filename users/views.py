@@ -21,6 +21,7 @@ class UserViewSet(viewsets.ModelViewSet):
     search_fields = ['username', 'email', 'first_name', 'last_name']
     ordering_fields = ['username', 'date_joined']
     permission_classes = [IsAuthenticated]
+    stateless_auth = False
     
     @action(detail=False, methods=['get'])
     def me(self, request):